@@ -5,211 +5,740 @@ import pandas as pd
 import zipfile
 import io
 import re
+import time
+import hashlib
+import shutil
+import tempfile
+import threading
+import argparse
+import itertools
 import urllib3
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlparse
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from leitor_csv import ler_csv, ler_cadastro, detectar_dialeto, detectar_dialeto_amostra, ERROS_ENCODING
+from manifesto import Manifesto
+from armazenamento import EscritorParquet, PARQUET_DISPONIVEL, parquet_existe, remover_parquet
+import metricas
 
 # Desabilita avisos de segurança (sites do governo)
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 # --- CONFIGURAÇÕES ---
-BASE_URL_CONTABIL = "https://dadosabertos.ans.gov.br/FTP/PDA/demonstracoes_contabeis/"
-URL_CADASTRO = "https://dadosabertos.ans.gov.br/FTP/PDA/operadoras_de_plano_de_saude_ativas/Relatorio_cadop.csv"
+# ANS_BASE_URL permite apontar o crawler para um servidor local (ex.: réplica fake da árvore da ANS)
+BASE_URL_CONTABIL = os.environ.get("ANS_BASE_URL", "https://dadosabertos.ans.gov.br/FTP/PDA/demonstracoes_contabeis/")
+URL_CADASTRO = os.environ.get("ANS_URL_CADASTRO", "https://dadosabertos.ans.gov.br/FTP/PDA/operadoras_de_plano_de_saude_ativas/Relatorio_cadop.csv")
 ARQUIVO_CADASTRO_LOCAL = "Relatorio_cadop.csv"
+ARQUIVO_CONSOLIDADO = "consolidado_despesas.csv"
+PASTA_PARTICOES = "particoes_despesas"  # saída filtrada (antes do JOIN) de cada ZIP
 
 USER_AGENT = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'}
 
-def garantir_cadastro():
-    if os.path.exists(ARQUIVO_CADASTRO_LOCAL):
+# Motor de download
+MAX_WORKERS = int(os.environ.get("ANS_MAX_WORKERS", 8))
+MAX_POR_HOST = int(os.environ.get("ANS_MAX_POR_HOST", 4))
+TENTATIVAS = 3
+BACKOFF = 0.5  # segundos: 0.5, 1, 2...
+TIMEOUT = 60
+
+# Ingestão em streaming
+CHUNK_LINHAS = int(os.environ.get("ANS_CHUNK_LINHAS", 200_000))
+LIMITE_SPOOL = 32 * 1024 * 1024  # acima disso o arquivo temporário vai para o disco
+TAMANHO_BLOCO_HTTP = 1024 * 1024
+
+class MotorDownload:
+    """Sessão HTTP única (keep-alive) com pool de workers, limite por host e retries com backoff."""
+
+    def __init__(self, max_workers=MAX_WORKERS, max_por_host=MAX_POR_HOST,
+                 tentativas=TENTATIVAS, backoff=BACKOFF, timeout=TIMEOUT):
+        self.max_workers = max_workers
+        self.max_por_host = max_por_host
+        self.timeout = timeout
+
+        retry = Retry(total=tentativas, backoff_factor=backoff,
+                      status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=frozenset(['GET', 'HEAD']))
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update(USER_AGENT)
+        self.session.verify = False
+
+        self._semaforos = {}
+        self._lock = threading.Lock()
+        self.estatisticas = []  # uma entrada por arquivo baixado
+        self._inicio = time.perf_counter()
+
+    def _semaforo(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._semaforos:
+                self._semaforos[host] = threading.BoundedSemaphore(self.max_por_host)
+            return self._semaforos[host]
+
+    def get(self, url, **kwargs):
+        """GET respeitando o limite de conexões simultâneas do host."""
+        kwargs.setdefault('timeout', self.timeout)
+        with self._semaforo(url):
+            r = self.session.get(url, **kwargs)
+        r.raise_for_status()
+        return r
+
+    def baixar(self, url):
+        """Baixa o corpo inteiro e registra bytes/tempo para o resumo."""
+        t0 = time.perf_counter()
+        with metricas.span('crawler.download', arquivo=url.split('/')[-1]) as s:
+            r = self.get(url)
+            conteudo = r.content
+            s.contar(bytes=len(conteudo))
+        self._registrar(url, len(conteudo), time.perf_counter() - t0)
+        return conteudo
+
+    def baixar_para_spool(self, url, cabecalhos=None):
+        """Baixa em streaming para um SpooledTemporaryFile: a memória fica limitada a LIMITE_SPOOL.
+
+        Aceita cabeçalhos condicionais; devolve (spool, info) e spool=None se o servidor responder 304.
+        info traz status, etag, last_modified, tamanho e sha256 do conteúdo."""
+        t0 = time.perf_counter()
+        spool = tempfile.SpooledTemporaryFile(max_size=LIMITE_SPOOL)
+        sha = hashlib.sha256()
+        n_bytes = 0
+        try:
+            with self._semaforo(url), metricas.span('crawler.download', arquivo=url.split('/')[-1]) as s:
+                with self.session.get(url, stream=True, timeout=self.timeout, headers=cabecalhos) as r:
+                    info = {'status': r.status_code, 'etag': r.headers.get('ETag'),
+                            'last_modified': r.headers.get('Last-Modified')}
+                    if r.status_code == 304:
+                        s.contar(nao_modificado=1)
+                        spool.close()
+                        self._registrar(url, 0, time.perf_counter() - t0, nao_modificado=True)
+                        return None, info
+                    r.raise_for_status()
+                    for bloco in r.iter_content(chunk_size=TAMANHO_BLOCO_HTTP):
+                        spool.write(bloco)
+                        sha.update(bloco)
+                        n_bytes += len(bloco)
+                    s.contar(bytes=n_bytes)
+        except Exception:
+            spool.close()
+            raise
+        spool.seek(0)
+        info.update(tamanho=n_bytes, sha256=sha.hexdigest())
+        self._registrar(url, n_bytes, time.perf_counter() - t0)
+        return spool, info
+
+    def _registrar(self, url, n_bytes, segundos, nao_modificado=False):
+        with self._lock:
+            self.estatisticas.append({'url': url, 'bytes': n_bytes, 'segundos': segundos, 'nao_modificado': nao_modificado})
+
+    def mapear(self, func, itens):
+        """Executa func em paralelo (pool limitado), preservando a ordem dos itens."""
+        itens = list(itens)
+        if not itens: return []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(itens))) as pool:
+            return list(pool.map(func, itens))
+
+    def imprimir_resumo(self):
+        if not self.estatisticas: return
+        total = time.perf_counter() - self._inicio
+        total_bytes = sum(e['bytes'] for e in self.estatisticas)
+        print("\n--- Resumo de Downloads ---")
+        for e in self.estatisticas:
+            if e['nao_modificado']:
+                print(f"   {e['url'].split('/')[-1]:<40} {'304 (sem alterações)':>20}  {e['segundos']:>6.2f}s")
+                continue
+            taxa = e['bytes'] / e['segundos'] / 1024 / 1024 if e['segundos'] else 0
+            print(f"   {e['url'].split('/')[-1]:<40} {e['bytes'] / 1024 / 1024:>8.2f} MB  {e['segundos']:>6.2f}s  {taxa:>7.2f} MB/s")
+        print(f"   Total: {len(self.estatisticas)} arquivos, {total_bytes / 1024 / 1024:.2f} MB em {total:.2f}s "
+              f"({total_bytes / total / 1024 / 1024 if total else 0:.2f} MB/s)")
+
+    def fechar(self):
+        self.session.close()
+
+def links_da_pagina(html):
+    """Extrai os hrefs de uma listagem de diretório (ignora links de ordenação '?C=N...')."""
+    soup = BeautifulSoup(html, 'html.parser')
+    return [a.get('href') for a in soup.find_all('a') if a.get('href') and not a.get('href').startswith('?')]
+
+def garantir_cadastro(motor=None, manifesto=None):
+    """Garante o Relatorio_cadop.csv local. Com manifesto, revalida com o servidor (GET condicional)."""
+    existe = os.path.exists(ARQUIVO_CADASTRO_LOCAL)
+    if existe and manifesto is None:
         print(f"-> Arquivo de cadastro já existe: {ARQUIVO_CADASTRO_LOCAL}")
         return True
     
-    print(f"-> Baixando cadastro de: {URL_CADASTRO} ...")
+    print(f"-> {'Revalidando' if existe else 'Baixando'} cadastro de: {URL_CADASTRO} ...")
+    motor = motor or MotorDownload()
+    cabecalhos = manifesto.cabecalhos_condicionais(URL_CADASTRO, ARQUIVO_CADASTRO_LOCAL) if (manifesto and existe) else None
     try:
-        r = requests.get(URL_CADASTRO, headers=USER_AGENT, verify=False, timeout=60)
-        if r.status_code == 200:
-            with open(ARQUIVO_CADASTRO_LOCAL, 'wb') as f:
-                f.write(r.content)
-            print("-> Cadastro baixado com SUCESSO!")
+        spool, info = motor.baixar_para_spool(URL_CADASTRO, cabecalhos)
+        if spool is None:
+            print("-> Cadastro sem alterações no servidor.")
             return True
-        else:
-            print(f"-> Erro HTTP ao baixar cadastro: {r.status_code}")
+        with spool, open(ARQUIVO_CADASTRO_LOCAL + '.tmp', 'wb') as f:
+            shutil.copyfileobj(spool, f)
+        os.replace(ARQUIVO_CADASTRO_LOCAL + '.tmp', ARQUIVO_CADASTRO_LOCAL)
+        if manifesto: manifesto.registrar(URL_CADASTRO, info, ARQUIVO_CADASTRO_LOCAL)
+        print("-> Cadastro baixado com SUCESSO!")
+        return True
+    except requests.HTTPError as e:
+        print(f"-> Erro HTTP ao baixar cadastro: {e.response.status_code}")
     except Exception as e:
         print(f"-> Erro de conexão ao baixar cadastro: {e}")
-    return False
-
-def ler_csv_inteligente(caminho):
-    separadores = [';', ',']
-    encodings = ['utf-8', 'latin1', 'utf-8-sig', 'cp1252']
-    
-    for enc in encodings:
-        for sep in separadores:
-            try:
-                if hasattr(caminho, 'seek'): caminho.seek(0)
-                df_teste = pd.read_csv(caminho, sep=sep, encoding=enc, nrows=2, on_bad_lines='skip')
-                if len(df_teste.columns) > 1:
-                    if hasattr(caminho, 'seek'): caminho.seek(0)
-                    print(f"   (Leitura OK: {enc} com '{sep}')")
-                    return pd.read_csv(caminho, sep=sep, encoding=enc, on_bad_lines='skip')
-            except: continue
-            
-    try:
-        if hasattr(caminho, 'seek'): caminho.seek(0)
-        return pd.read_csv(caminho, on_bad_lines='skip')
-    except:
-        return pd.DataFrame()
+    return existe
 
-def listar_urls_trimestres():
+def listar_urls_trimestres(motor=None, base_url=None):
     print(f"--- 1. Buscando trimestres ---")
+    motor = motor or MotorDownload()
+    base_url = base_url or BASE_URL_CONTABIL
+    with metricas.span('crawler.listar_trimestres'):
+        return _listar_urls_trimestres(motor, base_url)
+
+def _listar_urls_trimestres(motor, base_url):
     try:
-        response = requests.get(BASE_URL_CONTABIL, headers=USER_AGENT, verify=False)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        links_anos = sorted([a.get('href') for a in soup.find_all('a') 
-                             if a.get('href').replace('/','').strip().isdigit()], reverse=True)
-        
-        urls_finais = []
-        for ano in links_anos[:2]:
-            url_ano = BASE_URL_CONTABIL + ano
+        links_anos = sorted([h for h in links_da_pagina(motor.get(base_url).text)
+                             if h.replace('/','').strip().isdigit()], reverse=True)
+
+        # Índices dos anos buscados em paralelo; a ordem (mais recente primeiro) é preservada
+        def urls_do_ano(ano):
+            url_ano = urljoin(base_url, ano)
             try:
-                resp = requests.get(url_ano, headers=USER_AGENT, verify=False)
-                soup_ano = BeautifulSoup(resp.text, 'html.parser')
-                links = [url_ano + a.get('href') for a in soup_ano.find_all('a') 
-                         if ('T' in a.get('href').upper() or '.zip' in a.get('href').lower()) and not a.get('href').startswith('?')]
-                urls_finais.extend(sorted(links, reverse=True))
-                if len(urls_finais) >= 3: break
-            except: continue
+                links = [urljoin(url_ano, h) for h in links_da_pagina(motor.get(url_ano).text)
+                         if 'T' in h.upper() or '.zip' in h.lower()]
+                return sorted(links, reverse=True)
+            except Exception as e:
+                print(f"Erro ao listar {url_ano}: {e}")
+                return []
+
+        urls_finais = [u for links in motor.mapear(urls_do_ano, links_anos[:2]) for u in links]
         return urls_finais[:3]
-    except: return []
+    except Exception as e:
+        print(f"Erro ao listar trimestres: {e}")
+        return []
 
-def baixar_e_extrair(url, destino):
+def listar_urls_intervalo(de, ate, motor=None, base_url=None):
+    """Todos os trimestres (ZIPs ou páginas) entre os períodos `de` e `ate`, do mais antigo ao mais novo.
+    Devolve [(periodo, url)]; periodo é None quando o nome não diz (a coluna DATA decide na leitura)."""
+    print(f"--- 1. Buscando trimestres de {rotulo_periodo(de)} a {rotulo_periodo(ate)} ---")
+    motor = motor or MotorDownload()
+    base_url = base_url or BASE_URL_CONTABIL
+    with metricas.span('crawler.listar_trimestres', de=rotulo_periodo(de), ate=rotulo_periodo(ate)):
+        try:
+            anos = sorted(h for h in links_da_pagina(motor.get(base_url).text)
+                          if h.replace('/', '').strip().isdigit() and de[0] <= int(h.replace('/', '')) <= ate[0])
+        except Exception as e:
+            print(f"Erro ao listar trimestres: {e}")
+            return []
+
+        def urls_do_ano(ano):
+            url_ano = urljoin(base_url, ano)
+            try:
+                return [urljoin(url_ano, h) for h in links_da_pagina(motor.get(url_ano).text)
+                        if 'T' in h.upper() or '.zip' in h.lower()]
+            except Exception as e:
+                print(f"Erro ao listar {url_ano}: {e}")
+                return []
+
+        encontrados = [(extrair_periodo(u), u) for links in motor.mapear(urls_do_ano, anos) for u in links]
+        encontrados = [(p, u) for p, u in encontrados if p is None or de <= p <= ate]
+        print(f"-> {len(encontrados)} trimestres encontrados em {len(anos)} anos.")
+        return sorted(encontrados, key=lambda item: (item[0] or (0, 0), item[1]))
+
+def resolver_zips(urls, motor):
+    """Expande páginas de trimestre nos ZIPs que elas listam (em paralelo)."""
+    def expandir(url):
+        if url.lower().endswith('.zip'): return [url]
+        try:
+            return [urljoin(url, h) for h in links_da_pagina(motor.get(url).text) if h.lower().endswith('.zip')]
+        except Exception as e:
+            print(f"Erro ao listar {url}: {e}")
+            return []
+    return [(url, z) for url, zips in zip(urls, motor.mapear(expandir, urls)) for z in zips]
+
+def baixar_e_extrair(url, destino, motor=None):
+    motor = motor or MotorDownload()
     try:
         os.makedirs(destino, exist_ok=True)
-        r = requests.get(url, headers=USER_AGENT, verify=False)
-        if url.endswith('.zip'):
-            with zipfile.ZipFile(io.BytesIO(r.content)) as z: z.extractall(destino)
-        else: 
-            soup = BeautifulSoup(r.text, 'html.parser')
-            for a in soup.find_all('a'):
-                if a.get('href').lower().endswith('.zip'):
-                    full = url + a.get('href')
-                    if a.get('href').startswith('http'): full = a.get('href')
-                    rz = requests.get(full, headers=USER_AGENT, verify=False)
-                    with zipfile.ZipFile(io.BytesIO(rz.content)) as z: z.extractall(destino)
+        for _, url_zip in resolver_zips([url], motor):
+            with zipfile.ZipFile(io.BytesIO(motor.baixar(url_zip))) as z: z.extractall(destino)
     except Exception as e: print(f"Erro download: {e}")
 
-def processar_despesas(diretorio):
+def baixar_todos(urls, pasta, motor):
+    """Baixa todos os ZIPs de todos os trimestres num único pool: o tempo total tende ao do arquivo mais lento."""
+    tarefas = resolver_zips(urls, motor)
+
+    def baixar(tarefa):
+        url, url_zip = tarefa
+        destino = os.path.join(pasta, url.rstrip('/').split('/')[-1].replace('.zip', ''))
+        try:
+            os.makedirs(destino, exist_ok=True)
+            with zipfile.ZipFile(io.BytesIO(motor.baixar(url_zip))) as z: z.extractall(destino)
+        except Exception as e: print(f"Erro download {url_zip}: {e}")
+
+    motor.mapear(baixar, tarefas)
+
+# Nomes usados pela ANS ao longo dos anos: 1T2025, 2025_1T, 1_trim_2012, 2007_1_trimestre, .../2012/1T/...
+PADROES_PERIODO = [
+    (re.compile(r'(?<!\d)([1-4])\s*T\s*[_-]?\s*((?:19|20)\d{2})(?!\d)', re.I), 1, 2),
+    (re.compile(r'(?<!\d)((?:19|20)\d{2})\s*[_/-]?\s*([1-4])\s*T(?![a-z])', re.I), 2, 1),
+    (re.compile(r'(?<!\d)([1-4])\s*[oº°]?\s*[_ -]?\s*trim(?:estre)?\s*[_ -]?\s*((?:19|20)\d{2})(?!\d)', re.I), 1, 2),
+    (re.compile(r'(?<!\d)((?:19|20)\d{2})\s*[_ -]\s*([1-4])\s*[oº°]?\s*[_ -]?\s*trim', re.I), 2, 1),
+]
+
+def extrair_periodo(texto):
+    """(ano, trimestre) a partir de um nome de arquivo, caminho ou URL; None se não houver período reconhecível.
+    Vale o último trecho do caminho que tiver um período (o nome do arquivo antes da pasta)."""
+    trechos = re.split(r'[/\\]', str(texto))
+    # Por último, o caminho inteiro: ano e trimestre em pastas separadas (.../2012/1T/arquivo.zip)
+    for trecho in list(reversed(trechos)) + ['_'.join(trechos)]:
+        for padrao, grupo_tri, grupo_ano in PADROES_PERIODO:
+            m = padrao.search(trecho)
+            if m: return int(m.group(grupo_ano)), int(m.group(grupo_tri))
+    return None
+
+def periodo_do_conteudo(df):
+    """(ano, trimestre) pela coluna DATA (2025-01-01 ou 01/01/2025), pela data mais frequente; None se não houver."""
+    col_data = next((c for c in df.columns if c.strip().upper().strip('"') == 'DATA'), None)
+    if col_data is None or df.empty: return None
+    datas = df[col_data].astype(str).str.extract(r'((?:19|20)\d{2})-(\d{2})|(\d{2})/(\d{2})/((?:19|20)\d{2})')
+    anos = datas[0].fillna(datas[4]).dropna()
+    meses = datas[1].fillna(datas[3]).dropna()
+    if anos.empty or meses.empty: return None
+    ano, mes = (anos + '-' + meses).value_counts().index[0].split('-')
+    if not 1 <= int(mes) <= 12: return None
+    return int(ano), (int(mes) - 1) // 3 + 1
+
+def rotulo_periodo(periodo):
+    return f"{periodo[1]}T{periodo[0]}"
+
+def ler_periodo(texto, fim=False):
+    """'2013' -> (2013, 1) (ou (2013, 4) com fim=True); '2013-2T', '2T2013' -> (2013, 2). Para --de/--ate."""
+    texto = texto.strip()
+    if re.fullmatch(r'(?:19|20)\d{2}', texto): return int(texto), 4 if fim else 1
+    periodo = extrair_periodo(texto) or extrair_periodo(texto.replace('-', ''))
+    if periodo is None: raise ValueError(f"Período inválido: {texto} (use 2013, 2013-2T ou 2T2013)")
+    return periodo
+
+def filtrar_despesas(df, nome_arquivo, periodo=None):
+    """Mantém só as linhas de EVENTO/SINISTRO e padroniza as colunas. Funciona em arquivo inteiro ou em chunk.
+    O período (ano, trimestre) vem de `periodo`, do nome do arquivo ou da coluna DATA; sem nenhum deles,
+    o arquivo é ignorado (antes o padrão era 2025/3T, o que misturava anos)."""
+    periodo = periodo or extrair_periodo(nome_arquivo) or periodo_do_conteudo(df)
+    if periodo is None:
+        print(f"Aviso: período não identificado em {nome_arquivo}; arquivo ignorado.")
+        return pd.DataFrame()
+    col_desc = next((c for c in df.columns if 'DESC' in c.upper()), None)
+    if not col_desc: return pd.DataFrame()
+    
+    df = df[df[col_desc].astype(str).str.upper().str.contains('EVENTO|SINISTRO', na=False)].copy()
+    if df.empty: return df
+    
+    df.rename(columns={'REG_ANS': 'RegistroANS', 'CD_OP': 'RegistroANS', 
+                       'CD_CONTA_CONTABIL': 'Conta', 'VL_SALDO_FINAL': 'Valor Despesas', 
+                       col_desc: 'Descricao'}, inplace=True)
+    
+    if df['Valor Despesas'].dtype != 'float64':
+        df['Valor Despesas'] = df['Valor Despesas'].astype(str).str.replace(',', '.', regex=False)
+    df['Valor Despesas'] = pd.to_numeric(df['Valor Despesas'], errors='coerce').fillna(0)
+    
+    df['Ano'] = str(periodo[0])
+    df['Trimestre'] = f"{periodo[1]}T"
+    
+    cols = ['RegistroANS', 'Ano', 'Trimestre', 'Valor Despesas', 'Descricao']
+    return df[[c for c in cols if c in df.columns]]
+
+def colunas_uteis(coluna):
+    """usecols: só o que o filtro e a projeção final precisam."""
+    c = coluna.strip().upper()
+    return 'DESC' in c or c in ('REG_ANS', 'CD_OP', 'VL_SALDO_FINAL', 'DATA')
+
+def ler_csv_em_chunks(caminho, chunksize):
+    """Lê um CSV em chunks com usecols e dtype=str (o valor só é convertido depois do filtro).
+    Um byte que não é do encoding da amostra vira latin1 (os chunks anteriores já foram entregues)."""
+    enc, sep = detectar_dialeto(caminho)
+    return pd.read_csv(caminho, sep=sep, encoding=enc, encoding_errors=ERROS_ENCODING, on_bad_lines='skip',
+                       usecols=colunas_uteis, dtype=str, chunksize=chunksize)
+
+def processar_despesas(diretorio, chunksize=None, consumidor=None):
+    """Filtra os CSVs do diretório. Com chunksize, cada chunk filtrado vai direto para o consumidor
+    (ex.: EscritorConsolidado) e nada é acumulado em memória."""
     print("\n--- 2. Processando Despesas ---")
     dfs = []
+    consumidor = consumidor or dfs.append
     for root, _, files in os.walk(diretorio):
         for file in files:
             if file.lower().endswith(('.csv', '.txt')):
                 try:
                     path = os.path.join(root, file)
-                    df = ler_csv_inteligente(path)
-                    
-                    if df.empty: continue
+                    with metricas.span('crawler.parse_csv', arquivo=file) as s:
+                        s.contar(bytes=os.path.getsize(path))
+                        if chunksize:
+                            total = 0
+                            for chunk in ler_csv_em_chunks(path, chunksize):
+                                s.contar(linhas=len(chunk))
+                                df = filtrar_despesas(chunk, file)
+                                if df.empty: continue
+                                total += len(df)
+                                consumidor(df)
+                            s.contar(linhas_mantidas=total)
+                            print(f"Lido: {file} ({total} linhas)")
+                            continue
+
+                        df = ler_csv(path)
+                        
+                        if df.empty: continue
+                        s.contar(linhas=len(df))
+
+                        df = filtrar_despesas(df, file)
+                        if df.empty: continue
+                        
+                        consumidor(df)
+                        s.contar(linhas_mantidas=len(df))
+                        print(f"Lido: {file} ({len(df)} linhas)")
+                # ParserError/EmptyDataError/UnicodeDecodeError são ValueError; KeyError = coluna esperada ausente
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"Erro ao ler {file} (arquivo ignorado): {type(e).__name__}: {e}")
+                    metricas.contar(arquivos_com_erro=1)
+    return pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame()
 
-                    col_desc = next((c for c in df.columns if 'DESC' in c.upper()), None)
-                    if not col_desc: continue
-                    
-                    df = df[df[col_desc].str.upper().str.contains('EVENTO|SINISTRO', na=False)].copy()
+def ler_zip_em_chunks(arquivo_zip, nome_zip, chunksize=CHUNK_LINHAS, periodo=None):
+    """Lê os CSVs direto de dentro do ZIP (sem extrair), devolvendo chunks já filtrados.
+    Período: do nome do CSV, do nome do ZIP, de `periodo` (ex.: tirado da URL) ou, por fim, da coluna DATA."""
+    with zipfile.ZipFile(arquivo_zip) as z:
+        for membro in z.infolist():
+            nome = membro.filename.split('/')[-1]
+            if membro.is_dir() or not nome.lower().endswith(('.csv', '.txt')): continue
+            
+            with z.open(membro) as f:
+                enc, sep = detectar_dialeto_amostra(f.read(64 * 1024))
+            
+            periodo_membro = extrair_periodo(nome) or extrair_periodo(nome_zip) or periodo
+            total = 0
+            # O span inclui o tempo do consumidor dos chunks (ex.: gravação da partição)
+            with metricas.span('crawler.parse_csv', arquivo=f"{nome_zip}/{nome}") as s, z.open(membro) as f:
+                s.contar(bytes=membro.file_size)
+                # Arquivo que deixa de ser UTF-8 depois da amostra: os bytes inválidos são lidos como latin1
+                leitor = pd.read_csv(f, sep=sep, encoding=enc, encoding_errors=ERROS_ENCODING, on_bad_lines='skip',
+                                     usecols=colunas_uteis, dtype=str, chunksize=chunksize)
+                for chunk in (leitor if chunksize else [leitor]):
+                    s.contar(linhas=len(chunk))
+                    # Sem período no nome, o primeiro chunk decide pelo conteúdo (vale para o arquivo todo)
+                    periodo_membro = periodo_membro or periodo_do_conteudo(chunk)
+                    df = filtrar_despesas(chunk, nome, periodo_membro)
                     if df.empty: continue
-                    
-                    df.rename(columns={'REG_ANS': 'RegistroANS', 'CD_OP': 'RegistroANS', 
-                                       'CD_CONTA_CONTABIL': 'Conta', 'VL_SALDO_FINAL': 'Valor Despesas', 
-                                       col_desc: 'Descricao'}, inplace=True)
-                    
-                    if df['Valor Despesas'].dtype == 'object':
-                        df['Valor Despesas'] = df['Valor Despesas'].str.replace(',', '.', regex=False)
-                    df['Valor Despesas'] = pd.to_numeric(df['Valor Despesas'], errors='coerce').fillna(0)
-                    
-                    ano = re.search(r'20\d{2}', file)
-                    df['Ano'] = ano.group(0) if ano else '2025'
-                    df['Trimestre'] = '1T' if '1T' in file.upper() else ('2T' if '2T' in file.upper() else '3T')
-                    
-                    cols = ['RegistroANS', 'Ano', 'Trimestre', 'Valor Despesas', 'Descricao']
-                    dfs.append(df[[c for c in cols if c in df.columns]])
-                    print(f"Lido: {file} ({len(df)} linhas)")
-                except: pass
+                    total += len(df)
+                    yield df
+                s.contar(linhas_mantidas=total)
+            print(f"Lido (streaming): {nome_zip}/{nome} ({total} linhas)")
+
+def filtrar_zip_para_particao(caminho_zip, nome_zip, particao, chunksize=CHUNK_LINHAS, periodo=None):
+    """Filtra um ZIP já baixado e grava a partição. Roda num processo do pool (parse é CPU-bound).
+    Devolve o número de linhas gravadas."""
+    os.makedirs(os.path.dirname(particao) or '.', exist_ok=True)
+    with EscritorConsolidado(particao) as escritor:
+        for df in ler_zip_em_chunks(caminho_zip, nome_zip, chunksize, periodo):
+            escritor(df)
+    return escritor.linhas
+
+def _filtrar_com_metricas(caminho_zip, nome_zip, particao, chunksize, periodo, memoria, perfil):
+    """filtrar_zip_para_particao num processo do pool; devolve também os spans medidos lá."""
+    coletor = metricas.configurar(memoria, perfil)
+    return filtrar_zip_para_particao(caminho_zip, nome_zip, particao, chunksize, periodo), coletor.exportar()
+
+def _filtrar_em_processo(pool, spool, nome_zip, particao, chunksize, periodo=None):
+    """Passa o ZIP do spool para um arquivo temporário e filtra num processo do pool."""
+    coletor = metricas.coletor()
+    with metricas.span('crawler.copia_para_processo', arquivo=nome_zip) as s, \
+            tempfile.NamedTemporaryFile(suffix='.zip', delete=False) as tmp:
+        shutil.copyfileobj(spool, tmp)
+        s.contar(bytes=tmp.tell())
+    try:
+        linhas, medido = pool.submit(_filtrar_com_metricas, tmp.name, nome_zip, particao, chunksize, periodo,
+                                     coletor.memoria, coletor.perfil).result()
+    finally:
+        os.remove(tmp.name)
+    coletor.incorporar(medido)
+    return linhas
+
+def ingerir_streaming(urls, motor, chunksize=CHUNK_LINHAS, consumidor=None):
+    """Baixa cada ZIP para um spool temporário e filtra os CSVs em chunks, sem extrair para o disco.
+    Com consumidor, os chunks são entregues assim que ficam prontos (nada é acumulado)."""
+    print("\n--- 2. Processando Despesas (streaming) ---")
+    tarefas = resolver_zips(urls, motor)
+    dfs = []
+    consumidor = consumidor or dfs.append
+    
+    def ingerir(tarefa):
+        _, url_zip = tarefa
+        nome_zip = url_zip.rstrip('/').split('/')[-1]
+        try:
+            spool, _ = motor.baixar_para_spool(url_zip)
+            with spool:
+                for df in ler_zip_em_chunks(spool, nome_zip, chunksize, extrair_periodo(url_zip)):
+                    consumidor(df)
+        except Exception as e:
+            print(f"Erro ao ingerir {url_zip}: {e}")
+    
+    motor.mapear(ingerir, tarefas)
     return pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame()
 
-def enriquecer_final(df_despesas):
-    print("\n--- 3. Enriquecimento (JOIN) ---")
+def caminho_particao(nome_zip, periodo=None):
+    """PASTA_PARTICOES/<zip>.csv. Se o nome do ZIP não tem período mas a URL tem, ele entra no nome
+    (ZIPs de anos diferentes com o mesmo nome não colidem)."""
+    base = re.sub(r'\.zip$', '', nome_zip, flags=re.I)
+    if periodo and not extrair_periodo(base): base = f"{rotulo_periodo(periodo)}_{base}"
+    return os.path.join(PASTA_PARTICOES, base + '.csv')
+
+def ingerir_incremental(urls, motor, manifesto, chunksize=CHUNK_LINHAS, pool=None):
+    """Como ingerir_streaming, mas cada ZIP vira uma partição em PASTA_PARTICOES.
+
+    ZIPs que respondem 304 (ou cujo hash não mudou) não são reprocessados.
+    Com pool (ProcessPoolExecutor), o download fica nas threads e o parse vai para os processos.
+    Devolve as partições dos trimestres pedidos, na ordem das URLs."""
+    print("\n--- 2. Processando Despesas (incremental) ---")
+    os.makedirs(PASTA_PARTICOES, exist_ok=True)
+    tarefas = resolver_zips(urls, motor)
     
-    garantir_cadastro()
+    def ingerir(tarefa):
+        _, url_zip = tarefa
+        nome_zip = url_zip.rstrip('/').split('/')[-1]
+        periodo = extrair_periodo(url_zip)
+        particao = caminho_particao(nome_zip, periodo)
+        existente = particao if os.path.exists(particao) else None
+        anterior = manifesto.entrada(url_zip)
+        try:
+            cabecalhos = manifesto.cabecalhos_condicionais(url_zip) if existente else None
+            spool, info = motor.baixar_para_spool(url_zip, cabecalhos)
+            if spool is None:
+                print(f"Sem alterações: {nome_zip}")
+                metricas.contar(zips_sem_alteracao=1)
+                return existente
+            with spool:
+                if existente and anterior.get('sha256') == info['sha256']:
+                    print(f"Sem alterações (mesmo conteúdo): {nome_zip}")
+                    metricas.contar(zips_sem_alteracao=1)
+                    manifesto.registrar(url_zip, info, particao)
+                    return existente
+                if pool is not None:
+                    linhas = _filtrar_em_processo(pool, spool, nome_zip, particao, chunksize, periodo)
+                else:
+                    linhas = filtrar_zip_para_particao(spool, nome_zip, particao, chunksize, periodo)
+            metricas.contar(zips_processados=1, linhas_particoes=linhas)
+            manifesto.registrar(url_zip, info, particao)
+            manifesto.marcar_alterado(url_zip)
+            return particao if linhas else None
+        except Exception as e:
+            print(f"Erro ao ingerir {url_zip}: {e}")
+            metricas.contar(zips_com_erro=1)
+            return existente
     
-    if os.path.exists(ARQUIVO_CADASTRO_LOCAL):
-        print(f"-> Lendo arquivo: {ARQUIVO_CADASTRO_LOCAL}")
-        df_cad = ler_csv_inteligente(ARQUIVO_CADASTRO_LOCAL)
-        
-        if df_cad.empty:
-            print("ERRO: O arquivo de cadastro parece vazio ou inválido.")
-            return df_despesas
+    with metricas.span('crawler.ingestao', zips=len(tarefas)):
+        return [p for p in motor.mapear(ingerir, tarefas) if p]
 
-        col_map = {c.strip().upper().replace('_', '').replace(' ', ''): c for c in df_cad.columns}
-        
-        col_registro = None
-        # ADICIONEI 'REGISTROOPERADORA' AQUI NA LISTA:
-        possiveis_nomes = ['REGISTROOPERADORA', 'REGISTROANS', 'CDOP', 'CODIGO', 'ANS', 'REGISTRO']
-        
-        for candidato in possiveis_nomes:
-            if candidato in col_map:
-                col_registro = col_map[candidato]
-                print(f"   -> Coluna chave identificada: '{col_registro}'")
-                break
-        
-        if col_registro:
-            df_cad.rename(columns={col_registro: 'RegistroANS'}, inplace=True)
-            
-            for k, v in col_map.items():
-                if 'CNPJ' in k: df_cad.rename(columns={v: 'CNPJ'}, inplace=True)
-                if 'RAZAO' in k or 'NOME' in k: df_cad.rename(columns={v: 'RazaoSocial'}, inplace=True)
-                if k == 'UF': df_cad.rename(columns={v: 'UF'}, inplace=True)
-
-            df_despesas['RegistroANS'] = pd.to_numeric(df_despesas['RegistroANS'], errors='coerce')
-            df_cad['RegistroANS'] = pd.to_numeric(df_cad['RegistroANS'], errors='coerce')
-            df_cad = df_cad.drop_duplicates(subset=['RegistroANS'])
-            
-            print("-> Realizando Merge...")
-            cols_join = [c for c in ['RegistroANS', 'CNPJ', 'RazaoSocial', 'UF'] if c in df_cad.columns]
-            
-            df_final = pd.merge(df_despesas, df_cad[cols_join], on='RegistroANS', how='left')
-            
-            if 'UF' in df_final.columns: df_final['UF'] = df_final['UF'].fillna('N/A')
-            
-            return df_final
-        else:
-            print("ERRO CRÍTICO: Não foi possível encontrar a coluna 'RegistroANS' no cadastro.")
-            print(f"Colunas disponíveis: {list(df_cad.columns)}")
-            return df_despesas
-    else:
-        print("ERRO: Não foi possível obter o cadastro.")
-        return df_despesas
+def ingerir_backfill(periodos_urls, motor, manifesto, chunksize=CHUNK_LINHAS, pool=None):
+    """Carga histórica, um período por vez: baixa, filtra para a partição e grava o manifesto antes do próximo.
 
-if __name__ == "__main__":
-    pasta = os.path.join(os.getcwd(), "downloads_ans")
+    A memória fica limitada aos chunks de um ZIP. Uma execução interrompida retoma de onde parou: os períodos
+    já registrados respondem 304 (ou têm o mesmo hash) e não são refeitos. Devolve as partições, em ordem."""
+    particoes = []
+    for periodo, grupo in itertools.groupby(periodos_urls, key=lambda item: item[0]):
+        urls = [u for _, u in grupo]
+        print(f"\n>>> Período {rotulo_periodo(periodo) if periodo else '(identificado pelo conteúdo)'}: {len(urls)} arquivo(s)")
+        particoes += ingerir_incremental(urls, motor, manifesto, chunksize, pool)
+        manifesto.salvar()
+    return particoes
+
+def consolidar_particoes(particoes, escritor, chunksize=CHUNK_LINHAS):
+    """Relê as partições em chunks e entrega ao escritor (que faz o JOIN e grava o consolidado)."""
+    for particao in particoes:
+        with metricas.span('crawler.consolidar_particao', arquivo=os.path.basename(particao)) as s:
+            s.contar(bytes=os.path.getsize(particao))
+            for chunk in pd.read_csv(particao, sep=';', encoding='utf-8-sig', chunksize=chunksize):
+                escritor(chunk)
+                s.contar(linhas=len(chunk))
+
+def carregar_cadastro(motor=None, manifesto=None):
+    """Baixa (se preciso) e normaliza o cadastro: RegistroANS + CNPJ/RazaoSocial/UF. None se indisponível."""
+    garantir_cadastro(motor, manifesto)
     
-    urls = listar_urls_trimestres()
-    for url in urls:
-        path = os.path.join(pasta, url.split('/')[-1].replace('.zip',''))
-        baixar_e_extrair(url, path)
-        
-    df = processar_despesas(pasta)
+    if not os.path.exists(ARQUIVO_CADASTRO_LOCAL):
+        print("ERRO: Não foi possível obter o cadastro.")
+        return None
+
+    print(f"-> Lendo arquivo: {ARQUIVO_CADASTRO_LOCAL}")
+    with metricas.span('crawler.ler_cadastro') as s:
+        df_cad = ler_cadastro(ARQUIVO_CADASTRO_LOCAL)
+        s.contar(linhas=len(df_cad), bytes=os.path.getsize(ARQUIVO_CADASTRO_LOCAL))
+    if df_cad.empty:
+        print("ERRO: O arquivo de cadastro parece vazio ou inválido.")
+        return None
     
-    if not df.empty:
+    return colunas_join(df_cad)
+
+def colunas_join(df_cad):
+    """Só as colunas do cadastro que entram no consolidado."""
+    return df_cad[[c for c in ['RegistroANS', 'CNPJ', 'RazaoSocial', 'UF'] if c in df_cad.columns]]
+
+def juntar_cadastro(df_despesas, df_cad):
+    """LEFT JOIN das despesas com o cadastro já normalizado."""
+    if df_cad is None: return df_despesas
+    df_despesas['RegistroANS'] = pd.to_numeric(df_despesas['RegistroANS'], errors='coerce')
+    df_final = pd.merge(df_despesas, df_cad, on='RegistroANS', how='left')
+    if 'UF' in df_final.columns: df_final['UF'] = df_final['UF'].fillna('N/A')
+    return df_final
+
+def enriquecer_final(df_despesas, motor=None):
+    print("\n--- 3. Enriquecimento (JOIN) ---")
+    df_cad = carregar_cadastro(motor)
+    if df_cad is None: return df_despesas
+    print("-> Realizando Merge...")
+    return juntar_cadastro(df_despesas, df_cad)
+
+class EscritorConsolidado:
+    """Recebe chunks filtrados, faz o JOIN com o cadastro e anexa direto no CSV consolidado.
+    Thread-safe: pode ser usado como consumidor pelos workers do modo streaming.
+    Grava num .tmp e só publica o arquivo (os.replace) no fechar(); em erro, use descartar().
+    Com parquet (EscritorParquet), cada chunk enriquecido também vai para o armazenamento colunar.
+    Com reter=True, os chunks gravados ficam em memória (tabela()) para as etapas seguintes do orquestrador."""
+
+    def __init__(self, arquivo, df_cad=None, parquet=None, reter=False):
+        self.arquivo = arquivo
+        self.df_cad = df_cad
+        self.parquet = parquet
+        self.retidos = [] if reter else None
+        self.linhas = 0
+        self.colunas = None
+        self._lock = threading.Lock()
+        self._tmp = arquivo + '.tmp'
+        self._f = open(self._tmp, 'w', encoding='utf-8-sig', newline='')
+
+    def __call__(self, df):
         try:
-            df_final = enriquecer_final(df)
+            df = juntar_cadastro(df, self.df_cad)
         except Exception as e:
             print(f"Erro inesperado no enriquecimento: {e}")
-            df_final = df
-        
-        arquivo_csv = "consolidado_despesas.csv"
-        df_final.to_csv(arquivo_csv, index=False, sep=';', encoding='utf-8-sig')
-        
-        with zipfile.ZipFile("consolidado_despesas.zip", 'w', zipfile.ZIP_DEFLATED) as z:
-            z.write(arquivo_csv)
-            
-        print(f"\nSUCESSO TOTAL! {arquivo_csv} gerado.")
+        with self._lock:
+            if self.colunas is None: self.colunas = list(df.columns)
+            df = df.reindex(columns=self.colunas)
+            df.to_csv(self._f, index=False, sep=';', header=self.linhas == 0)
+            if self.parquet: self.parquet(df)
+            if self.retidos is not None: self.retidos.append(df)
+            self.linhas += len(df)
+
+    def tabela(self):
+        """Consolidado completo já enriquecido (só com reter=True)."""
+        return pd.concat(self.retidos, ignore_index=True) if self.retidos else pd.DataFrame(columns=self.colunas or [])
+
+    def fechar(self):
+        """Publica o arquivo. Sem nenhuma linha, o arquivo anterior (se houver) é mantido."""
+        self._f.close()
+        if self.linhas: os.replace(self._tmp, self.arquivo)
+        else: os.remove(self._tmp)
+        if self.parquet: self.parquet.fechar()
+        elif self.linhas: remover_parquet()  # sem Parquet novo (--sem-parquet ou sem pyarrow), o antigo não vale mais
+
+    def descartar(self):
+        self._f.close()
+        os.remove(self._tmp)
+        if self.parquet: self.parquet.descartar()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo_erro, *_):
+        if tipo_erro: self.descartar()
+        else: self.fechar()
+
+def consolidado_em_dia(manifesto, particoes, gerar_parquet, arquivo_csv=ARQUIVO_CONSOLIDADO):
+    """Nada novo na ANS: mesmas partições do último consolidado e nenhum ZIP alterado."""
+    return (not manifesto.alterados and os.path.exists(arquivo_csv)
+            and (parquet_existe() or not gerar_parquet)
+            and manifesto.consolidado().get('particoes') == particoes)
+
+def publicar_consolidado(escritor, particoes, manifesto, arquivo_csv=ARQUIVO_CONSOLIDADO):
+    """Fecha o escritor, gera o ZIP e registra o consolidado no manifesto. Devolve o total de linhas."""
+    with metricas.span('crawler.publicar_consolidado') as s:
+        escritor.fechar()
+        if escritor.linhas:
+            with zipfile.ZipFile("consolidado_despesas.zip", 'w', zipfile.ZIP_DEFLATED) as z:
+                z.write(arquivo_csv)
+            s.contar(linhas=escritor.linhas, bytes=os.path.getsize(arquivo_csv))
+            # No modo extrair não há partições: o registro vazio avisa a etapa 2 para não usar o estado incremental
+            manifesto.registrar_consolidado(particoes=particoes, linhas=escritor.linhas)
+    return escritor.linhas
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crawler e consolidação das despesas da ANS")
+    parser.add_argument("--modo", choices=["streaming", "extrair"], default="streaming",
+                        help="streaming: lê os CSVs direto dos ZIPs (incremental); extrair: salva em downloads_ans/ e relê do disco")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_LINHAS, help="Linhas por chunk (0 = arquivo inteiro em memória)")
+    parser.add_argument("--forcar", action="store_true", help="Ignora o manifesto e reprocessa tudo")
+    parser.add_argument("--sem-parquet", action="store_true", help="Não gera o armazenamento Parquet (só CSV/ZIP)")
+    parser.add_argument("--de", help="Carga histórica a partir deste período (2013, 2013-2T ou 2T2013)")
+    parser.add_argument("--ate", help="Fim da carga histórica (padrão: o ano atual)")
+    metricas.adicionar_argumentos(parser)
+    args = parser.parse_args()
+    if args.ate and not args.de: parser.error("--ate exige --de")
+    try:
+        intervalo_pedido = (ler_periodo(args.de), ler_periodo(args.ate or str(date.today().year), fim=True)) if args.de else None
+    except ValueError as e:
+        parser.error(str(e))
+    metricas.configurar_pelos_argumentos(args)
+    
+    pasta = os.path.join(os.getcwd(), "downloads_ans")
+    arquivo_csv = ARQUIVO_CONSOLIDADO
+    chunksize = args.chunksize or None
+    
+    motor = MotorDownload()
+    manifesto = Manifesto(ignorar_anterior=args.forcar)
+    if intervalo_pedido:
+        intervalo = listar_urls_intervalo(*intervalo_pedido, motor)
+        urls = [u for _, u in intervalo]
+    else:
+        urls = listar_urls_trimestres(motor)
+    
+    if args.modo == "streaming":
+        particoes = ingerir_backfill(intervalo, motor, manifesto, chunksize) if intervalo_pedido else \
+            ingerir_incremental(urls, motor, manifesto, chunksize)
+    
+    # O cadastro é carregado antes da gravação para que cada chunk já seja gravado enriquecido
+    print("\n--- Cadastro de Operadoras ---")
+    df_cad = carregar_cadastro(motor, manifesto)
+    
+    gerar_parquet = PARQUET_DISPONIVEL and not args.sem_parquet
+    if args.modo == "streaming" and consolidado_em_dia(manifesto, particoes, gerar_parquet, arquivo_csv):
+        print("\nNada novo na ANS: consolidado já está atualizado.")
+        manifesto.salvar()
+        motor.imprimir_resumo()
+        motor.fechar()
+        metricas.salvar_relatorio(args.metricas)
+        raise SystemExit(0)
+    
+    escritor = EscritorConsolidado(arquivo_csv, df_cad, EscritorParquet() if gerar_parquet else None)
+    try:
+        if args.modo == "streaming":
+            consolidar_particoes(particoes, escritor, chunksize)
+        else:
+            baixar_todos(urls, pasta, motor)
+            processar_despesas(pasta, chunksize, escritor)
+    except BaseException:
+        escritor.descartar()
+        raise
+    
+    if publicar_consolidado(escritor, particoes if args.modo == "streaming" else None, manifesto, arquivo_csv):
+        print(f"\nSUCESSO TOTAL! {arquivo_csv} gerado ({escritor.linhas} linhas)."
+              + (" Parquet atualizado." if gerar_parquet else ""))
         
-        cols_view = [c for c in ['RegistroANS', 'CNPJ', 'RazaoSocial', 'UF'] if c in df_final.columns]
-        print(df_final[cols_view].head())
+        cols_view = [c for c in ['RegistroANS', 'CNPJ', 'RazaoSocial', 'UF'] if c in escritor.colunas]
+        print(pd.read_csv(arquivo_csv, sep=';', encoding='utf-8-sig', nrows=5)[cols_view])
     else:
-        print("Nenhum dado encontrado.")
\ No newline at end of file
+        print("Nenhum dado encontrado.")
+
+    manifesto.salvar()
+    motor.imprimir_resumo()
+    motor.fechar()
+    metricas.salvar_relatorio(args.metricas)
@@ -1,12 +1,24 @@
 import pandas as pd
+import numpy as np
 import zipfile
 import os
 import re
+import json
+import argparse
+from armazenamento import ler_despesas, parquet_existe
+from leitor_csv import ler_cadastro
+from manifesto import Manifesto
+import metricas
 
 ARQUIVO_ENTRADA = "consolidado_despesas.csv"
+ARQUIVO_CADASTRO = "Relatorio_cadop.csv"
 ARQUIVO_SAIDA_CSV = "despesas_agregadas.csv"
 ARQUIVO_SAIDA_ZIP = "Teste_Tiago_Rodrigues.zip"
 
+# Estado incremental: momentos parciais (n, soma, M2) por partição do crawler e RegistroANS
+ARQUIVO_ESTADO = "estado_agregados.csv"
+ARQUIVO_ESTADO_INDICE = "estado_agregados.json"
+
 def validar_cnpj(cnpj):
     """Valida formato e matemática do CNPJ."""
     if pd.isna(cnpj): return False
@@ -23,25 +35,108 @@ def validar_cnpj(cnpj):
     d2 = 0 if d2 < 2 else 11 - d2
     return int(cnpj[13]) == d2
 
-def executar():
-    print("--- INICIANDO TESTE 2 (VERSÃO LIMPA) ---")
+PESOS1 = np.array([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+PESOS2 = np.array([6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+
+def validar_cnpjs(serie):
+    """Versão vetorizada de validar_cnpj: mesmo resultado, linha a linha, para uma Series inteira.
+
+    Valida só os valores distintos (há ~1 mil operadoras para milhões de linhas), calcula os
+    dígitos verificadores com produto matriz-vetor e mapeia o resultado de volta."""
+    # Em colunas object com tipos misturados, 123 e 123.0 cairiam no mesmo valor distinto,
+    # mas str() dá resultados diferentes: nesse caso converte tudo para texto antes
+    if serie.dtype == object and pd.api.types.infer_dtype(serie) not in ('string', 'integer', 'floating', 'empty'):
+        serie = serie.astype(str)
+    codigos, unicos = pd.factorize(serie)  # nulos recebem código -1
+    textos = pd.Series([str(v) for v in unicos], dtype=object).str.replace(r'[^0-9]', '', regex=True)
     
-    if not os.path.exists(ARQUIVO_ENTRADA):
-        print(f"Erro: {ARQUIVO_ENTRADA} não encontrado. Rode main.py antes.")
-        return
+    valido = np.zeros(len(unicos), dtype=bool)
+    tam14 = (textos.str.len() == 14).to_numpy()
+    if tam14.any():
+        m = np.frombuffer(''.join(textos[tam14]).encode('ascii'), dtype=np.uint8).reshape(-1, 14).astype(np.int64) - 48
+        
+        d1 = m[:, :12] @ PESOS1 % 11
+        d1 = np.where(d1 < 2, 0, 11 - d1)
+        d2 = m[:, :13] @ PESOS2 % 11
+        d2 = np.where(d2 < 2, 0, 11 - d2)
+        repetido = (m == m[:, :1]).all(axis=1)
+        
+        valido[tam14] = ~repetido & (m[:, 12] == d1) & (m[:, 13] == d2)
+    
+    # Código -1 (nulo) cai no False extra do final
+    return pd.Series(np.append(valido, False)[codigos], index=serie.index)
 
-    # 1. Carrega (assumindo que main.py fez o trabalho direito)
+def momentos_particao(df):
+    """Momentos parciais por RegistroANS (só valores > 0): n, soma e M2 = soma dos desvios².
+
+    Não dependem do cadastro, então continuam válidos mesmo se o Relatorio_cadop mudar."""
+    df = pd.DataFrame({'RegistroANS': pd.to_numeric(df['RegistroANS'], errors='coerce'),
+                       'v': pd.to_numeric(df['Valor Despesas'], errors='coerce').fillna(0)})
+    df = df[(df['v'] > 0) & df['RegistroANS'].notna()]
+    g = df.groupby('RegistroANS')['v']
+    est = g.agg(n='count', soma='sum')
+    est['m2'] = g.var(ddof=0) * est['n']
+    return est.reset_index()
+
+def combinar_momentos(est, chaves):
+    """Combina momentos parciais por grupo (fórmula paralela de Chan) -> n, soma, m2 por chave."""
+    est = est.assign(media_i=est['soma'] / est['n'])
+    g = est.groupby(chaves, observed=True)
+    media = g['soma'].transform('sum') / g['n'].transform('sum')
+    est['m2_c'] = est['m2'] + est['n'] * (est['media_i'] - media) ** 2
+    return est.groupby(chaves, observed=True).agg(n=('n', 'sum'), soma=('soma', 'sum'), m2=('m2_c', 'sum')).reset_index()
+
+def _impressao_digital(caminho):
+    st = os.stat(caminho)
+    return {'tamanho': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+def atualizar_estado(particoes):
+    """Recalcula só as partições novas/alteradas e descarta as que saíram. Devolve o estado completo."""
+    indice = {}
+    estado = pd.DataFrame(columns=['particao', 'RegistroANS', 'n', 'soma', 'm2'])
+    if os.path.exists(ARQUIVO_ESTADO) and os.path.exists(ARQUIVO_ESTADO_INDICE):
+        with open(ARQUIVO_ESTADO_INDICE, encoding='utf-8') as f: indice = json.load(f)
+        estado = pd.read_csv(ARQUIVO_ESTADO, sep=';')
+    
+    validas = {p for p in particoes if indice.get(p) == _impressao_digital(p)}
+    estado = estado[estado['particao'].isin(validas)]
+    novas = [p for p in particoes if p not in validas]
+    print(f"   Partições reaproveitadas: {len(validas)} | recalculadas: {len(novas)}")
+    
+    partes = [estado]
+    for p in novas:
+        with metricas.span('transformacao.momentos_particao', arquivo=os.path.basename(p)) as s:
+            df = pd.read_csv(p, sep=';', encoding='utf-8-sig', usecols=['RegistroANS', 'Valor Despesas'])
+            partes.append(momentos_particao(df).assign(particao=p))
+            s.contar(linhas=len(df), bytes=os.path.getsize(p))
+    estado = pd.concat(partes, ignore_index=True).astype({'RegistroANS': 'int64', 'n': 'int64', 'soma': 'float64', 'm2': 'float64'})
+    
+    estado.to_csv(ARQUIVO_ESTADO, index=False, sep=';')
+    with open(ARQUIVO_ESTADO_INDICE, 'w', encoding='utf-8') as f:
+        json.dump({p: _impressao_digital(p) for p in particoes}, f, indent=1)
+    return estado
+
+def agregar_completo(df_consolidado=None):
+    """Caminho original: relê o consolidado inteiro e agrega de uma vez.
+    df_consolidado: o consolidado já em memória (orquestrador), sem reler o arquivo."""
+    # Só as colunas usadas; vem do Parquet quando existir
     print("1. Carregando dados...")
-    df = pd.read_csv(ARQUIVO_ENTRADA, sep=';', encoding='utf-8-sig')
+    colunas = ['CNPJ', 'RazaoSocial', 'UF', 'Valor Despesas']
+    with metricas.span('transformacao.leitura') as s:
+        if df_consolidado is None: df = ler_despesas(colunas=colunas)
+        else: df = df_consolidado[[c for c in colunas if c in df_consolidado.columns]].copy()
+        s.contar(linhas=len(df))
     
     # 2. Validação
     print("2. Validando dados...")
-    df['CNPJ_Valido'] = df['CNPJ'].apply(validar_cnpj)
-    df['Valor Despesas'] = pd.to_numeric(df['Valor Despesas'], errors='coerce').fillna(0)
-    df['Valor_Valido'] = df['Valor Despesas'] > 0
-    
-    # Filtro
-    df_clean = df[df['CNPJ_Valido'] & df['Valor_Valido']].copy()
+    with metricas.span('transformacao.validacao') as s:
+        df['CNPJ_Valido'] = validar_cnpjs(df['CNPJ'])
+        df['Valor Despesas'] = pd.to_numeric(df['Valor Despesas'], errors='coerce').fillna(0)
+        df['Valor_Valido'] = df['Valor Despesas'] > 0
+        
+        # Filtro
+        df_clean = df[df['CNPJ_Valido'] & df['Valor_Valido']].copy()
+        s.contar(linhas=len(df), linhas_validas=len(df_clean))
     print(f"   Total: {len(df)} -> Válidos: {len(df_clean)}")
     
     # 3. Agregação
@@ -49,12 +144,80 @@ def executar():
     if 'UF' not in df_clean.columns: df_clean['UF'] = 'N/A'
     df_clean['UF'] = df_clean['UF'].fillna('N/A')
     
-    df_agg = df_clean.groupby(['RazaoSocial', 'UF']).agg({
-        'Valor Despesas': ['sum', 'mean', 'std', 'count']
-    })
+    with metricas.span('transformacao.agregacao') as s:
+        df_agg = df_clean.groupby(['RazaoSocial', 'UF'], observed=True).agg({
+            'Valor Despesas': ['sum', 'mean', 'std', 'count']
+        })
+        s.contar(linhas=len(df_clean))
     
     df_agg.columns = ['Valor_Total', 'Media_Trimestral', 'Desvio_Padrao', 'Qtd_Registros']
-    df_agg = df_agg.reset_index()
+    return df_agg.reset_index()
+
+def agregar_incremental(particoes):
+    """Agrega a partir do estado por partição: só os trimestres novos/alterados são lidos."""
+    print("1. Atualizando estado incremental...")
+    with metricas.span('transformacao.estado_incremental') as s:
+        estado = atualizar_estado(particoes)
+        s.contar(linhas=len(estado))
+    
+    print("2. Validando dados (cadastro)...")
+    with metricas.span('transformacao.validacao') as s:
+        df_cad = ler_cadastro(ARQUIVO_CADASTRO)
+        cols_cad = [c for c in ['RegistroANS', 'CNPJ', 'RazaoSocial', 'UF'] if c in df_cad.columns]
+        df_cad = df_cad[cols_cad]
+        s.contar(linhas=len(df_cad))
+        df_cad = df_cad[validar_cnpjs(df_cad['CNPJ'])]
+        s.contar(linhas_validas=len(df_cad))
+    
+    est = estado.merge(df_cad, on='RegistroANS', how='inner')
+    if 'UF' not in est.columns: est['UF'] = 'N/A'
+    est['UF'] = est['UF'].fillna('N/A')
+    print(f"   Operadoras com CNPJ válido: {est['RegistroANS'].nunique()}")
+    
+    print("3. Gerando estatísticas...")
+    with metricas.span('transformacao.agregacao') as s:
+        df_agg = combinar_momentos(est, ['RazaoSocial', 'UF'])
+        s.contar(linhas=len(est))
+    n = df_agg['n']
+    return pd.DataFrame({
+        'RazaoSocial': df_agg['RazaoSocial'],
+        'UF': df_agg['UF'],
+        'Valor_Total': df_agg['soma'],
+        'Media_Trimestral': df_agg['soma'] / n,
+        'Desvio_Padrao': np.sqrt(df_agg['m2'].clip(lower=0) / (n - 1)).where(n > 1),
+        'Qtd_Registros': n,
+    })
+
+def particoes_do_consolidado(particoes=None):
+    """Partições usadas pelo crawler no último consolidado (None se não der para usar o incremental).
+
+    particoes: as da execução atual (orquestrador); sem elas, vale o manifesto gravado em disco."""
+    if particoes is None: particoes = Manifesto().consolidado().get('particoes')
+    if not particoes or not all(os.path.exists(p) for p in particoes): return None
+    if not os.path.exists(ARQUIVO_CADASTRO): return None
+    return particoes
+
+def executar(completo=False, verificar=False, df_consolidado=None, particoes=None):
+    """df_consolidado: o consolidado já em memória. Quando vem, ele é a fonte dos números (agregação completa):
+    o estado incremental só é usado quando a etapa relê o consolidado do disco.
+    particoes: as partições que geraram o consolidado nesta execução (o manifesto em disco só é gravado no fim)."""
+    print("--- INICIANDO TESTE 2 (VERSÃO LIMPA) ---")
+    
+    if df_consolidado is None and not os.path.exists(ARQUIVO_ENTRADA) and not parquet_existe():
+        print(f"Erro: {ARQUIVO_ENTRADA} não encontrado. Rode main.py antes.")
+        return
+
+    # As partições do manifesto podem não ser as que geraram o consolidado recebido
+    particoes = None if completo or df_consolidado is not None else particoes_do_consolidado(particoes)
+    if particoes:
+        df_agg = agregar_incremental(particoes)
+        if verificar:
+            print("   Verificando contra o recálculo completo...")
+            indexar = lambda d: d.astype({'RazaoSocial': str, 'UF': str}).set_index(['RazaoSocial', 'UF']).sort_index()
+            pd.testing.assert_frame_equal(indexar(df_agg), indexar(agregar_completo(df_consolidado)), check_dtype=False, rtol=1e-9)
+            print("   OK: incremental == completo")
+    else:
+        df_agg = agregar_completo(df_consolidado)
     
     # Formatação
     df_agg['Valor_Total'] = df_agg['Valor_Total'].round(2)
@@ -64,13 +227,24 @@ def executar():
     
     # 4. Salvar
     print("4. Salvando...")
-    df_agg.to_csv(ARQUIVO_SAIDA_CSV, index=False, sep=';', encoding='utf-8-sig')
-    
-    with zipfile.ZipFile(ARQUIVO_SAIDA_ZIP, 'w', zipfile.ZIP_DEFLATED) as z:
-        z.write(ARQUIVO_SAIDA_CSV)
+    with metricas.span('transformacao.escrita') as s:
+        df_agg.to_csv(ARQUIVO_SAIDA_CSV, index=False, sep=';', encoding='utf-8-sig')
+        
+        with zipfile.ZipFile(ARQUIVO_SAIDA_ZIP, 'w', zipfile.ZIP_DEFLATED) as z:
+            z.write(ARQUIVO_SAIDA_CSV)
+        s.contar(linhas=len(df_agg), bytes=os.path.getsize(ARQUIVO_SAIDA_CSV))
         
     print(f"\nSUCESSO! Zip gerado: {ARQUIVO_SAIDA_ZIP}")
     print(df_agg.head())
 
 if __name__ == "__main__":
-    executar()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Validação e agregação das despesas")
+    parser.add_argument("--completo", action="store_true", help="Ignora o estado incremental e relê o consolidado inteiro")
+    parser.add_argument("--verificar", action="store_true", help="Confere o resultado incremental contra o recálculo completo")
+    metricas.adicionar_argumentos(parser)
+    args = parser.parse_args()
+    metricas.configurar_pelos_argumentos(args)
+    try:
+        executar(args.completo, args.verificar)
+    finally:
+        metricas.salvar_relatorio(args.metricas)
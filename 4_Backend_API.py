@@ -1,11 +1,29 @@
-import pandas as pd
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Header, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from contextlib import asynccontextmanager
 from typing import Optional
 import math
 import os
+import re
+import numpy as np
+from armazenamento import PASTA_PARQUET, PARQUET_DISPONIVEL
+from indices_api import etag_confere, dumps_json, codificar_cursor, decodificar_cursor, normalizar_texto
+from recarga_api import Recarregador
+from tabela_compacta import relatorio_memoria
+from cubo_api import DIMENSOES
+from exportacao_api import FORMATOS, exportar
+from cache_api import CacheRespostas, escolher_codificacao
+from snapshot_api import ler_tabelas, montar_snapshot, abrir_snapshot, impressao_digital, PASTA_SNAPSHOT
 
-app = FastAPI(title="Intuitive Care API", version="1.0.0")
+@asynccontextmanager
+async def ciclo_de_vida(app):
+    # O vigia de arquivos roda só enquanto o servidor estiver de pé
+    recarregador.iniciar()
+    yield
+    recarregador.parar()
+
+app = FastAPI(title="Intuitive Care API", version="1.0.0", lifespan=ciclo_de_vida)
 
 app.add_middleware(
     CORSMiddleware,
@@ -13,151 +31,265 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Total-Count", "X-Next-Cursor"],
 )
 
 # --- CONFIGURAÇÕES ---
 ARQUIVO_DESPESAS = "consolidado_despesas.csv"
 ARQUIVO_CADASTRO = "Relatorio_cadop.csv"
+CACHE_CONTROL_ESTATISTICAS = "public, max-age=60, must-revalidate"
+INTERVALO_RECARGA = float(os.environ.get("ANS_RECARGA_INTERVALO", "2"))  # segundos; 0 desliga o vigia
+TOKEN_ADMIN = os.environ.get("ANS_ADMIN_TOKEN")  # se definido, exigido em X-Admin-Token nas rotas /api/admin
+LIMITE_JSON = 1000     # acima disso /api/operadoras responde em NDJSON, linha a linha
+BLOCO_NDJSON = 1000    # linhas por pedaço enviado no streaming
+LIMITE_ANALISES = 100  # top N máximo das rotas /api/analises
+PADRAO_TRIMESTRE = "^[1-4][Tt]?$"  # 3 ou 3T
+CACHE_ITENS = int(os.environ.get("ANS_CACHE_ITENS", "1024"))  # respostas prontas guardadas (despesas e busca)
+CACHE_MB = float(os.environ.get("ANS_CACHE_MB", "64"))
+CACHE_TTL = float(os.environ.get("ANS_CACHE_TTL", "300"))     # segundos; 0 = só a troca de versão invalida
 
-# Variáveis globais para armazenar os dados na memória
-df_despesas = pd.DataFrame()
-df_operadoras = pd.DataFrame()
+def impressao_digital_dados():
+    """Muda sempre que o pipeline grava uma nova saída (inclusive um snapshot binário novo)."""
+    return impressao_digital([ARQUIVO_DESPESAS, PASTA_PARQUET, ARQUIVO_CADASTRO, PASTA_SNAPSHOT])
 
-def carregar_dados_blindado():
-    """Carrega e força a tipagem correta para o JOIN funcionar."""
+def carregar_dados_blindado(versao=None):
+    """Carrega e força a tipagem correta para o JOIN funcionar. Devolve um Snapshot completo (nada global é tocado)."""
     print("--- INICIANDO CARGA DE DADOS ---")
-    
-    global df_despesas, df_operadoras
-    
-    # 1. Carrega Despesas
-    if os.path.exists(ARQUIVO_DESPESAS):
-        try:
-            df_d = pd.read_csv(ARQUIVO_DESPESAS, sep=';', encoding='utf-8-sig')
-            # FORÇA O REGISTRO ANS SER INTEIRO (Remove .0 se existir)
-            df_d['RegistroANS'] = pd.to_numeric(df_d['RegistroANS'], errors='coerce').fillna(0).astype(int)
-            print(f"-> Despesas carregadas: {len(df_d)} registros.")
-        except Exception as e:
-            print(f"Erro ao ler despesas: {e}")
-            df_d = pd.DataFrame()
-    else:
-        print("ERRO: consolidado_despesas.csv não encontrado.")
-        df_d = pd.DataFrame()
-
-    # 2. Carrega Cadastro
-    if os.path.exists(ARQUIVO_CADASTRO):
-        try:
-            # Tenta ler com ; ou ,
-            try:
-                df_c = pd.read_csv(ARQUIVO_CADASTRO, sep=';', encoding='utf-8', on_bad_lines='skip')
-            except:
-                df_c = pd.read_csv(ARQUIVO_CADASTRO, sep=';', encoding='latin1', on_bad_lines='skip')
-            
-            # Normaliza nomes de colunas
-            df_c.columns = [c.strip().upper().replace('_', '').replace(' ', '') for c in df_c.columns]
-            
-            # Acha as colunas certas
-            col_reg = next((c for c in df_c.columns if 'REGISTRO' in c or 'CDOP' in c), None)
-            col_cnpj = next((c for c in df_c.columns if 'CNPJ' in c), 'CNPJ')
-            col_razao = next((c for c in df_c.columns if 'RAZAO' in c or 'NOME' in c), 'RazaoSocial')
-            col_uf = next((c for c in df_c.columns if 'UF' in c), 'UF')
-
-            if col_reg:
-                df_c = df_c.rename(columns={col_reg: 'RegistroANS', col_cnpj: 'CNPJ', col_razao: 'RazaoSocial', col_uf: 'UF'})
-                # FORÇA O REGISTRO ANS SER INTEIRO AQUI TAMBÉM
-                df_c['RegistroANS'] = pd.to_numeric(df_c['RegistroANS'], errors='coerce').fillna(0).astype(int)
-                
-                # Remove duplicatas
-                df_c = df_c.drop_duplicates(subset=['RegistroANS'])
-                print(f"-> Operadoras carregadas: {len(df_c)} registros.")
-            else:
-                print("ERRO: Coluna RegistroANS não encontrada no cadastro.")
-                df_c = pd.DataFrame()
-        except Exception as e:
-            print(f"Erro ao ler cadastro: {e}")
-            df_c = pd.DataFrame()
-    else:
-        print("ERRO: Relatorio_cadop.csv não encontrado.")
-        df_c = pd.DataFrame()
-
-    df_despesas = df_d
-    df_operadoras = df_c
+
+    # 1. Snapshot binário do pipeline (mmap, milissegundos), se estiver em dia com os arquivos
+    snap = abrir_snapshot(impressao_digital([ARQUIVO_DESPESAS, PASTA_PARQUET, ARQUIVO_CADASTRO]), PASTA_SNAPSHOT, versao)
+    if snap is not None: return snap
+
+    # 2. Senão, lê Parquet/CSV e monta índices e estatísticas aqui
+    # (sem guardar a tabela larga lida: só a versão compacta fica em memória)
+    return montar_snapshot(versao, *ler_tabelas(ARQUIVO_DESPESAS, ARQUIVO_CADASTRO))
+
+cache_respostas = CacheRespostas(CACHE_ITENS, int(CACHE_MB * 1024 * 1024), CACHE_TTL)
+recarregador = Recarregador(carregar_dados_blindado, impressao_digital_dados, INTERVALO_RECARGA)
 
 # Executa a carga ao iniciar
-carregar_dados_blindado()
+recarregador.recarregar()
+
+def dados():
+    """Snapshot atual. Cada rota pega a referência uma vez e usa só ela até o fim.
+    Até a primeira carga dar certo, responde 503 (a vigia continua tentando)."""
+    snap = recarregador.atual
+    if snap is None:
+        raise HTTPException(status_code=503, detail="Dados ainda não carregados; tente novamente em instantes.")
+    return snap
 
 # --- ROTAS ---
 
+def _ndjson(indice, posicoes, campos):
+    for ini in range(0, len(posicoes), BLOCO_NDJSON):
+        linhas = indice.pagina(posicoes[ini:ini + BLOCO_NDJSON].tolist(), campos)
+        yield b"".join(dumps_json(linha) + b"\n" for linha in linhas)
+
+def _resposta_cacheada(request, snap, chave, montar):
+    """Resposta JSON pronta do cache (montada e comprimida só na primeira vez), com ETag/304 e gzip/br."""
+    entrada = cache_respostas.obter(snap.versao, chave, montar)
+    pedido = request.headers if request is not None else {}  # chamada direta, fora do HTTP
+    # A codificação vem antes do 304: o ETag é o da representação que seria enviada
+    codificacao = escolher_codificacao(pedido.get("accept-encoding"), entrada.corpos)
+    cabecalhos = {"ETag": entrada.etags[codificacao], "Vary": "Accept-Encoding"}
+    if etag_confere(pedido.get("if-none-match"), entrada.etags[codificacao]):
+        cache_respostas.registrar_nao_modificado()
+        return Response(status_code=304, headers=cabecalhos)
+    if codificacao: cabecalhos["Content-Encoding"] = codificacao
+    return Response(content=entrada.corpos[codificacao], media_type="application/json", headers=cabecalhos)
+
 @app.get("/api/operadoras")
-def listar_operadoras(page: int = Query(1), limit: int = Query(10), search: Optional[str] = None):
-    if df_operadoras.empty: return {"data": [], "meta": {"total": 0}}
-
-    df_filt = df_operadoras.copy()
-    if search:
-        s = search.lower()
-        df_filt = df_filt[
-            df_filt['RazaoSocial'].astype(str).str.lower().str.contains(s, na=False) |
-            df_filt['CNPJ'].astype(str).str.contains(s, na=False) |
-            df_filt['RegistroANS'].astype(str).str.contains(s, na=False) # Busca também por Registro
-        ]
-
-    total = len(df_filt)
-    start = (page - 1) * limit
-    end = start + limit
-    
-    data = df_filt.iloc[start:end].fillna("").to_dict(orient="records")
-    return {"data": data, "meta": {"total": total, "page": page, "limit": limit, "total_pages": math.ceil(total/limit)}}
+def listar_operadoras(page: int = Query(1, ge=1), limit: int = Query(10, ge=1), search: Optional[str] = None,
+                      cursor: Optional[str] = None, fields: Optional[str] = None,
+                      formato: Optional[str] = Query(None, pattern="^(json|ndjson)$"), request: Request = None):
+    """Lista paginada do cadastro, em ordem de RegistroANS (ou do ranking, com search).
 
-@app.get("/api/operadoras/{identificador}/despesas")
-def get_despesas(identificador: str):
-    """Busca despesas pelo Registro ANS ou CNPJ."""
-    if df_despesas.empty: return []
+    cursor: o meta.next_cursor da página anterior (paginação por chave, custo constante em qualquer
+    profundidade); fields: colunas separadas por vírgula; formato=ndjson (padrão acima de LIMITE_JSON linhas)."""
+    snap = dados()
+    if snap.df_operadoras.empty: return {"data": [], "meta": {"total": 0}}
+    indice = snap.indice_operadoras
 
-    # Limpa o identificador (remove pontos e traços se for CNPJ)
-    id_clean = ''.join(filter(str.isdigit, str(identificador)))
-    
-    registro_alvo = None
+    campos = None
+    if fields:
+        campos = [c.strip() for c in fields.split(",") if c.strip()]
+        desconhecidos = [c for c in campos if c not in indice.colunas]
+        if desconhecidos: raise HTTPException(status_code=400, detail=f"Campos desconhecidos: {', '.join(desconhecidos)}")
+    consulta = normalizar_texto(search) if search else ""
 
-    # 1. Tenta achar qual é o RegistroANS desse identificador
-    # Verifica se o ID passado já é um Registro ANS válido (existe na lista de operadoras)
-    try:
-        id_int = int(id_clean)
-        if id_int in df_operadoras['RegistroANS'].values:
-            registro_alvo = id_int
-    except: pass
+    def paginar():
+        # posições já na ordem da listagem e a chave (crescente) de cada uma
+        if search: posicoes, chaves = snap.indice_busca.ranquear(search)
+        else: posicoes, chaves = indice.ordem, indice.registros_ordenados
+        total = len(posicoes)
 
-    # Se não achou direto, procura pelo CNPJ
-    if registro_alvo is None:
-        op = df_operadoras[df_operadoras['CNPJ'].astype(str).str.replace(r'[^0-9]', '', regex=True) == id_clean]
-        if not op.empty:
-            registro_alvo = op.iloc[0]['RegistroANS']
-    
+        if cursor:
+            try:
+                dados_cursor = decodificar_cursor(cursor)
+                if dados_cursor.get("q", "") != consulta: raise ValueError("cursor de outra busca")
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Cursor inválido.")
+            start = int(np.searchsorted(chaves, dados_cursor["k"], side="right"))
+        else:
+            start = (page - 1) * limit
+        end = start + limit
+        next_cursor = codificar_cursor({"k": int(chaves[end - 1]), "q": consulta}) if 0 <= start and 0 < end < total else None
+        return posicoes[start:end], total, next_cursor
+
+    if formato == "ndjson" or (formato is None and limit > LIMITE_JSON):
+        pagina, total, next_cursor = paginar()
+        cabecalhos = {"X-Total-Count": str(total)}
+        if next_cursor: cabecalhos["X-Next-Cursor"] = next_cursor
+        return StreamingResponse(_ndjson(indice, pagina, campos), media_type="application/x-ndjson", headers=cabecalhos)
+
+    def montar():
+        pagina, total, next_cursor = paginar()
+        meta = {"total": total, "page": page, "limit": limit, "total_pages": math.ceil(total/limit), "next_cursor": next_cursor}
+        return {"data": indice.pagina(pagina.tolist(), campos), "meta": meta}
+
+    # A busca entra na chave já normalizada: 'São  Paulo' e 'sao paulo' usam a mesma resposta
+    chave = ("operadoras", consulta, page, cursor, limit, tuple(campos) if campos else None)
+    return _resposta_cacheada(request, snap, chave, montar)
+
+@app.get("/api/operadoras/{identificador}/despesas")
+def get_despesas(identificador: str, request: Request = None):
+    """Busca despesas pelo Registro ANS ou CNPJ."""
+    snap = dados()
+    if snap.df_despesas.empty: return []
+
+    # Registro ANS ou CNPJ (com ou sem máscara) -> RegistroANS, via dicionário
+    registro_alvo = snap.indice_operadoras.resolver(identificador)
     if registro_alvo is None:
         print(f"Aviso: Operadora {identificador} não encontrada.")
         return []
 
-    # 2. Filtra as despesas usando o RegistroANS (Inteiro)
-    print(f"Buscando despesas para RegistroANS: {registro_alvo}")
-    filtro = df_despesas[df_despesas['RegistroANS'] == registro_alvo].copy()
-    
-    if filtro.empty:
-        return []
-
-    return filtro.sort_values(by=['Ano', 'Trimestre'])[['Ano', 'Trimestre', 'Valor Despesas', 'Descricao']].fillna("").to_dict(orient="records")
+    # Despesas já ordenadas por Ano/Trimestre dentro do intervalo da operadora; a chave é o RegistroANS,
+    # então CNPJ com ou sem máscara e o próprio registro caem na mesma entrada do cache
+    def montar():
+        print(f"Buscando despesas para RegistroANS: {registro_alvo}")
+        return snap.indice_despesas.registros(registro_alvo)
+    return _resposta_cacheada(request, snap, ("despesas", registro_alvo), montar)
 
 @app.get("/api/estatisticas")
-def get_stats():
-    if df_despesas.empty: return {"total_geral": 0, "top_ufs": []}
-    
-    total = df_despesas['Valor Despesas'].sum()
-    
-    # Top UFs
-    # Faz join se necessário, ou usa o que tiver
-    if 'UF' not in df_despesas.columns:
-        df_join = pd.merge(df_despesas, df_operadoras[['RegistroANS', 'UF']], on='RegistroANS', how='left')
-    else:
-        df_join = df_despesas
-        
-    top_ufs = df_join.groupby('UF')['Valor Despesas'].sum().sort_values(ascending=False).head(5)
-    grafico = [{"uf": k, "total": v} for k,v in top_ufs.items()]
-    
-    return {"total_geral": total, "top_ufs": grafico}
\ No newline at end of file
+def get_stats(request: Request):
+    est = dados().estatisticas
+    cabecalhos = {"ETag": est.etag, "Cache-Control": CACHE_CONTROL_ESTATISTICAS}
+    if etag_confere(request.headers.get("if-none-match"), est.etag):
+        return Response(status_code=304, headers=cabecalhos)
+    return Response(content=est.corpo, media_type="application/json", headers=cabecalhos)
+
+# --- ANÁLISES (queries_teste3.sql) ---
+
+def _numero_trimestre(valor):
+    return int(valor[0]) if valor else None
+
+def _json(conteudo):
+    return Response(content=dumps_json(conteudo), media_type="application/json")
+
+@app.get("/api/analises/crescimento")
+def analise_crescimento(ano: Optional[int] = None, de: Optional[str] = Query(None, pattern=PADRAO_TRIMESTRE),
+                        ate: Optional[str] = Query(None, pattern=PADRAO_TRIMESTRE),
+                        limit: int = Query(5, ge=1, le=LIMITE_ANALISES)):
+    """Query 1: operadoras com maior crescimento de despesa entre dois trimestres do ano.
+    Padrão: último ano, do primeiro ao último trimestre disponível nele."""
+    de, ate = _numero_trimestre(de), _numero_trimestre(ate)
+    if de is not None and de == ate:
+        raise HTTPException(status_code=400, detail="Os trimestres 'de' e 'ate' devem ser diferentes.")
+    return _json(dados().analises.crescimento(ano, de, ate, limit))
+
+@app.get("/api/analises/ufs")
+def analise_ufs(ano: Optional[int] = None, trimestre: Optional[str] = Query(None, pattern=PADRAO_TRIMESTRE),
+                limit: int = Query(5, ge=1, le=LIMITE_ANALISES)):
+    """Query 2: UFs com maior despesa total e média por operadora (opcionalmente num ano/trimestre)."""
+    return _json(dados().analises.ufs(ano, _numero_trimestre(trimestre), limit))
+
+@app.get("/api/analises/acima-media")
+def analise_acima_media(ano: Optional[int] = None, minimo: int = Query(2, ge=1),
+                        limit: int = Query(10, ge=1, le=LIMITE_ANALISES)):
+    """Query 3: quantas operadoras ficaram acima da média do mercado em pelo menos `minimo` trimestres (e as primeiras)."""
+    return _json(dados().analises.acima_media(ano, minimo, limit))
+
+# --- CUBO (Ano x Trimestre x UF x operadora) ---
+
+def _lista(valor, nome, converter):
+    """'2024,2025' -> [2024, 2025]; None se o filtro não foi informado."""
+    if valor is None: return None
+    try:
+        return [converter(v.strip()) for v in valor.split(",") if v.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Valor inválido em '{nome}': {valor}")
+
+def _trimestre(valor):
+    if not re.match(PADRAO_TRIMESTRE, valor): raise ValueError(valor)
+    return _numero_trimestre(valor)
+
+@app.get("/api/cubo")
+def consultar_cubo(agrupar: Optional[str] = None, ano: Optional[str] = None, trimestre: Optional[str] = None,
+                   uf: Optional[str] = None, registro: Optional[str] = None,
+                   ordenar: Optional[str] = Query(None, pattern="^(soma|n|media)$"), limit: Optional[int] = Query(None, ge=1)):
+    """Soma, quantidade, média e desvio padrão das despesas agrupados por qualquer combinação de
+    ano, trimestre, uf e registro (separados por vírgula), com filtros em listas (ex.: uf=SP,RJ&ano=2024).
+    Responde pelo cubo montado na carga, sem passar pelas linhas de despesa."""
+    dimensoes = _lista(agrupar, "agrupar", str) or []
+    desconhecidas = [d for d in dimensoes if d not in DIMENSOES]
+    if desconhecidas: raise HTTPException(status_code=400, detail=f"Dimensões desconhecidas: {', '.join(desconhecidas)}")
+    cubo = dados().cubo
+    linhas = cubo.consultar(_lista(ano, "ano", int), _lista(trimestre, "trimestre", _trimestre),
+                            _lista(uf, "uf", str.upper), _lista(registro, "registro", int), dimensoes)
+    if ordenar: linhas.sort(key=lambda linha: linha[ordenar], reverse=True)
+    meta = {"agrupar": dimensoes, "total": len(linhas), "celulas": cubo.celulas()}
+    return _json({"data": linhas[:limit], "meta": meta})
+
+# --- EXPORTAÇÃO (streaming) ---
+
+@app.get("/api/despesas/export")
+def exportar_despesas(formato: str = Query("csv", pattern="^(csv|ndjson|parquet)$"), ano: Optional[str] = None,
+                      trimestre: Optional[str] = None, uf: Optional[str] = None, registro: Optional[str] = None,
+                      valor_min: Optional[float] = None, valor_max: Optional[float] = None, gzip: bool = Query(False)):
+    """Despesas filtradas (listas separadas por vírgula; valores em reais) no formato do consolidado, enviadas em
+    blocos à medida que são lidas: a memória do servidor não cresce com o tamanho do resultado."""
+    if formato == "parquet" and not PARQUET_DISPONIVEL:
+        raise HTTPException(status_code=400, detail="Exportação em Parquet requer o pyarrow instalado.")
+    for nome, valor in (("valor_min", valor_min), ("valor_max", valor_max)):
+        if valor is not None and not math.isfinite(valor):
+            raise HTTPException(status_code=400, detail=f"'{nome}' deve ser um número finito.")
+    if valor_min is not None and valor_max is not None and valor_min > valor_max:
+        raise HTTPException(status_code=400, detail="'valor_min' não pode ser maior que 'valor_max'.")
+    filtros = {"ano": _lista(ano, "ano", int), "trimestre": _lista(trimestre, "trimestre", _trimestre),
+               "uf": _lista(uf, "uf", str.upper), "registro": _lista(registro, "registro", int),
+               "valor_min": valor_min, "valor_max": valor_max}
+    snap = dados()  # o gerador segura este snapshot até o fim, mesmo que haja recarga no meio
+    cabecalhos = {"Content-Disposition": f'attachment; filename="despesas.{formato}"'}
+    if gzip: cabecalhos["Content-Encoding"] = "gzip"
+    return StreamingResponse(exportar(snap, formato, gzip, **filtros), media_type=FORMATOS[formato], headers=cabecalhos)
+
+# --- ADMINISTRAÇÃO ---
+
+def _checar_token(token):
+    if TOKEN_ADMIN and token != TOKEN_ADMIN:
+        raise HTTPException(status_code=403, detail="Token de administração inválido.")
+
+@app.post("/api/admin/recarregar")
+def recarregar_dados(forcar: bool = Query(False), x_admin_token: Optional[str] = Header(None)):
+    """Monta um snapshot novo (em thread do pool, sem bloquear as demais rotas) e troca se os arquivos mudaram."""
+    _checar_token(x_admin_token)
+    trocou = recarregador.recarregar(forcar=forcar)
+    return {"trocou": trocou, **recarregador.status()}
+
+@app.get("/api/admin/status")
+def status_dados(x_admin_token: Optional[str] = Header(None)):
+    _checar_token(x_admin_token)
+    return recarregador.status()
+
+@app.get("/api/admin/memoria")
+def memoria_dados(x_admin_token: Optional[str] = Header(None)):
+    """Bytes por coluna e por linha da tabela de despesas servida (fatos compactos + dimensão)."""
+    _checar_token(x_admin_token)
+    snap = dados()
+    return relatorio_memoria(snap.df_despesas, snap.df_dimensao)
+
+@app.get("/api/admin/cache")
+def metricas_cache(x_admin_token: Optional[str] = Header(None)):
+    """Acertos, faltas, despejos (LRU), expirados (TTL), invalidações (troca de versão) e 304 do cache de respostas."""
+    _checar_token(x_admin_token)
+    return cache_respostas.metricas()
@@ -0,0 +1,146 @@
+"""Análises do Teste 3 (queries_teste3.sql) servidas pela API, sem servidor MySQL.
+
+Na carga dos dados, as despesas já vêm somadas por operadora e período (RegistroANS,
+Ano, Trimestre, em centavos; tabela_compacta.somar_por_periodo). Essa tabela e o
+cadastro vão para um SQLite em memória, com índices. As três análises do
+queries_teste3.sql viram consultas parametrizadas sobre ela. Cada resultado é
+calculado uma vez por combinação de parâmetros, sem o LIMIT, e guardado até a
+próxima recarga. O top N sai de uma fatia da lista já pronta.
+
+Diferença em relação ao SQL original: "trimestre" é o período (ano + trimestre).
+Com mais de um ano no consolidado, o 1T de anos diferentes não se mistura nas médias.
+"""
+import sqlite3
+import threading
+
+from tabela_compacta import rotulo_trimestre
+
+SQL_CRESCIMENTO = """
+WITH por_operadora AS (
+    SELECT o.razao_social,
+           SUM(CASE WHEN d.trimestre = :de THEN d.centavos ELSE 0 END) AS inicial,
+           SUM(CASE WHEN d.trimestre = :ate THEN d.centavos ELSE 0 END) AS final
+    FROM despesas_periodo d
+    JOIN operadoras o ON o.registro_ans = d.registro_ans
+    WHERE d.ano = :ano AND d.trimestre IN (:de, :ate)
+    GROUP BY o.razao_social
+)
+SELECT razao_social, inicial, final, ROUND((final - inicial) * 100.0 / inicial, 2) AS crescimento_percentual
+FROM por_operadora
+WHERE inicial > 0
+ORDER BY crescimento_percentual DESC, razao_social
+"""
+
+SQL_UFS = """
+SELECT o.uf, SUM(d.centavos) AS total, COUNT(DISTINCT d.registro_ans) AS qtd_operadoras
+FROM despesas_periodo d
+JOIN operadoras o ON o.registro_ans = d.registro_ans
+WHERE (:ano IS NULL OR d.ano = :ano) AND (:trimestre IS NULL OR d.trimestre = :trimestre)
+GROUP BY o.uf
+ORDER BY total DESC, o.uf
+"""
+
+SQL_ACIMA_MEDIA = """
+WITH medias AS (
+    SELECT ano, trimestre, AVG(centavos) AS media_mercado
+    FROM despesas_periodo
+    WHERE :ano IS NULL OR ano = :ano
+    GROUP BY ano, trimestre
+)
+SELECT d.registro_ans, o.razao_social, COUNT(*) AS trimestres_acima
+FROM despesas_periodo d
+JOIN medias m ON m.ano = d.ano AND m.trimestre = d.trimestre
+LEFT JOIN operadoras o ON o.registro_ans = d.registro_ans
+WHERE d.centavos > m.media_mercado
+GROUP BY d.registro_ans, o.razao_social
+HAVING COUNT(*) >= :minimo
+ORDER BY trimestres_acima DESC, d.registro_ans
+"""
+
+def _em_reais(centavos):
+    return int(centavos) / 100
+
+class MotorAnalises:
+    """SQLite em memória com despesas_periodo (registro_ans, ano, trimestre, centavos) e operadoras.
+
+    Uma instância por snapshot de dados: recarregar os dados cria outra, com o cache vazio."""
+
+    def __init__(self, periodo, df_operadoras):
+        self._conn = sqlite3.connect(':memory:', check_same_thread=False)
+        self._lock = threading.Lock()
+        self._cache = {}
+        self._conn.executescript("""
+            CREATE TABLE operadoras (registro_ans INTEGER PRIMARY KEY, razao_social TEXT, uf TEXT);
+            CREATE TABLE despesas_periodo (registro_ans INTEGER, ano INTEGER, trimestre INTEGER, centavos INTEGER,
+                                           PRIMARY KEY (ano, trimestre, registro_ans)) WITHOUT ROWID;
+        """)
+        self._conn.executemany("INSERT INTO despesas_periodo VALUES (?, ?, ?, ?)",
+                               zip(*(periodo[c].tolist() for c in ['RegistroANS', 'Ano', 'Trimestre', 'ValorCentavos'])))
+        if not df_operadoras.empty:
+            ops = df_operadoras.drop_duplicates('RegistroANS')
+            colunas = [ops['RegistroANS'].astype('int64').tolist()] + \
+                [ops[c].astype(object).where(ops[c].notna(), None).tolist() if c in ops.columns else [None] * len(ops)
+                 for c in ['RazaoSocial', 'UF']]
+            self._conn.executemany("INSERT INTO operadoras VALUES (?, ?, ?)", zip(*colunas))
+        self._conn.executescript("""
+            CREATE INDEX idx_periodo_registro ON despesas_periodo (registro_ans);
+            CREATE INDEX idx_operadoras_uf ON operadoras (uf);
+            ANALYZE;
+        """)
+        self.periodos = [(a, t) for a, t in self._conn.execute(
+            "SELECT DISTINCT ano, trimestre FROM despesas_periodo ORDER BY ano, trimestre")]
+        self._anos = sorted({a for a, _ in self.periodos})
+        self.linhas = len(periodo)
+
+    def _consultar(self, sql, **params):
+        """Linhas da consulta, calculadas uma vez por combinação de parâmetros.
+        Um ano sem dados responde vazio sem ir ao cache (que assim fica limitado aos anos existentes)."""
+        if params.get('ano') is not None and params['ano'] not in self.anos(): return []
+        chave = (sql, tuple(sorted(params.items())))
+        linhas = self._cache.get(chave)
+        if linhas is None:
+            with self._lock:
+                linhas = self._conn.execute(sql, params).fetchall()
+            self._cache[chave] = linhas
+        return linhas
+
+    def anos(self):
+        return self._anos
+
+    def trimestres(self, ano):
+        return [t for a, t in self.periodos if a == ano]
+
+    def crescimento(self, ano=None, de=None, ate=None, limite=5):
+        """Query 1: operadoras com maior crescimento de despesa entre dois trimestres do ano.
+        Padrão: o último ano, do primeiro ao último trimestre disponível nele."""
+        ano = ano if ano is not None else (self.anos() or [None])[-1]
+        trimestres = self.trimestres(ano)
+        de = de if de is not None else (trimestres[0] if trimestres else 1)
+        ate = ate if ate is not None else (trimestres[-1] if trimestres else 4)
+        linhas = self._consultar(SQL_CRESCIMENTO, ano=ano, de=de, ate=ate)
+        dados = [{"razao_social": r, "despesa_inicial": _em_reais(i), "despesa_final": _em_reais(f),
+                  "crescimento_percentual": c} for r, i, f, c in linhas[:limite]]
+        meta = {"ano": ano, "de": rotulo_trimestre(de), "ate": rotulo_trimestre(ate), "limit": limite, "total": len(linhas)}
+        return {"data": dados, "meta": meta}
+
+    def ufs(self, ano=None, trimestre=None, limite=5):
+        """Query 2: UFs com maior despesa total e a média por operadora."""
+        linhas = self._consultar(SQL_UFS, ano=ano, trimestre=trimestre)
+        dados = [{"uf": uf, "total_despesas": _em_reais(total), "qtd_operadoras": qtd,
+                  "media_por_operadora": round(total / qtd / 100, 2)} for uf, total, qtd in linhas[:limite]]
+        meta = {"ano": ano, "trimestre": rotulo_trimestre(trimestre) or None, "limit": limite, "total": len(linhas)}
+        return {"data": dados, "meta": meta}
+
+    def acima_media(self, ano=None, minimo=2, limite=10):
+        """Query 3: operadoras com despesa acima da média do mercado em pelo menos `minimo` trimestres."""
+        linhas = self._consultar(SQL_ACIMA_MEDIA, ano=ano, minimo=minimo) if minimo <= len(self.periodos) else []
+        dados = [{"registro_ans": reg, "razao_social": razao, "trimestres_acima": n} for reg, razao, n in linhas[:limite]]
+        return {"qtd_operadoras": len(linhas), "data": dados,
+                "meta": {"ano": ano, "minimo": minimo, "limit": limite}}
+
+    def aquecer(self):
+        """Materializa as respostas padrão de cada análise logo na carga."""
+        self.crescimento()
+        self.ufs()
+        self.acima_media()
+        return self
@@ -0,0 +1,117 @@
+"""Armazenamento colunar das despesas consolidadas (Parquet particionado por Ano/Trimestre).
+
+O CSV/ZIP continua sendo o entregável; o Parquet é a forma rápida de troca entre
+as etapas 2, 3 e 4. Colunas são tipadas (UF e Descricao como dicionário/categoria)
+e a leitura aceita projeção de colunas e filtros que podam partições inteiras.
+Se o pyarrow não estiver instalado, tudo cai de volta para o CSV.
+"""
+import os
+import shutil
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    PARQUET_DISPONIVEL = True
+except ImportError:
+    PARQUET_DISPONIVEL = False
+
+ARQUIVO_CSV = "consolidado_despesas.csv"
+PASTA_PARQUET = "consolidado_despesas_parquet"
+COLUNAS_PARTICAO = ['Ano', 'Trimestre']
+
+if PARQUET_DISPONIVEL:
+    SCHEMA = pa.schema([
+        ('RegistroANS', pa.int32()),
+        ('Valor Despesas', pa.float64()),
+        ('Descricao', pa.dictionary(pa.int32(), pa.string())),
+        ('CNPJ', pa.string()),
+        ('RazaoSocial', pa.string()),
+        ('UF', pa.dictionary(pa.int8(), pa.string())),
+        ('Ano', pa.int16()),
+        ('Trimestre', pa.string()),
+    ])
+    PARTICIONAMENTO = ds.partitioning(pa.schema([('Ano', pa.int16()), ('Trimestre', pa.string())]), flavor='hive')
+
+def tipar_despesas(df):
+    """Converte um chunk consolidado para os tipos do SCHEMA (colunas ausentes viram nulas)."""
+    df = df.reindex(columns=SCHEMA.names)
+    df['RegistroANS'] = pd.to_numeric(df['RegistroANS'], errors='coerce').fillna(0).astype('int32')
+    df['Valor Despesas'] = pd.to_numeric(df['Valor Despesas'], errors='coerce').fillna(0).astype('float64')
+    df['Ano'] = pd.to_numeric(df['Ano'], errors='coerce').fillna(0).astype('int16')
+    df['UF'] = df['UF'].fillna('N/A')
+    for col in ['Descricao', 'CNPJ', 'RazaoSocial', 'UF', 'Trimestre']:
+        df[col] = df[col].astype('string')
+    return df
+
+class EscritorParquet:
+    """Grava chunks como arquivos Parquet numa pasta temporária e troca a pasta inteira no fechar()."""
+
+    def __init__(self, pasta=PASTA_PARQUET):
+        self.pasta = pasta
+        self._tmp = pasta + '.tmp'
+        self._n = 0
+        shutil.rmtree(self._tmp, ignore_errors=True)
+
+    def __call__(self, df):
+        tabela = pa.Table.from_pandas(tipar_despesas(df), schema=SCHEMA, preserve_index=False)
+        ds.write_dataset(tabela, self._tmp, format='parquet', partitioning=PARTICIONAMENTO,
+                         basename_template=f'parte-{self._n:05d}-{{i}}.parquet',
+                         existing_data_behavior='overwrite_or_ignore')
+        self._n += 1
+
+    def fechar(self):
+        if not self._n: return
+        antigo = self.pasta + '.old'
+        shutil.rmtree(antigo, ignore_errors=True)
+        if os.path.exists(self.pasta): os.replace(self.pasta, antigo)
+        os.replace(self._tmp, self.pasta)
+        shutil.rmtree(antigo, ignore_errors=True)
+
+    def descartar(self):
+        shutil.rmtree(self._tmp, ignore_errors=True)
+
+def _aplicar_filtros_pandas(df, filtros):
+    operadores = {'=': lambda s, v: s == v, '==': lambda s, v: s == v, '!=': lambda s, v: s != v,
+                  '>': lambda s, v: s > v, '>=': lambda s, v: s >= v, '<': lambda s, v: s < v,
+                  '<=': lambda s, v: s <= v, 'in': lambda s, v: s.isin(v)}
+    for col, op, valor in filtros:
+        df = df[operadores[op](df[col], valor)]
+    return df
+
+def _expressao(filtros):
+    expr = None
+    for col, op, valor in filtros:
+        campo = ds.field(col)
+        termo = {'=': campo == valor, '==': campo == valor, '!=': campo != valor, '>': campo > valor,
+                 '>=': campo >= valor, '<': campo < valor, '<=': campo <= valor}.get(op)
+        if op == 'in': termo = campo.isin(valor)
+        expr = termo if expr is None else expr & termo
+    return expr
+
+def parquet_existe(pasta=PASTA_PARQUET):
+    return PARQUET_DISPONIVEL and os.path.isdir(pasta)
+
+def remover_parquet(pasta=PASTA_PARQUET):
+    """Apaga o Parquet de um consolidado anterior (o CSV foi publicado sem regerá-lo), para ninguém ler dados velhos."""
+    if not os.path.isdir(pasta): return
+    shutil.rmtree(pasta, ignore_errors=True)
+    print(f"-> {pasta}/ removido: era de um consolidado anterior.")
+
+def ler_despesas(colunas=None, filtros=None, pasta=PASTA_PARQUET, arquivo_csv=ARQUIVO_CSV):
+    """Lê as despesas consolidadas, preferindo o Parquet.
+
+    colunas: projeção (None = todas). filtros: lista de (coluna, op, valor), ex. [('Ano', '=', 2025)];
+    filtros em Ano/Trimestre eliminam partições sem abrir os arquivos."""
+    filtros = filtros or []
+    if parquet_existe(pasta):
+        dataset = ds.dataset(pasta, format='parquet', partitioning=PARTICIONAMENTO)
+        tabela = dataset.to_table(columns=colunas, filter=_expressao(filtros) if filtros else None)
+        return tabela.to_pandas()
+
+    if not os.path.exists(arquivo_csv): return pd.DataFrame()
+    usecols = (lambda c: c in set(colunas) | {f[0] for f in filtros}) if colunas else None
+    df = pd.read_csv(arquivo_csv, sep=';', encoding='utf-8-sig', usecols=usecols, dtype={'CNPJ': str})
+    df = _aplicar_filtros_pandas(df, filtros)
+    return df[[c for c in colunas if c in df.columns]] if colunas else df
@@ -0,0 +1,911 @@
+"""Benchmarks de performance do pipeline. Rodam offline, sobre dados sintéticos.
+
+Uso:
+    python benchmarks.py memoria --linhas 3000000
+    python benchmarks.py armazenamento --linhas 2000000
+    python benchmarks.py cnpj --linhas 5000000
+    python benchmarks.py despesas --linhas 100000 1000000 5000000
+    python benchmarks.py pesquisa --operadoras 1000 10000 100000
+    python benchmarks.py snapshot --linhas 5000000
+    python benchmarks.py paginacao --operadoras 100000
+    python benchmarks.py compacta --linhas 5000000
+    python benchmarks.py analises --linhas 5000000
+    python benchmarks.py cubo --linhas 5000000
+    python benchmarks.py exportacao --linhas 1000000 5000000
+    python benchmarks.py cache --linhas 1000000 --requisicoes 5000
+    python benchmarks.py escala --escalas 20000 200000 2000000 --saida benchmark_escala.json
+    python benchmarks.py escala --comparar benchmark_escala.json    # sai com erro se alguma medida piorar
+"""
+import argparse
+import importlib
+import json
+import os
+import platform
+import runpy
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+crawler = importlib.import_module("1_ETL_Crawler")
+import armazenamento
+transformacao = importlib.import_module("2_ETL_Transformacao")
+import indices_api
+import tabela_compacta
+import analises_api
+import cubo_api
+import exportacao_api
+import dados_sinteticos
+from metricas import pico_rss_mb
+
+DESCRICOES = [
+    'EVENTOS INDENIZÁVEIS LÍQUIDOS / SINISTROS RETIDOS',
+    'EVENTOS CONHECIDOS OU AVISADOS',
+    'RECEITAS COM OPERAÇÕES DE ASSISTÊNCIA À SAÚDE',
+    'DESPESAS ADMINISTRATIVAS',
+    'CONTRAPRESTAÇÕES EFETIVAS',
+]
+
+def gerar_csv_demonstracoes(caminho, linhas, bloco=500_000, seed=42):
+    """Gera um CSV no layout da ANS (';', decimal com vírgula, latin1)."""
+    rng = np.random.default_rng(seed)
+    with open(caminho, 'w', encoding='latin1', newline='') as f:
+        f.write('"DATA";"REG_ANS";"CD_CONTA_CONTABIL";"DESCRICAO";"VL_SALDO_INICIAL";"VL_SALDO_FINAL"\n')
+        for inicio in range(0, linhas, bloco):
+            n = min(bloco, linhas - inicio)
+            valores = rng.uniform(-1e5, 1e7, n).round(2)
+            df = pd.DataFrame({
+                'DATA': '2025-01-01',
+                'REG_ANS': rng.integers(300000, 302000, n),
+                'CD_CONTA_CONTABIL': rng.integers(41, 49999, n),
+                'DESCRICAO': np.array(DESCRICOES)[rng.integers(0, len(DESCRICOES), n)],
+                'VL_SALDO_INICIAL': '0,00',
+                'VL_SALDO_FINAL': pd.Series(valores).map('{:.2f}'.format).str.replace('.', ',', regex=False),
+            })
+            df.to_csv(f, sep=';', header=False, index=False)
+
+def _executar_memoria(modo, diretorio, chunksize, saida):
+    """Roda um dos caminhos de processamento (chamado num subprocesso para isolar o pico de RSS)."""
+    t0 = time.perf_counter()
+    if modo == 'atual':
+        df = crawler.processar_despesas(diretorio)
+        df.to_csv(saida, index=False, sep=';', encoding='utf-8-sig')
+        linhas = len(df)
+    else:
+        escritor = crawler.EscritorConsolidado(saida)
+        crawler.processar_despesas(diretorio, chunksize, escritor)
+        escritor.fechar()
+        linhas = escritor.linhas
+    return {'segundos': time.perf_counter() - t0, 'linhas': linhas, 'pico_rss_mb': pico_rss_mb()}
+
+def memoria_processo_mb():
+    """(RSS, memória anônima) do processo atual em MB.
+
+    A anônima é a que cada worker paga sozinho; páginas de arquivo mapeado (o snapshot)
+    ficam no cache do sistema e são compartilhadas entre processos."""
+    campos = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for linha in f:
+            partes = linha.split()
+            if len(partes) == 3 and partes[2] == 'kB': campos[partes[0].rstrip(':')] = int(partes[1]) / 1024
+    return campos.get('Rss', 0), campos.get('Anonymous', 0)
+
+def _medir_subprocesso(argumentos):
+    """Executa o próprio script num processo novo e devolve o resultado JSON (inclui o pico de RSS)."""
+    saida = subprocess.run([sys.executable, __file__] + argumentos, stdout=subprocess.PIPE, text=True, check=True).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+def bench_memoria(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        pasta = os.path.join(tmp, 'dados')
+        os.makedirs(pasta)
+        print(f"Gerando CSV sintético com {args.linhas:,} linhas...")
+        gerar_csv_demonstracoes(os.path.join(pasta, '1T2025.csv'), args.linhas)
+        tamanho = os.path.getsize(os.path.join(pasta, '1T2025.csv')) / 1024 / 1024
+        print(f"   {tamanho:.1f} MB\n")
+
+        print(f"{'Modo':<10} {'Tempo (s)':>10} {'Pico RSS (MB)':>15} {'Linhas filtradas':>18}")
+        for modo in ['atual', 'chunked']:
+            r = _medir_subprocesso(['_memoria', modo, pasta, str(args.chunksize), os.path.join(tmp, f'saida_{modo}.csv')])
+            print(f"{modo:<10} {r['segundos']:>10.2f} {r['pico_rss_mb']:>15.1f} {r['linhas']:>18,}")
+
+def gerar_consolidado(linhas, seed=42, operadoras=2000):
+    """DataFrame no layout do consolidado_despesas.csv (após o JOIN com o cadastro)."""
+    rng = np.random.default_rng(seed)
+    registros = np.arange(300000, 300000 + operadoras)
+    cnpjs = np.array([f'{n:014d}' for n in rng.integers(10**12, 10**14 - 1, operadoras)])
+    ufs = rng.choice(['SP', 'RJ', 'MG', 'RS', 'PR', 'BA', 'SC', 'GO', 'PE', 'CE'], operadoras)
+    idx = rng.integers(0, operadoras, linhas)
+    periodos = rng.integers(0, 12, linhas)  # 3 anos x 4 trimestres
+    return pd.DataFrame({
+        'RegistroANS': registros[idx],
+        'Ano': 2023 + periodos // 4,
+        'Trimestre': np.array(['1T', '2T', '3T', '4T'])[periodos % 4],
+        'Valor Despesas': rng.uniform(-1e5, 1e7, linhas).round(2),
+        'Descricao': np.array(DESCRICOES[:2])[rng.integers(0, 2, linhas)],
+        'CNPJ': cnpjs[idx],
+        'RazaoSocial': np.char.add('OPERADORA DE SAUDE ', registros[idx].astype(str)),
+        'UF': ufs[idx],
+    })
+
+def _tamanho(caminho):
+    if os.path.isfile(caminho): return os.path.getsize(caminho)
+    return sum(os.path.getsize(os.path.join(r, f)) for r, _, fs in os.walk(caminho) for f in fs)
+
+def _cronometrar(func, repeticoes=3):
+    """Melhor tempo de algumas repetições, em segundos."""
+    tempos = []
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        func()
+        tempos.append(time.perf_counter() - t0)
+    return min(tempos)
+
+def bench_armazenamento(args):
+    if not armazenamento.PARQUET_DISPONIVEL:
+        print("pyarrow não instalado: pip install pyarrow")
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        csv = os.path.join(tmp, 'consolidado_despesas.csv')
+        zip_ = os.path.join(tmp, 'consolidado_despesas.zip')
+        pasta = os.path.join(tmp, 'consolidado_despesas_parquet')
+
+        print(f"Gerando consolidado sintético com {args.linhas:,} linhas...")
+        df = gerar_consolidado(args.linhas)
+        df.to_csv(csv, index=False, sep=';', encoding='utf-8-sig')
+        import zipfile
+        with zipfile.ZipFile(zip_, 'w', zipfile.ZIP_DEFLATED) as z: z.write(csv, 'consolidado_despesas.csv')
+        escritor = armazenamento.EscritorParquet(pasta)
+        for inicio in range(0, len(df), crawler.CHUNK_LINHAS):
+            escritor(df.iloc[inicio:inicio + crawler.CHUNK_LINHAS])
+        escritor.fechar()
+        del df
+
+        print(f"\n{'Formato':<12} {'Disco (MB)':>11}")
+        for nome, caminho in [('CSV', csv), ('ZIP', zip_), ('Parquet', pasta)]:
+            print(f"{nome:<12} {_tamanho(caminho) / 1024 / 1024:>11.1f}")
+
+        ler = lambda **kw: armazenamento.ler_despesas(pasta=pasta, arquivo_csv=csv, **kw)
+        sem_parquet = os.path.join(tmp, 'inexistente')
+        cenarios = [
+            ('CSV: tudo', lambda: pd.read_csv(csv, sep=';', encoding='utf-8-sig')),
+            ('CSV: 2 colunas', lambda: armazenamento.ler_despesas(['RegistroANS', 'Valor Despesas'], pasta=sem_parquet, arquivo_csv=csv)),
+            ('Parquet: tudo', lambda: ler()),
+            ('Parquet: 2 colunas', lambda: ler(colunas=['RegistroANS', 'Valor Despesas'])),
+            ('Parquet: 1 trimestre', lambda: ler(filtros=[('Ano', '=', 2025), ('Trimestre', '=', '3T')])),
+        ]
+        print(f"\n{'Leitura':<22} {'Tempo (s)':>10}")
+        for nome, func in cenarios:
+            print(f"{nome:<22} {_cronometrar(func):>10.3f}")
+
+def cnpj_valido(rng):
+    base = list(rng.integers(0, 10, 12))
+    for pesos in (transformacao.PESOS1, transformacao.PESOS2):
+        d = sum(int(a) * int(b) for a, b in zip(base, pesos)) % 11
+        base.append(0 if d < 2 else 11 - d)
+    return ''.join(map(str, base))
+
+def casos_cnpj(rng, n_aleatorios=5000):
+    """Casos de borda + uma mistura aleatória de válidos, inválidos, numéricos e formatados."""
+    casos = [None, np.nan, pd.NA, '', '   ', 'abc', '11.222.333/0001-81', '11222333000181', 11222333000181,
+             11222333000181.0, '00000000000000', '11111111111111', 0, '1122233300018', '112223330001811',
+             '11222333000182', '01152449390920', 1152449390920, '٣1222333000181', '11 222 333 0001 81']
+    for _ in range(n_aleatorios):
+        c = cnpj_valido(rng)
+        tipo = rng.integers(0, 5)
+        if tipo == 0: casos.append(c)
+        elif tipo == 1: casos.append(int(c))
+        elif tipo == 2: casos.append(f'{c[:2]}.{c[2:5]}.{c[5:8]}/{c[8:12]}-{c[12:]}')
+        elif tipo == 3: casos.append(c[:13] + str((int(c[13]) + 1) % 10))
+        else: casos.append(str(rng.integers(10**13, 10**14)))
+    return casos
+
+def bench_cnpj(args):
+    rng = np.random.default_rng(42)
+
+    # 1. Paridade: mesmo resultado da versão linha a linha, em Series object, string e float
+    casos = casos_cnpj(rng)
+    series = [pd.Series(casos, dtype=object),
+              pd.Series([c for c in casos if isinstance(c, str)], dtype='string'),
+              pd.Series([float(c) for c in casos if isinstance(c, (int, float))] + [np.nan])]
+    for serie in series:
+        esperado = serie.apply(transformacao.validar_cnpj).astype(bool)
+        obtido = transformacao.validar_cnpjs(serie)
+        divergentes = serie[esperado.to_numpy() != obtido.to_numpy()]
+        assert divergentes.empty, f"Divergência ({serie.dtype}): {divergentes.tolist()[:10]}"
+    print(f"Paridade OK ({sum(len(s) for s in series):,} casos, {int(esperado.sum())} válidos na última série)")
+
+    # 2. Tempo: CNPJs repetidos como no consolidado (~1 mil operadoras)
+    operadoras = [cnpj_valido(rng) if i % 5 else str(rng.integers(10**13, 10**14)) for i in range(args.operadoras)]
+    serie = pd.Series(np.array(operadoras, dtype=object)[rng.integers(0, len(operadoras), args.linhas)])
+    t_apply = _cronometrar(lambda: serie.apply(transformacao.validar_cnpj), repeticoes=1)
+    t_vet = _cronometrar(lambda: transformacao.validar_cnpjs(serie))
+    print(f"\n{'Versão':<14} {'Tempo (s)':>10}   ({args.linhas:,} linhas, {args.operadoras:,} CNPJs distintos)")
+    print(f"{'apply':<14} {t_apply:>10.3f}")
+    print(f"{'vetorizada':<14} {t_vet:>10.3f}   ({t_apply / t_vet:.0f}x)")
+
+def cadastro_do_consolidado(df):
+    """Cadastro (RegistroANS, CNPJ, RazaoSocial, UF) coerente com um consolidado sintético."""
+    return df[['RegistroANS', 'CNPJ', 'RazaoSocial', 'UF']].drop_duplicates('RegistroANS').reset_index(drop=True)
+
+def despesas_por_varredura(df_despesas, df_operadoras, identificador):
+    """get_despesas antes dos índices: três varreduras completas por requisição (referência)."""
+    id_clean = ''.join(filter(str.isdigit, str(identificador)))
+    registro_alvo = None
+    try:
+        id_int = int(id_clean)
+        if id_int in df_operadoras['RegistroANS'].values: registro_alvo = id_int
+    except ValueError: pass
+    if registro_alvo is None:
+        op = df_operadoras[df_operadoras['CNPJ'].astype(str).str.replace(r'[^0-9]', '', regex=True) == id_clean]
+        if not op.empty: registro_alvo = op.iloc[0]['RegistroANS']
+    if registro_alvo is None: return []
+    filtro = df_despesas[df_despesas['RegistroANS'] == registro_alvo].copy()
+    if filtro.empty: return []
+    return filtro.sort_values(by=['Ano', 'Trimestre'])[['Ano', 'Trimestre', 'Valor Despesas', 'Descricao']].fillna("").to_dict(orient="records")
+
+def _latencias_ms(func, entradas):
+    tempos = []
+    for entrada in entradas:
+        t0 = time.perf_counter()
+        func(entrada)
+        tempos.append((time.perf_counter() - t0) * 1000)
+    return np.percentile(tempos, 50), np.percentile(tempos, 99)
+
+def bench_despesas(args):
+    rng = np.random.default_rng(7)
+    print(f"{'Linhas':>11} {'Busca':<10} {'p50 (ms)':>9} {'p99 (ms)':>9}   "
+          f"({args.requisicoes} requisições, metade por CNPJ, ~{args.linhas_por_operadora} linhas por operadora)")
+    for linhas in args.linhas:
+        # Resultado de tamanho fixo: o que cresce é a tabela, não a resposta
+        df = gerar_consolidado(linhas, operadoras=max(1, linhas // args.linhas_por_operadora))
+        df_c = cadastro_do_consolidado(df)
+        df_d = df[['RegistroANS', 'Ano', 'Trimestre', 'Valor Despesas', 'Descricao', 'UF']]
+        amostra = df_c.iloc[rng.integers(0, len(df_c), args.requisicoes)]
+        ids = [str(r) if i % 2 else c for i, (r, c) in enumerate(zip(amostra['RegistroANS'], amostra['CNPJ']))]
+
+        t0 = time.perf_counter()
+        ind_op, ind_d = indices_api.IndiceOperadoras(df_c), indices_api.IndiceDespesas(tabela_compacta.compactar_despesas(df_d)[0])
+        t_indice = time.perf_counter() - t0
+        indexada = lambda i: ind_d.registros(ind_op.resolver(i))
+
+        for i in ids[:50]:  # paridade (a ordem dentro de um mesmo trimestre não é garantida na varredura)
+            chave = lambda l: sorted(tuple(map(str, d.values())) for d in l)
+            assert chave(indexada(i)) == chave(despesas_por_varredura(df_d, df_c, i)), i
+
+        for nome, func in [('varredura', lambda i: despesas_por_varredura(df_d, df_c, i)), ('índice', indexada)]:
+            p50, p99 = _latencias_ms(func, ids)
+            print(f"{linhas:>11,} {nome:<10} {p50:>9.2f} {p99:>9.2f}")
+        print(f"{'':>11} (montagem dos índices: {t_indice:.2f} s, uma vez na carga)")
+
+PALAVRAS_NOMES = ['UNIMED', 'SÃO', 'PAULO', 'ASSISTÊNCIA', 'MÉDICA', 'SAÚDE', 'ODONTO', 'BRADESCO', 'AMIL', 'HAPVIDA',
+                  'COOPERATIVA', 'PLANO', 'SEGUROS', 'CLÍNICA', 'HOSPITAL', 'NOTRE', 'DAME', 'INTERMÉDICA', 'PORTO',
+                  'CAIXA', 'VIDA', 'BEM', 'ESTAR', 'SUL', 'AMÉRICA', 'GOLDEN', 'CROSS', 'CENTRAL', 'NACIONAL',
+                  'REGIONAL', 'CAMPINAS', 'BELO', 'HORIZONTE', 'RIO', 'JANEIRO', 'ODONTOLÓGICA', 'GESTÃO', 'ADMINISTRADORA']
+
+def gerar_cadastro(operadoras, seed=42):
+    """Cadastro sintético normalizado (saída de ler_cadastro), com nomes acentuados de 3 a 6 palavras."""
+    rng = np.random.default_rng(seed)
+    palavras = np.array(PALAVRAS_NOMES)
+    nomes = [' '.join(palavras[rng.integers(0, len(palavras), rng.integers(3, 7))]) + rng.choice([' LTDA', ' S.A.', ''])
+             for _ in range(operadoras)]
+    return pd.DataFrame({
+        'RegistroANS': np.arange(300000, 300000 + operadoras),
+        'CNPJ': [cnpj_valido(rng) for _ in range(operadoras)],
+        'RazaoSocial': nomes,
+        'NOMEFANTASIA': [n.split()[0] for n in nomes],
+        'MODALIDADE': rng.choice(['Medicina de Grupo', 'Cooperativa Médica', 'Odontologia de Grupo'], operadoras),
+        'UF': rng.choice(['SP', 'RJ', 'MG', 'RS', 'PR', 'BA'], operadoras),
+    })
+
+def pesquisa_por_varredura(df_operadoras, search, page=1, limit=10):
+    """listar_operadoras antes do índice: cópia + três str.contains por requisição (referência)."""
+    df_filt = df_operadoras.copy()
+    s = search.lower()
+    df_filt = df_filt[
+        df_filt['RazaoSocial'].astype(str).str.lower().str.contains(s, na=False) |
+        df_filt['CNPJ'].astype(str).str.contains(s, na=False) |
+        df_filt['RegistroANS'].astype(str).str.contains(s, na=False)
+    ]
+    start = (page - 1) * limit
+    return len(df_filt), df_filt.iloc[start:start + limit].fillna("").to_dict(orient="records")
+
+def pesquisa_indexada(indice, operadoras, search, page=1, limit=10):
+    posicoes = indice.buscar(search)
+    start = (page - 1) * limit
+    return len(posicoes), [operadoras.linhas[p] for p in posicoes[start:start + limit].tolist()]
+
+# Digitação típica na caixa de busca do dashboard
+CONSULTAS = ['u', 'un', 'unim', 'unimed', 'sa', 'saude', 'são paulo', 'odonto', 'bem estar', 'hosp', '3001', '300123',
+             'ltda', 'xyzw']
+
+def bench_pesquisa(args):
+    print(f"{'Operadoras':>11} {'Busca':<10} {'p50 (ms)':>9} {'p99 (ms)':>9}   ({len(CONSULTAS)} consultas x {args.repeticoes})")
+    for n in args.operadoras:
+        df = gerar_cadastro(n)
+        t0 = time.perf_counter()
+        indice, operadoras = indices_api.IndiceBusca(df), indices_api.IndiceOperadoras(df)
+        t_indice = time.perf_counter() - t0
+
+        # Paridade de conjunto nas consultas sem acento (o índice também ignora acentos, então acha mais em 'saude')
+        for q in ['unimed', 'hosp', '3001', 'ltda', 'xyzw']:
+            total, _ = pesquisa_por_varredura(df, q, limit=n)
+            posicoes = indice.buscar(q)
+            assert total == len(posicoes), q
+
+        consultas = CONSULTAS * args.repeticoes
+        for nome, func in [('varredura', lambda q: pesquisa_por_varredura(df, q)),
+                           ('índice', lambda q: pesquisa_indexada(indice, operadoras, q))]:
+            p50, p99 = _latencias_ms(func, consultas)
+            print(f"{n:>11,} {nome:<10} {p50:>9.2f} {p99:>9.2f}")
+        print(f"{'':>11} (montagem do índice: {t_indice:.2f} s, uma vez na carga)")
+
+def pagina_antes(operadoras, page, limit):
+    """listar_operadoras antes da paginação por chave: linhas inteiras + jsonable_encoder/json.dumps do FastAPI."""
+    from fastapi.encoders import jsonable_encoder
+    start = (page - 1) * limit
+    total = len(operadoras.linhas)
+    corpo = {"data": operadoras.linhas[start:start + limit],
+             "meta": {"total": total, "page": page, "limit": limit, "total_pages": -(-total // limit)}}
+    return json.dumps(jsonable_encoder(corpo), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+def pagina_depois(operadoras, chave, limit, campos):
+    """Página por cursor, só com os campos pedidos, serializada direto em bytes (como a rota atual)."""
+    start = int(np.searchsorted(operadoras.registros_ordenados, chave, side='right'))
+    posicoes = operadoras.ordem[start:start + limit]
+    if limit > 1000:  # NDJSON
+        return b"".join(indices_api.dumps_json(linha) + b"\n" for linha in operadoras.pagina(posicoes.tolist(), campos))
+    return indices_api.dumps_json({"data": operadoras.pagina(posicoes.tolist(), campos),
+                                   "meta": {"total": len(operadoras.linhas), "next_cursor": "x" * 40}})
+
+def bench_paginacao(args):
+    campos = ['RegistroANS', 'CNPJ', 'RazaoSocial', 'UF']  # o que o dashboard mostra
+    print(f"JSON: {'orjson' if indices_api.orjson is not None else 'json (orjson não instalado)'}")
+    print(f"{'Operadoras':>11} {'Página':<18} {'Antes (ms)':>10} {'Depois (ms)':>11} {'Antes (KB)':>10} {'Depois (KB)':>11}")
+    for n in args.operadoras:
+        operadoras = indices_api.IndiceOperadoras(gerar_cadastro(n))
+        for rotulo, limit, pagina in [('primeira, 10', 10, 1), ('última, 10', 10, -(-n // 10)),
+                                      ('meio, 100', 100, n // 200), ('grande, 5000', 5000, 1)]:
+            chave = int(operadoras.registros_ordenados[(pagina - 1) * limit - 1]) if pagina > 1 else -1
+            antes, depois = pagina_antes(operadoras, pagina, limit), pagina_depois(operadoras, chave, limit, campos)
+            t_antes = _cronometrar(lambda: pagina_antes(operadoras, pagina, limit), args.repeticoes)
+            t_depois = _cronometrar(lambda: pagina_depois(operadoras, chave, limit, campos), args.repeticoes)
+            print(f"{n:>11,} {rotulo:<18} {t_antes * 1000:>10.3f} {t_depois * 1000:>11.3f} "
+                  f"{len(antes) / 1024:>10.1f} {len(depois) / 1024:>11.1f}")
+
+def bench_compacta(args):
+    """Memória por linha e tempo de agregações: consolidado como lido do CSV x fatos compactos + dimensão."""
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"Gerando {args.linhas:,} linhas de despesas sintéticas...")
+        caminho = os.path.join(tmp, 'consolidado_despesas.csv')
+        gerar_consolidado(args.linhas).to_csv(caminho, sep=';', index=False, encoding='utf-8-sig')
+        larga = pd.read_csv(caminho, sep=';', encoding='utf-8-sig', dtype={'CNPJ': str})
+    t0 = time.perf_counter()
+    fatos, dimensao = tabela_compacta.compactar_despesas(larga)
+    print(f"Compactação: {time.perf_counter() - t0:.2f} s\n")
+    tabela_compacta.imprimir_relatorio(tabela_compacta.relatorio_memoria(fatos, dimensao, original=larga))
+
+    def por_uf_compacta():
+        por_registro = fatos.groupby('RegistroANS')['ValorCentavos'].sum()
+        return por_registro.groupby(dimensao.set_index('RegistroANS')['UF'].reindex(por_registro.index), observed=True).sum()
+    operacoes = [
+        ('soma por UF', lambda: larga.groupby('UF')['Valor Despesas'].sum(), por_uf_compacta),
+        ('soma por Ano/Trimestre', lambda: larga.groupby(['Ano', 'Trimestre'])['Valor Despesas'].sum(),
+         lambda: fatos.groupby(['Ano', 'Trimestre'])['ValorCentavos'].sum()),
+        ('filtro 2024/3T', lambda: larga.loc[(larga['Ano'] == 2024) & (larga['Trimestre'] == '3T'), 'Valor Despesas'].sum(),
+         lambda: fatos.loc[(fatos['Ano'] == 2024) & (fatos['Trimestre'] == 3), 'ValorCentavos'].sum()),
+        ('top descrições', lambda: larga['Descricao'].value_counts(), lambda: fatos['Descricao'].value_counts()),
+    ]
+    print(f"\n{'Operação':<24} {'Larga (ms)':>11} {'Compacta (ms)':>14}")
+    for nome, larga_f, compacta_f in operacoes:
+        print(f"{nome:<24} {_cronometrar(larga_f) * 1000:>11.1f} {_cronometrar(compacta_f) * 1000:>14.1f}")
+
+def queries_teste3():
+    """As três consultas analíticas do queries_teste3.sql, como estão no arquivo."""
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'queries_teste3.sql'), encoding='utf-8') as f:
+        texto = f.read().split('QUERIES ANALÍTICAS')[1]
+    return [q for q in texto.split(';') if 'SELECT' in q]
+
+def bench_analises(args):
+    """Análises do Teste 3: SQL original sobre a tabela linha a linha (SQLite) x motor de análises materializado."""
+    import sqlite3
+    print(f"Gerando {args.linhas:,} linhas de despesas sintéticas...")
+    larga = gerar_consolidado(args.linhas)
+    fatos, _ = tabela_compacta.compactar_despesas(larga)
+    cadastro = cadastro_do_consolidado(larga)
+
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE TABLE operadoras (registro_ans INT PRIMARY KEY, razao_social TEXT, uf TEXT)")
+    conn.execute("CREATE TABLE demonstracoes_contabeis (registro_ans INT, ano INT, trimestre TEXT, valor_despesa REAL)")
+    conn.executemany("INSERT INTO operadoras VALUES (?, ?, ?)", cadastro[['RegistroANS', 'RazaoSocial', 'UF']].itertuples(index=False))
+    t0 = time.perf_counter()
+    conn.executemany("INSERT INTO demonstracoes_contabeis VALUES (?, ?, ?, ?)",
+                     larga[['RegistroANS', 'Ano', 'Trimestre', 'Valor Despesas']].itertuples(index=False))
+    conn.execute("CREATE INDEX idx_reg ON demonstracoes_contabeis (registro_ans)")
+    t_linhas = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    motor = analises_api.MotorAnalises(tabela_compacta.somar_por_periodo(fatos), cadastro)
+    t_motor = time.perf_counter() - t0
+    print(f"Carga: SQLite linha a linha {t_linhas:.1f} s | motor de análises {t_motor:.2f} s "
+          f"({motor.linhas:,} linhas operadora x período)\n")
+
+    ano = motor.anos()[-1]
+    consultas = [
+        ('Query 1 (crescimento)', lambda m: m.crescimento(ano, 1, 3)),
+        ('Query 2 (UFs)', lambda m: m.ufs()),
+        ('Query 3 (acima da média)', lambda m: m.acima_media()),
+    ]
+    print(f"{'Análise':<26} {'SQL original (ms)':>18} {'1ª resposta (ms)':>17} {'Em cache (ms)':>14}")
+    for (nome, consulta), sql in zip(consultas, queries_teste3()):
+        original = _cronometrar(lambda: conn.execute(sql.replace('2025', str(ano))).fetchall(), args.repeticoes) * 1000
+        primeira = []
+        for _ in range(args.repeticoes):
+            motor._cache.clear()
+            t0 = time.perf_counter()
+            consulta(motor)
+            primeira.append((time.perf_counter() - t0) * 1000)
+        cache = _latencias_ms(lambda _: consulta(motor), range(200))[0]
+        print(f"{nome:<26} {original:>18.1f} {min(primeira):>17.2f} {cache:>14.3f}")
+
+def bench_cubo(args):
+    """Agregações em vários grãos: groupby sobre os fatos compactos x consulta ao cubo pré-agregado."""
+    print(f"Gerando {args.linhas:,} linhas de despesas sintéticas...")
+    larga = gerar_consolidado(args.linhas)
+    fatos, dimensao = tabela_compacta.compactar_despesas(larga)
+    cadastro = cadastro_do_consolidado(larga)
+    del larga
+    t0 = time.perf_counter()
+    cubo = cubo_api.Cubo(fatos, dimensao, cadastro)
+    print(f"Montagem do cubo: {time.perf_counter() - t0:.2f} s ({cubo.celulas()['base']:,} células no grão de operadora)\n")
+
+    ufs = dimensao.set_index('RegistroANS')['UF']
+    def groupby(colunas, filtro=None):
+        f = fatos if filtro is None else fatos[filtro(fatos)]
+        chaves = [ufs.reindex(f['RegistroANS']).to_numpy() if c == 'UF' else f[c] for c in colunas]
+        return f.groupby(chaves, observed=True)['ValorCentavos'].agg(['sum', 'count', 'std'])
+    ano = int(fatos['Ano'].max())
+    operacoes = [
+        ('por UF', lambda: groupby(['UF']), lambda: cubo.consultar(agrupar=['uf'])),
+        ('por Ano/Trimestre', lambda: groupby(['Ano', 'Trimestre']), lambda: cubo.consultar(agrupar=['ano', 'trimestre'])),
+        ('por Ano/Trimestre/UF', lambda: groupby(['Ano', 'Trimestre', 'UF']),
+         lambda: cubo.consultar(agrupar=['ano', 'trimestre', 'uf'])),
+        (f'por operadora em {ano}', lambda: groupby(['RegistroANS'], lambda f: f['Ano'] == ano),
+         lambda: cubo.consultar(ano=[ano], agrupar=['registro'])),
+        ('SP/RJ por Ano', lambda: groupby(['Ano'], lambda f: ufs.reindex(f['RegistroANS']).isin(['SP', 'RJ']).to_numpy()),
+         lambda: cubo.consultar(uf=['SP', 'RJ'], agrupar=['ano'])),
+    ]
+    print(f"{'Agregação':<26} {'Groupby (ms)':>13} {'Cubo (ms)':>10}")
+    for nome, groupby_f, cubo_f in operacoes:
+        print(f"{nome:<26} {_cronometrar(groupby_f, args.repeticoes) * 1000:>13.1f} "
+              f"{_cronometrar(cubo_f, args.repeticoes) * 1000:>10.2f}")
+
+def preparar_dados_api(diretorio, linhas, operadoras=None, parquet=True, seed=42):
+    """consolidado_despesas.csv + Relatorio_cadop.csv (+ Parquet) sintéticos numa pasta, no layout do pipeline."""
+    os.makedirs(diretorio, exist_ok=True)
+    df = gerar_consolidado(linhas, seed=seed, operadoras=operadoras or max(1, linhas // 60))
+    df.to_csv(os.path.join(diretorio, 'consolidado_despesas.csv'), index=False, sep=';', encoding='utf-8-sig')
+    cadastro_do_consolidado(df).rename(columns={'RegistroANS': 'Registro_ANS', 'RazaoSocial': 'Razao_Social'}).to_csv(
+        os.path.join(diretorio, 'Relatorio_cadop.csv'), index=False, sep=';', encoding='utf-8')
+    if parquet and armazenamento.PARQUET_DISPONIVEL:
+        escritor = armazenamento.EscritorParquet(os.path.join(diretorio, armazenamento.PASTA_PARQUET))
+        for inicio in range(0, len(df), crawler.CHUNK_LINHAS):
+            escritor(df.iloc[inicio:inicio + crawler.CHUNK_LINHAS])
+        escritor.fechar()
+
+def _executar_api(diretorio, usar_snapshot):
+    """Cold start da API numa pasta de dados: tempo de carga e memória antes/depois de usar as tabelas."""
+    os.chdir(diretorio)
+    os.environ['ANS_RECARGA_INTERVALO'] = '0'
+    if not usar_snapshot: os.environ['ANS_SNAPSHOT'] = 'sem_snapshot'
+    import fastapi, snapshot_api  # noqa: F401,E401  (base comum: pandas/pyarrow/FastAPI; só os dados entram na conta)
+    rss0, anon0 = memoria_processo_mb()
+    t0 = time.perf_counter()
+    api = importlib.import_module('4_Backend_API')
+    t_carga = time.perf_counter() - t0
+    rss1, anon1 = memoria_processo_mb()
+
+    # Usa todas as colunas, como as rotas fariam ao longo do dia
+    snap = api.dados()
+    df = snap.df_despesas
+    df.groupby(['Ano', 'Trimestre', 'RegistroANS'])['ValorCentavos'].sum()
+    df['Descricao'].value_counts()
+    for reg in list(snap.indice_despesas.intervalos)[:200]: api.get_despesas(str(reg))
+    api.listar_operadoras(page=1, limit=10, search='saude')
+    rss2, anon2 = memoria_processo_mb()
+    return {'carga_s': t_carga, 'rss_carga': rss1 - rss0, 'anonima_carga': anon1 - anon0,
+            'rss_uso': rss2 - rss0, 'anonima_uso': anon2 - anon0}
+
+def bench_snapshot(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        so_csv, completo = os.path.join(tmp, 'csv'), os.path.join(tmp, 'completo')
+        print(f"Gerando {args.linhas:,} linhas de despesas sintéticas ({args.operadoras:,} operadoras)...")
+        preparar_dados_api(so_csv, args.linhas, args.operadoras, parquet=False)
+        preparar_dados_api(completo, args.linhas, args.operadoras)
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'snapshot_api.py')],
+                       cwd=completo, stdout=subprocess.DEVNULL, check=True)
+        print(f"Snapshot gerado em {time.perf_counter() - t0:.1f} s "
+              f"({_tamanho(os.path.join(completo, 'snapshot_api')) / 1024 / 1024:.1f} MB)")
+
+        print(f"\n{'Origem':<10} {'Carga (s)':>10} {'RSS carga':>10} {'Anônima':>8} {'RSS uso':>8} {'Anônima':>8}   (MB, por worker)")
+        for nome, pasta, usar in [('CSV', so_csv, False), ('Parquet', completo, False), ('Snapshot', completo, True)]:
+            r = _medir_subprocesso(['_api', pasta, '1' if usar else '0'])
+            print(f"{nome:<10} {r['carga_s']:>10.3f} {r['rss_carga']:>10.0f} {r['anonima_carga']:>8.0f} "
+                  f"{r['rss_uso']:>8.0f} {r['anonima_uso']:>8.0f}")
+
+MODOS_EXPORTACAO = [('csv', 'csv', False), ('csv.gz', 'csv', True), ('ndjson', 'ndjson', False), ('parquet', 'parquet', False)]
+
+def _executar_exportacao(diretorio, formato, gzip):
+    """Exportação completa de /api/despesas/export num processo novo, com a memória anônima medida a cada pedaço.
+
+    formato 'materializado' monta o CSV inteiro em memória antes de enviar (o caminho sem streaming)."""
+    os.chdir(diretorio)
+    os.environ['ANS_RECARGA_INTERVALO'] = '0'
+    snap = importlib.import_module('4_Backend_API').dados()
+    _, anonima0 = memoria_processo_mb()
+    pico, tamanho, t0 = anonima0, 0, time.perf_counter()
+    if formato == 'materializado':
+        corpo = pd.concat(list(exportacao_api.blocos(snap))).to_csv(sep=';', index=False).encode('utf-8')
+        tamanho, pico = len(corpo), memoria_processo_mb()[1]
+    else:
+        for pedaco in exportacao_api.exportar(snap, formato, gzip):
+            tamanho += len(pedaco)
+            pico = max(pico, memoria_processo_mb()[1])
+    return {'segundos': time.perf_counter() - t0, 'bytes': tamanho, 'anonima_mb': pico - anonima0,
+            'linhas': len(snap.df_despesas)}
+
+def bench_exportacao(args):
+    """Tempo, bytes e memória de exportar todas as despesas, em cada formato, para tamanhos crescentes."""
+    with tempfile.TemporaryDirectory() as tmp:
+        for linhas in args.linhas:
+            pasta = os.path.join(tmp, str(linhas))
+            print(f"Gerando {linhas:,} linhas de despesas sintéticas e o snapshot...")
+            preparar_dados_api(pasta, linhas, args.operadoras)
+            subprocess.run([sys.executable, os.path.join(PASTA_CODIGO, 'snapshot_api.py')], cwd=pasta,
+                           stdout=subprocess.DEVNULL, check=True)
+            print(f"{'Formato':<14} {'Tempo (s)':>10} {'Linhas/s':>12} {'MB enviados':>12} {'Memória (MB)':>13}")
+            for nome, formato, gzip in MODOS_EXPORTACAO + [('materializado', 'materializado', False)]:
+                r = _medir_subprocesso(['_exportacao', pasta, formato, '1' if gzip else '0'])
+                print(f"{nome:<14} {r['segundos']:>10.2f} {r['linhas'] / r['segundos']:>12,.0f} "
+                      f"{r['bytes'] / 1024 / 1024:>12.1f} {r['anonima_mb']:>13.1f}")
+            print()
+
+TERMOS_BUSCA = ['saude', 'unimed', 'odonto', 'vida', 'medica', 'sao paulo', 'america', 'nacional', 'regional', 'porto']
+
+def _executar_cache(diretorio, requisicoes):
+    """Rotas de despesas e de busca chamadas direto (sem HTTP), com popularidade Zipf: sem cache x com cache."""
+    import gzip
+    from types import SimpleNamespace
+    from fastapi.encoders import jsonable_encoder
+    os.chdir(diretorio)
+    os.environ['ANS_RECARGA_INTERVALO'] = '0'
+    api = importlib.import_module('4_Backend_API')
+    snap = api.dados()
+    rng = np.random.default_rng(42)
+    registros = np.array(list(snap.indice_despesas.intervalos))
+    alvos = registros[np.minimum(rng.zipf(1.3, requisicoes) - 1, len(registros) - 1)].tolist()
+    buscas = [TERMOS_BUSCA[i] for i in np.minimum(rng.zipf(1.5, requisicoes) - 1, len(TERMOS_BUSCA) - 1)]
+    pedido = SimpleNamespace(headers={'accept-encoding': 'gzip, deflate, br'})
+
+    def despesas_sem_cache(reg):
+        # Rota antes do cache: lista devolvida ao FastAPI (jsonable_encoder + json.dumps), sem compressão
+        return json.dumps(jsonable_encoder(snap.indice_despesas.registros(reg)), ensure_ascii=False,
+                          allow_nan=False, separators=(",", ":")).encode()
+    def busca_sem_cache(q):
+        posicoes, _ = snap.indice_busca.ranquear(q)
+        return indices_api.dumps_json({"data": snap.indice_operadoras.pagina(posicoes[:10].tolist(), None),
+                                       "meta": {"total": len(posicoes), "page": 1, "limit": 10}})
+    def busca_com_cache(q):
+        return api.listar_operadoras(page=1, limit=10, search=q, cursor=None, fields=None, formato=None, request=pedido).body
+
+    modos = [
+        ('despesas', 'sem cache', despesas_sem_cache, alvos),
+        ('despesas', 'sem cache + gzip', lambda r: gzip.compress(despesas_sem_cache(r)), alvos),
+        ('despesas', 'com cache', lambda r: api.get_despesas(str(r), pedido).body, alvos),
+        ('busca', 'sem cache', busca_sem_cache, buscas),
+        ('busca', 'sem cache + gzip', lambda q: gzip.compress(busca_sem_cache(q)), buscas),
+        ('busca', 'com cache', busca_com_cache, buscas),
+    ]
+    resultados = []
+    for rota, modo, func, entradas in modos:
+        tempos, tamanho = np.empty(len(entradas)), 0
+        for i, entrada in enumerate(entradas):
+            t0 = time.perf_counter()
+            corpo = func(entrada)
+            tempos[i] = time.perf_counter() - t0
+            tamanho += len(corpo)
+        resultados.append({'rota': rota, 'modo': modo, 'media_us': tempos.mean() * 1e6,
+                           'p99_us': np.percentile(tempos, 99) * 1e6, 'kb_por_resposta': tamanho / len(entradas) / 1024})
+    return {'resultados': resultados, 'cache': api.cache_respostas.metricas()}
+
+def bench_cache(args):
+    """Custo por requisição e bytes enviados em /api/operadoras/{id}/despesas e ?search=: sem cache x cache de respostas."""
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"Gerando {args.linhas:,} linhas de despesas sintéticas ({args.operadoras:,} operadoras)...")
+        preparar_dados_api(tmp, args.linhas, args.operadoras)
+        r = _medir_subprocesso(['_cache', tmp, str(args.requisicoes)])
+        print(f"{args.requisicoes:,} requisições por rota, operadoras e buscas com popularidade Zipf\n")
+        print(f"{'Rota':<10} {'Modo':<18} {'Média (µs)':>11} {'p99 (µs)':>10} {'KB/resposta':>12}")
+        for linha in r['resultados']:
+            print(f"{linha['rota']:<10} {linha['modo']:<18} {linha['media_us']:>11.1f} {linha['p99_us']:>10.1f} "
+                  f"{linha['kb_por_resposta']:>12.1f}")
+        cache = r['cache']
+        print(f"\nCache: {cache['acertos']:,} acertos, {cache['faltas']:,} faltas (taxa {cache['taxa_acerto']:.1%}), "
+              f"{cache['despejos']:,} despejos, {cache['itens']:,} itens, {cache['bytes'] / 1024 / 1024:.1f} MB")
+
+# --- ESCALA: pipeline inteiro + API sobre a réplica sintética da ANS ---
+
+PASTA_CODIGO = os.path.dirname(os.path.abspath(__file__))
+ETAPAS_ESCALA = [
+    ('crawler', ['1_ETL_Crawler.py', '--forcar']),
+    ('crawler_extrair', ['1_ETL_Crawler.py', '--modo', 'extrair', '--forcar']),
+    ('transformacao', ['2_ETL_Transformacao.py', '--completo']),
+    ('sql_script', ['3_SQL_Database.py']),
+    ('sql_banco', ['3_SQL_Database.py', '--modo', 'banco', '--banco', 'sqlite:///escala.db']),
+    ('snapshot', ['snapshot_api.py']),
+]
+ROTAS_ESCALA = [
+    ('operadoras', lambda i, regs: f"/api/operadoras?page={i % 20 + 1}&limit=10"),
+    ('operadoras_busca', lambda i, regs: f"/api/operadoras?search={['saude', 'unimed', 'odonto', 'vida'][i % 4]}"),
+    ('despesas', lambda i, regs: f"/api/operadoras/{regs[i % len(regs)]}/despesas"),
+    ('estatisticas', lambda i, regs: "/api/estatisticas"),
+    ('analises_crescimento', lambda i, regs: "/api/analises/crescimento"),
+    ('analises_ufs', lambda i, regs: "/api/analises/ufs"),
+    ('analises_acima_media', lambda i, regs: "/api/analises/acima-media"),
+    ('cubo_uf', lambda i, regs: "/api/cubo?agrupar=uf"),
+    ('cubo_operadora', lambda i, regs: "/api/cubo?agrupar=registro&ordenar=soma&limit=10"),
+]
+# Diferenças abaixo destes pisos são ruído, mesmo que passem da tolerância relativa
+PISOS_REGRESSAO = {'segundos': 0.25, 'pico_rss_mb': 20, 'p50_ms': 1.0, 'p99_ms': 2.0}
+
+def _executar_etapa(script, argumentos):
+    """Roda um script do pipeline neste processo (chamado num subprocesso): tempo e pico de RSS."""
+    sys.argv = [script] + argumentos
+    t0 = time.perf_counter()
+    try:
+        runpy.run_path(os.path.join(PASTA_CODIGO, script), run_name='__main__')
+    except SystemExit as e:
+        if e.code not in (None, 0): raise
+    return {'segundos': round(time.perf_counter() - t0, 3), 'pico_rss_mb': round(pico_rss_mb(), 1)}
+
+def _executar_rotas(diretorio, requisicoes):
+    """Carga da API e latência de cada rota (TestClient, sem rede), numa pasta já processada pelo pipeline."""
+    os.chdir(diretorio)
+    os.environ['ANS_RECARGA_INTERVALO'] = '0'
+    t0 = time.perf_counter()
+    api = importlib.import_module('4_Backend_API')
+    carga = time.perf_counter() - t0
+    from fastapi.testclient import TestClient
+    cliente = TestClient(api.app)
+    regs = list(api.dados().indice_despesas.intervalos)[:500] or [0]
+    rotas = {}
+    for nome, url in ROTAS_ESCALA:
+        tempos = []
+        for i in range(requisicoes):
+            t = time.perf_counter()
+            resposta = cliente.get(url(i, regs))
+            tempos.append((time.perf_counter() - t) * 1000)
+            if resposta.status_code != 200: raise RuntimeError(f"{url(i, regs)} -> {resposta.status_code}")
+        rotas[nome] = {'p50_ms': round(float(np.percentile(tempos, 50)), 3), 'p99_ms': round(float(np.percentile(tempos, 99)), 3),
+                       'req_por_s': round(1000 * len(tempos) / sum(tempos), 1)}
+    return {'carga_s': round(carga, 3), 'pico_rss_mb': round(pico_rss_mb(), 1), 'rotas': rotas}
+
+def _medir_escala(argumentos, diretorio, ambiente, log):
+    """Executa um modo interno deste script numa pasta de trabalho; a saída dos scripts vai para o log."""
+    saida = subprocess.run([sys.executable, os.path.abspath(__file__)] + argumentos, cwd=diretorio, env=ambiente,
+                           stdout=subprocess.PIPE, stderr=log, text=True)
+    if saida.returncode != 0: raise RuntimeError(f"{' '.join(argumentos)} falhou (veja {log.name})")
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+def _contar_linhas_csv(caminho):
+    with open(caminho, 'rb') as f:
+        return max(sum(1 for _ in f) - 1, 0)
+
+def rodar_escala(linhas, args, tmp):
+    pasta_ans, trabalho = os.path.join(tmp, f'ans_{linhas}'), os.path.join(tmp, f'trabalho_{linhas}')
+    os.makedirs(trabalho)
+    t0 = time.perf_counter()
+    dados = dados_sinteticos.gerar_arvore(pasta_ans, linhas, args.trimestres, args.operadoras, seed=args.seed)
+    print(f"\n=== {linhas:,} linhas ({dados['operadoras']:,} operadoras, {', '.join(dados['trimestres'])}, "
+          f"{dados['bytes'] / 1024 / 1024:.1f} MB; gerado em {time.perf_counter() - t0:.1f} s) ===")
+    resultado = {'linhas': linhas, 'operadoras': dados['operadoras'], 'trimestres': dados['trimestres'],
+                 'bytes_zips': dados['bytes'], 'etapas': {}}
+    with dados_sinteticos.servir(pasta_ans) as (url_base, url_cadastro), \
+            open(os.path.join(tmp, f'log_{linhas}.txt'), 'w') as log:
+        ambiente = dict(os.environ, ANS_BASE_URL=url_base, ANS_URL_CADASTRO=url_cadastro, ANS_RECARGA_INTERVALO='0',
+                        PYTHONPATH=os.pathsep.join([PASTA_CODIGO, os.environ.get('PYTHONPATH', '')]))
+        for nome, comando in ETAPAS_ESCALA:
+            r = _medir_escala(['_etapa'] + comando, trabalho, ambiente, log)
+            if nome == 'crawler':
+                resultado['linhas_consolidado'] = _contar_linhas_csv(os.path.join(trabalho, crawler.ARQUIVO_CONSOLIDADO))
+            # Vazão: linhas dos ZIPs para o crawler, linhas do consolidado para as demais etapas
+            base = linhas if nome.startswith('crawler') else resultado['linhas_consolidado']
+            r['linhas_por_s'] = round(base / r['segundos']) if r['segundos'] else None
+            resultado['etapas'][nome] = r
+            print(f"   {nome:<26} {r['segundos']:>8.2f} s {r['pico_rss_mb']:>8.0f} MB {r['linhas_por_s'] or 0:>12,} linhas/s")
+        resultado['api'] = _medir_escala(['_rotas', trabalho, str(args.requisicoes)], trabalho, ambiente, log)
+    api = resultado['api']
+    print(f"   {'api (carga)':<26} {api['carga_s']:>8.2f} s {api['pico_rss_mb']:>8.0f} MB")
+    for nome, r in api['rotas'].items():
+        print(f"   {'GET ' + nome:<26} p50 {r['p50_ms']:>7.2f} ms  p99 {r['p99_ms']:>7.2f} ms")
+    shutil.rmtree(pasta_ans)
+    shutil.rmtree(trabalho)
+    return resultado
+
+def _medidas(escala):
+    """(nome, medida, valor) comparáveis de uma escala do relatório."""
+    for nome, r in escala['etapas'].items():
+        for medida in ('segundos', 'pico_rss_mb'): yield nome, medida, r[medida]
+    yield 'api', 'segundos', escala['api']['carga_s']
+    yield 'api', 'pico_rss_mb', escala['api']['pico_rss_mb']
+    for nome, r in escala['api']['rotas'].items():
+        for medida in ('p50_ms', 'p99_ms'): yield nome, medida, r[medida]
+
+def comparar_escala(atual, base, tolerancia):
+    """Regressões em relação à linha de base: pior que (1 + tolerância) x base e acima do piso de ruído."""
+    regressoes = []
+    escalas_base = {e['linhas']: e for e in base['escalas']}
+    for escala in atual['escalas']:
+        anterior = escalas_base.get(escala['linhas'])
+        if anterior is None: continue
+        valores_base = {(n, m): v for n, m, v in _medidas(anterior)}
+        for nome, medida, valor in _medidas(escala):
+            antes = valores_base.get((nome, medida))
+            if antes is None: continue
+            if valor > antes * (1 + tolerancia) and valor - antes > PISOS_REGRESSAO[medida]:
+                regressoes.append((escala['linhas'], nome, medida, antes, valor))
+    return regressoes
+
+def bench_escala(args):
+    """Pipeline completo e rotas da API em várias escalas, sobre a réplica sintética da ANS servida localmente."""
+    base = None
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f: base = json.load(f)
+        args.escalas = args.escalas or [e['linhas'] for e in base['escalas']]
+    relatorio = {
+        'gerado_em': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'maquina': {'python': platform.python_version(), 'pandas': pd.__version__, 'plataforma': platform.platform(),
+                    'cpus': os.cpu_count()},
+        'parametros': {'trimestres': args.trimestres, 'operadoras': args.operadoras, 'seed': args.seed,
+                       'requisicoes': args.requisicoes},
+        'escalas': [],
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for linhas in args.escalas or [20_000, 200_000, 2_000_000]:
+            relatorio['escalas'].append(rodar_escala(linhas, args, tmp))
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f: json.dump(relatorio, f, ensure_ascii=False, indent=1)
+        print(f"\n-> Linha de base gravada em {args.saida}")
+    if base is not None:
+        regressoes = comparar_escala(relatorio, base, args.tolerancia)
+        print(f"\n--- Comparação com {args.comparar} ({base['gerado_em']}, tolerância {args.tolerancia:.0%}) ---")
+        for linhas, nome, medida, antes, depois in regressoes:
+            print(f"   REGRESSÃO {linhas:>10,} linhas  {nome:<26} {medida:<12} {antes:>10.2f} -> {depois:>10.2f}")
+        if regressoes: sys.exit(1)
+        print("   Nenhuma regressão.")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '_memoria':
+        # Uso interno: python benchmarks.py _memoria <modo> <diretorio> <chunksize> <saida>
+        # Os prints do pipeline vão para stderr; stdout fica só com o JSON do resultado
+        import contextlib
+        with contextlib.redirect_stdout(sys.stderr):
+            modo, diretorio, chunksize, saida = sys.argv[2:6]
+            resultado = _executar_memoria(modo, diretorio, int(chunksize), saida)
+        print(json.dumps(resultado))
+        sys.exit(0)
+
+    if len(sys.argv) > 1 and sys.argv[1] == '_api':
+        # Uso interno: python benchmarks.py _api <diretorio> <0|1 usar snapshot>
+        import contextlib
+        with contextlib.redirect_stdout(sys.stderr):
+            resultado = _executar_api(sys.argv[2], sys.argv[3] == '1')
+        print(json.dumps(resultado))
+        sys.exit(0)
+
+    if len(sys.argv) > 1 and sys.argv[1] == '_exportacao':
+        # Uso interno: python benchmarks.py _exportacao <diretorio> <formato> <0|1 gzip>
+        import contextlib
+        with contextlib.redirect_stdout(sys.stderr):
+            resultado = _executar_exportacao(sys.argv[2], sys.argv[3], sys.argv[4] == '1')
+        print(json.dumps(resultado))
+        sys.exit(0)
+
+    if len(sys.argv) > 1 and sys.argv[1] == '_cache':
+        # Uso interno: python benchmarks.py _cache <diretorio> <requisicoes>
+        import contextlib
+        with contextlib.redirect_stdout(sys.stderr):
+            resultado = _executar_cache(sys.argv[2], int(sys.argv[3]))
+        print(json.dumps(resultado))
+        sys.exit(0)
+
+    if len(sys.argv) > 1 and sys.argv[1] in ('_etapa', '_rotas'):
+        # Uso interno: python benchmarks.py _etapa <script> [args...] | _rotas <diretorio> <requisicoes>
+        import contextlib
+        with contextlib.redirect_stdout(sys.stderr):
+            if sys.argv[1] == '_etapa': resultado = _executar_etapa(sys.argv[2], sys.argv[3:])
+            else: resultado = _executar_rotas(sys.argv[2], int(sys.argv[3]))
+        print(json.dumps(resultado))
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description="Benchmarks do pipeline Intuitive Care")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("memoria", help="Pico de RSS: processar_despesas atual x chunked")
+    p.add_argument("--linhas", type=int, default=3_000_000)
+    p.add_argument("--chunksize", type=int, default=crawler.CHUNK_LINHAS)
+    p.set_defaults(func=bench_memoria)
+
+    p = sub.add_parser("armazenamento", help="Disco e tempo de carga: CSV x Parquet particionado")
+    p.add_argument("--linhas", type=int, default=2_000_000)
+    p.set_defaults(func=bench_armazenamento)
+
+    p = sub.add_parser("cnpj", help="Paridade e tempo: validar_cnpj (apply) x validar_cnpjs (vetorizada)")
+    p.add_argument("--linhas", type=int, default=2_000_000)
+    p.add_argument("--operadoras", type=int, default=1_000)
+    p.set_defaults(func=bench_cnpj)
+
+    p = sub.add_parser("despesas", help="Latência de /api/operadoras/{id}/despesas: varredura x índices")
+    p.add_argument("--linhas", type=int, nargs='+', default=[100_000, 1_000_000, 5_000_000])
+    p.add_argument("--linhas-por-operadora", type=int, default=60)
+    p.add_argument("--requisicoes", type=int, default=300)
+    p.set_defaults(func=bench_despesas)
+
+    p = sub.add_parser("pesquisa", help="Latência de /api/operadoras?search=: str.contains x índice de n-gramas")
+    p.add_argument("--operadoras", type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    p.add_argument("--repeticoes", type=int, default=20)
+    p.set_defaults(func=bench_pesquisa)
+
+    p = sub.add_parser("snapshot", help="Cold start e memória por worker da API: CSV x Parquet x snapshot mmap")
+    p.add_argument("--linhas", type=int, default=5_000_000)
+    p.add_argument("--operadoras", type=int, default=1_500)
+    p.set_defaults(func=bench_snapshot)
+
+    p = sub.add_parser("paginacao", help="CPU e bytes por página de /api/operadoras: página inteira x cursor + fields")
+    p.add_argument("--operadoras", type=int, nargs='+', default=[10_000, 100_000])
+    p.add_argument("--repeticoes", type=int, default=20)
+    p.set_defaults(func=bench_paginacao)
+
+    p = sub.add_parser("compacta", help="Memória por linha e agregações: consolidado largo x tabela compacta")
+    p.add_argument("--linhas", type=int, default=5_000_000)
+    p.set_defaults(func=bench_compacta)
+
+    p = sub.add_parser("analises", help="Análises do Teste 3: SQL sobre as linhas x motor de análises materializado")
+    p.add_argument("--linhas", type=int, default=5_000_000)
+    p.add_argument("--repeticoes", type=int, default=3)
+    p.set_defaults(func=bench_analises)
+
+    p = sub.add_parser("cubo", help="Agregações: groupby sobre os fatos x cubo pré-agregado")
+    p.add_argument("--linhas", type=int, default=5_000_000)
+    p.add_argument("--repeticoes", type=int, default=3)
+    p.set_defaults(func=bench_cubo)
+
+    p = sub.add_parser("exportacao", help="/api/despesas/export: tempo e memória por formato x resultado montado em memória")
+    p.add_argument("--linhas", type=int, nargs='+', default=[1_000_000, 5_000_000])
+    p.add_argument("--operadoras", type=int, default=1_500)
+    p.set_defaults(func=bench_exportacao)
+
+    p = sub.add_parser("cache", help="Despesas por operadora e busca: resposta montada a cada vez x cache de respostas")
+    p.add_argument("--linhas", type=int, default=1_000_000)
+    p.add_argument("--operadoras", type=int, default=1_500)
+    p.add_argument("--requisicoes", type=int, default=5_000)
+    p.set_defaults(func=bench_cache)
+
+    p = sub.add_parser("escala", help="Pipeline e API de ponta a ponta em várias escalas, com linha de base JSON")
+    p.add_argument("--escalas", type=int, nargs="+", help="Linhas de demonstrações contábeis (padrão: 20 mil, 200 mil e 2 milhões)")
+    p.add_argument("--trimestres", type=int, default=3)
+    p.add_argument("--operadoras", type=int, help="Padrão: linhas / 100 (entre 50 e 20.000)")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--requisicoes", type=int, default=50, help="Requisições por rota da API")
+    p.add_argument("--saida", help="Grava o resultado (linha de base) neste JSON")
+    p.add_argument("--comparar", metavar="JSON", help="Compara com uma linha de base e sai com erro se houver regressão")
+    p.add_argument("--tolerancia", type=float, default=0.2, help="Piora relativa aceita na comparação (padrão 20%%)")
+    p.set_defaults(func=bench_escala)
+
+    args = parser.parse_args()
+    args.func(args)
@@ -0,0 +1,115 @@
+"""Cache de respostas prontas da API (despesas por operadora e busca/listagem de operadoras).
+
+Cada entrada guarda o corpo já serializado em JSON, as versões já comprimidas (gzip e,
+se o pacote brotli estiver instalado, br) e um ETag por codificação. A chave leva a versão dos dados.
+Quando a API troca de snapshot, as entradas da versão anterior são descartadas de uma
+vez. O cache tem limite de itens e de bytes (sai o usado há mais tempo, LRU) e validade
+por entrada (TTL). Repetir uma requisição custa uma consulta ao dicionário e o envio
+dos bytes.
+"""
+import gzip
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from indices_api import dumps_json
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MINIMO_COMPRESSAO = 512  # bytes; abaixo disso o corpo vai sem compressão
+
+# corpos e etags: {codificação: bytes / ETag}, com '' = sem compressão
+Entrada = namedtuple('Entrada', ['corpos', 'etags', 'tamanho', 'expira_em'])
+# ETag forte vale para os bytes exatos: cada codificação tem o seu (mesmo hash, sufixo diferente)
+SUFIXO_ETAG = {'': '', 'gzip': '-gz', 'br': '-br'}
+
+def _comprimir(corpo):
+    corpos = {'': corpo}
+    if len(corpo) >= MINIMO_COMPRESSAO:
+        corpos['gzip'] = gzip.compress(corpo, compresslevel=6, mtime=0)
+        if brotli is not None: corpos['br'] = brotli.compress(corpo, quality=5)
+    return corpos
+
+def escolher_codificacao(accept_encoding, corpos):
+    """Melhor codificação aceita pelo cliente entre as guardadas (br > gzip > sem compressão)."""
+    aceitas = set()
+    for parte in (accept_encoding or '').split(','):
+        nome, _, parametros = parte.partition(';')
+        parametros = parametros.replace(' ', '')
+        try:
+            peso = float(parametros[2:]) if parametros.startswith('q=') else 1.0
+        except ValueError:
+            peso = 1.0
+        if peso > 0: aceitas.add(nome.strip().lower())
+    for codificacao in ('br', 'gzip'):
+        if codificacao in corpos and (codificacao in aceitas or '*' in aceitas): return codificacao
+    return ''
+
+class CacheRespostas:
+    """LRU com TTL e limite de bytes, de respostas JSON prontas, por (rota, chave normalizada, versão dos dados)."""
+
+    def __init__(self, max_itens=1024, max_bytes=64 * 1024 * 1024, ttl=300.0):
+        self.max_itens = max_itens
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self._versao = None
+        self._bytes = 0
+        self._contadores = {'acertos': 0, 'faltas': 0, 'despejos': 0, 'expirados': 0, 'invalidacoes': 0,
+                            'nao_modificados': 0}
+
+    def _remover(self, chave):
+        self._bytes -= self._itens.pop(chave).tamanho
+
+    def obter(self, versao, chave, montar):
+        """Entrada de `chave` na `versao` dos dados; numa falta, montar() dá o conteúdo (exceções não entram no cache)."""
+        agora = time.monotonic()
+        with self._lock:
+            if versao != self._versao:
+                # Dados novos: nada do snapshot anterior serve mais
+                self._contadores['invalidacoes'] += len(self._itens)
+                self._itens.clear()
+                self._bytes, self._versao = 0, versao
+            entrada = self._itens.get(chave)
+            if entrada is not None:
+                if entrada.expira_em > agora:
+                    self._itens.move_to_end(chave)
+                    self._contadores['acertos'] += 1
+                    return entrada
+                self._remover(chave)
+                self._contadores['expirados'] += 1
+            self._contadores['faltas'] += 1
+
+        # Montagem fora do lock: outras chaves continuam sendo servidas enquanto isso
+        corpo = dumps_json(montar())
+        corpos, resumo = _comprimir(corpo), hashlib.sha1(corpo).hexdigest()[:20]
+        entrada = Entrada(corpos, {c: '"' + resumo + SUFIXO_ETAG[c] + '"' for c in corpos}, 0,
+                          agora + self.ttl if self.ttl > 0 else float('inf'))
+        entrada = entrada._replace(tamanho=sum(len(c) for c in entrada.corpos.values()))
+        if entrada.tamanho > self.max_bytes: return entrada  # não cabe: serve sem guardar
+
+        with self._lock:
+            if versao != self._versao: return entrada  # houve troca de snapshot durante a montagem
+            if chave in self._itens: self._remover(chave)
+            self._itens[chave] = entrada
+            self._bytes += entrada.tamanho
+            while len(self._itens) > self.max_itens or self._bytes > self.max_bytes:
+                self._remover(next(iter(self._itens)))
+                self._contadores['despejos'] += 1
+        return entrada
+
+    def registrar_nao_modificado(self):
+        with self._lock:
+            self._contadores['nao_modificados'] += 1
+
+    def metricas(self):
+        with self._lock:
+            consultas = self._contadores['acertos'] + self._contadores['faltas']
+            return {**self._contadores, 'taxa_acerto': round(self._contadores['acertos'] / consultas, 4) if consultas else None,
+                    'itens': len(self._itens), 'bytes': self._bytes, 'max_itens': self.max_itens,
+                    'max_bytes': self.max_bytes, 'ttl_s': self.ttl, 'brotli': brotli is not None}
@@ -0,0 +1,127 @@
+"""Cubo OLAP pré-agregado das despesas: Ano x Trimestre x UF x RegistroANS.
+
+Na carga, as despesas viram arrays densos de medidas (soma em centavos, quantidade
+de lançamentos e soma dos quadrados, em reais²) no grão Ano x Trimestre x operadora.
+Como a UF é atributo da operadora, o eixo UF não multiplica esse grão. O rollup
+Ano x Trimestre x UF é outro array denso, com poucas células, e atende às consultas
+que não filtram nem agrupam por operadora. Cada consulta recorta o array pelos
+filtros e soma os eixos que não estão no agrupamento. O custo depende do número de
+células do cubo, não do número de despesas.
+"""
+import numpy as np
+import pandas as pd
+
+from tabela_compacta import rotulo_trimestre
+
+DIMENSOES = ['ano', 'trimestre', 'uf', 'registro']
+MEDIDAS = ['soma', 'n', 'somaq']
+SEM_UF = 'N/A'
+
+def _ufs_por_registro(registros, dimensao, df_operadoras):
+    """UF de cada operadora: a do consolidado (dimensão) ou, sem ela, a do cadastro. Sem UF vira 'N/A'."""
+    origem = dimensao if 'UF' in dimensao.columns else df_operadoras
+    if 'UF' not in origem.columns: return np.full(len(registros), SEM_UF, dtype=object)
+    ufs = origem.drop_duplicates('RegistroANS').set_index('RegistroANS')['UF'].astype(object)
+    ufs = ufs.reindex(registros).to_numpy(dtype=object)
+    return np.where(pd.isna(ufs) | (ufs == ''), SEM_UF, ufs)
+
+class Cubo:
+    """Medidas densas por (ano, trimestre, operadora) e por (ano, trimestre, UF)."""
+
+    def __init__(self, fatos, dimensao, df_operadoras):
+        self.anos = np.unique(fatos['Ano'].to_numpy()).astype('int64')
+        self.trimestres = np.unique(fatos['Trimestre'].to_numpy()).astype('int64')
+        self.registros = np.unique(fatos['RegistroANS'].to_numpy()).astype('int64')
+        self.ufs_registro = _ufs_por_registro(self.registros, dimensao, df_operadoras)
+
+        forma = (len(self.anos), len(self.trimestres), len(self.registros))
+        celula = np.ravel_multi_index((np.searchsorted(self.anos, fatos['Ano'].to_numpy()),
+                                       np.searchsorted(self.trimestres, fatos['Trimestre'].to_numpy()),
+                                       np.searchsorted(self.registros, fatos['RegistroANS'].to_numpy())), forma)
+        centavos = fatos['ValorCentavos'].to_numpy(dtype='int64')
+        tamanho = int(np.prod(forma))
+        # Soma inteira (exata) por célula; bincount só para contagem e quadrados, que são float
+        soma = pd.Series(centavos).groupby(celula).sum()
+        base_soma = np.zeros(tamanho, dtype='int64')
+        base_soma[soma.index.to_numpy()] = soma.to_numpy()
+        self.base = {
+            'soma': base_soma.reshape(forma),
+            'n': np.bincount(celula, minlength=tamanho).astype('int64').reshape(forma),
+            'somaq': np.bincount(celula, weights=(centavos / 100) ** 2, minlength=tamanho).reshape(forma),
+        }
+        self._montar_rollup()
+
+    def _montar_rollup(self):
+        self.ufs, self.uf_codigo = np.unique(self.ufs_registro.astype(str), return_inverse=True)
+        self.por_uf = {m: self._projetar_ufs(arr, self.uf_codigo) for m, arr in self.base.items()}
+
+    def _projetar_ufs(self, arr, codigos):
+        """Soma o eixo de operadoras em UFs (matriz 0/1 operadora -> UF)."""
+        mapa = np.zeros((len(codigos), len(self.ufs)), dtype=arr.dtype)
+        mapa[np.arange(len(codigos)), codigos] = 1
+        return arr @ mapa
+
+    def exportar(self):
+        meta = {'anos': self.anos.tolist(), 'trimestres': self.trimestres.tolist(), 'ufs_registro': self.ufs_registro.tolist()}
+        arrays = {'registros': self.registros, **self.base}
+        return meta, arrays
+
+    @classmethod
+    def importar(cls, meta, arrays):
+        self = cls.__new__(cls)
+        self.anos = np.array(meta['anos'], dtype='int64')
+        self.trimestres = np.array(meta['trimestres'], dtype='int64')
+        self.ufs_registro = np.array(meta['ufs_registro'], dtype=object)
+        self.registros = arrays['registros']
+        self.base = {m: arrays[m] for m in MEDIDAS}
+        self._montar_rollup()
+        return self
+
+    def celulas(self):
+        return {'base': int(self.base['n'].size), 'por_uf': int(self.por_uf['n'].size)}
+
+    def consultar(self, ano=None, trimestre=None, uf=None, registro=None, agrupar=()):
+        """Medidas agregadas pelas dimensões de `agrupar`, com filtros opcionais (listas de valores).
+
+        Uma linha por combinação com lançamentos: soma, n, média e desvio padrão (populacional) dos lançamentos."""
+        por_registro = registro is not None or 'registro' in agrupar
+        selecao_uf = np.isin(self.ufs, uf) if uf is not None else np.ones(len(self.ufs), dtype=bool)
+        if por_registro:
+            medidas, rotulos = self.base, self.registros
+            selecao = selecao_uf[self.uf_codigo]
+            if registro is not None: selecao &= np.isin(self.registros, registro)
+        else:
+            medidas, rotulos, selecao = self.por_uf, self.ufs, selecao_uf
+        indices = (np.flatnonzero(np.isin(self.anos, ano)) if ano is not None else np.arange(len(self.anos)),
+                   np.flatnonzero(np.isin(self.trimestres, trimestre)) if trimestre is not None else np.arange(len(self.trimestres)),
+                   np.flatnonzero(selecao))
+        recorte = {m: arr[np.ix_(*indices)] for m, arr in medidas.items()}
+        eixo3 = rotulos[indices[2]]
+        ufs_eixo3 = self.ufs[self.uf_codigo[indices[2]]] if por_registro else eixo3
+
+        # Agrupar por UF a partir do grão de operadora: projeta o eixo 3 em UFs
+        if por_registro and 'uf' in agrupar and 'registro' not in agrupar:
+            codigos = self.uf_codigo[indices[2]]
+            recorte = {m: self._projetar_ufs(arr, codigos) for m, arr in recorte.items()}
+            eixo3 = ufs_eixo3 = self.ufs
+        manter = ['ano' in agrupar, 'trimestre' in agrupar, 'uf' in agrupar or 'registro' in agrupar]
+        somar = tuple(i for i, m in enumerate(manter) if not m)
+        recorte = {m: np.atleast_1d(arr.sum(axis=somar)) for m, arr in recorte.items()}
+
+        # Só as combinações com lançamentos viram linhas; rótulos e medidas saem em colunas
+        posicoes = np.nonzero(recorte['n'])
+        soma, n, somaq = (recorte[m][posicoes] for m in MEDIDAS)
+        media = soma / 100 / np.maximum(n, 1)
+        colunas = {}
+        for i, pos in zip([i for i, m in enumerate(manter) if m], posicoes):
+            if i == 0: colunas['ano'] = self.anos[indices[0]][pos].tolist()
+            elif i == 1: colunas['trimestre'] = [rotulo_trimestre(t) for t in self.trimestres[indices[1]][pos].tolist()]
+            else:
+                if 'registro' in agrupar: colunas['registro_ans'] = eixo3[pos].tolist()
+                if 'uf' in agrupar: colunas['uf'] = ufs_eixo3[pos].astype(str).tolist()
+        colunas.update({
+            'soma': (soma / 100).tolist(), 'n': n.tolist(), 'media': np.round(media, 2).tolist(),
+            'desvio_padrao': np.round(np.sqrt(np.maximum(somaq / np.maximum(n, 1) - media ** 2, 0)), 2).tolist(),
+        })
+        nomes = list(colunas)
+        return [dict(zip(nomes, valores)) for valores in zip(*colunas.values())]
@@ -0,0 +1,189 @@
+"""Réplica sintética da árvore de dados abertos da ANS, para testes de escala offline.
+
+Gera PASTA/dc/<ano>/<N>T<ano>.zip (um CSV de demonstrações contábeis por trimestre)
+e PASTA/Relatorio_cadop.csv, nos layouts publicados pela ANS: separador ';', decimal
+com vírgula, cabeçalho entre aspas ou não e encoding alternando entre latin1, utf-8
+e utf-8 com BOM. As contas misturam eventos/sinistros (o que o crawler mantém) com
+receitas e despesas administrativas. Uma parte das linhas é de operadoras fora do
+cadastro, e uma parte dos CNPJs do cadastro vem com máscara ou dígito verificador
+errado. Tudo é determinístico pela seed e gravado em blocos, sem montar o arquivo
+inteiro em memória.
+
+Uso:
+    python dados_sinteticos.py --pasta ans_sintetico --linhas 200000 --trimestres 3
+    python dados_sinteticos.py --pasta ans_sintetico --servir 8766
+    # e então:
+    ANS_BASE_URL=http://127.0.0.1:8766/dc/ ANS_URL_CADASTRO=http://127.0.0.1:8766/Relatorio_cadop.csv python run_pipeline.py
+"""
+import argparse
+import functools
+import http.server
+import io
+import os
+import threading
+import zipfile
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+# (descrição, peso): as duas primeiras passam no filtro EVENTO|SINISTRO do crawler
+CONTAS = [
+    ('EVENTOS INDENIZÁVEIS LÍQUIDOS / SINISTROS RETIDOS', 30),
+    ('EVENTOS CONHECIDOS OU AVISADOS', 15),
+    ('Eventos/ Sinistros Conhecidos ou Avisados de Assistência a Saúde Médico Hospitalar', 5),
+    ('CONTRAPRESTAÇÕES EFETIVAS DE PLANO DE ASSISTÊNCIA À SAÚDE', 15),
+    ('RECEITAS COM OPERAÇÕES DE ASSISTÊNCIA À SAÚDE', 10),
+    ('DESPESAS ADMINISTRATIVAS', 15),
+    ('DESPESAS DE COMERCIALIZAÇÃO', 5),
+    ('PROVISÕES TÉCNICAS DE OPERAÇÕES DE ASSISTÊNCIA À SAÚDE', 5),
+]
+ENCODINGS = ['latin1', 'utf-8', 'utf-8-sig']
+PALAVRAS = ['UNIMED', 'SÃO', 'PAULO', 'ASSISTÊNCIA', 'MÉDICA', 'SAÚDE', 'ODONTO', 'COOPERATIVA', 'PLANO', 'SEGUROS',
+            'CLÍNICA', 'HOSPITAL', 'INTERMÉDICA', 'VIDA', 'BEM', 'ESTAR', 'SUL', 'AMÉRICA', 'CENTRAL', 'NACIONAL',
+            'REGIONAL', 'CAMPINAS', 'BELO', 'HORIZONTE', 'RIO', 'JANEIRO', 'ODONTOLÓGICA', 'GESTÃO', 'ADMINISTRADORA']
+UFS = ['SP', 'RJ', 'MG', 'RS', 'PR', 'BA', 'SC', 'PE', 'CE', 'GO', 'DF', 'ES', 'PA', 'AM', 'MT', 'MS']
+PESOS_UF = np.array([30, 12, 12, 7, 7, 5, 5, 4, 3, 3, 3, 2, 2, 2, 2, 2], dtype=float)
+MODALIDADES = ['Medicina de Grupo', 'Cooperativa Médica', 'Odontologia de Grupo', 'Seguradora Especializada em Saúde',
+               'Autogestão', 'Filantropia', 'Cooperativa Odontológica', 'Administradora de Benefícios']
+REGISTRO_INICIAL = 300000
+FRACAO_SEM_CADASTRO = 0.02   # linhas de operadoras que não estão no Relatorio_cadop
+FRACAO_CNPJ_INVALIDO = 0.02
+FRACAO_CNPJ_MASCARA = 0.10
+BLOCO_LINHAS = 200_000
+
+def _cnpjs(rng, n):
+    """n CNPJs com dígitos verificadores corretos (vetorizado)."""
+    digitos = rng.integers(0, 10, (n, 12))
+    for pesos in ([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2], [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]):
+        resto = (digitos * pesos).sum(axis=1) % 11
+        digitos = np.column_stack([digitos, np.where(resto < 2, 0, 11 - resto)])
+    return pd.Series(digitos.astype(str).tolist()).str.join('')
+
+def gerar_cadastro(caminho, operadoras, seed=42):
+    """Relatorio_cadop.csv no layout da ANS (REGISTRO_OPERADORA, CNPJ, Razao_Social...). Devolve o DataFrame gravado."""
+    rng = np.random.default_rng(seed)
+    palavras = np.array(PALAVRAS)
+    nomes = [' '.join(palavras[rng.integers(0, len(palavras), rng.integers(2, 6))]) + rng.choice([' LTDA', ' S.A.', ''])
+             for _ in range(operadoras)]
+    cnpjs = _cnpjs(rng, operadoras)
+    invalidos = rng.random(operadoras) < FRACAO_CNPJ_INVALIDO
+    cnpjs[invalidos] = cnpjs[invalidos].str[:-1] + ((cnpjs[invalidos].str[-1].astype(int) + 1) % 10).astype(str)
+    mascara = rng.random(operadoras) < FRACAO_CNPJ_MASCARA
+    cnpjs[mascara] = cnpjs[mascara].str.replace(r'(\d{2})(\d{3})(\d{3})(\d{4})(\d{2})', r'\1.\2.\3/\4-\5', regex=True)
+    ufs = rng.choice(UFS, operadoras, p=PESOS_UF / PESOS_UF.sum())
+    df = pd.DataFrame({
+        'REGISTRO_OPERADORA': np.arange(REGISTRO_INICIAL, REGISTRO_INICIAL + operadoras),
+        'CNPJ': cnpjs,
+        'Razao_Social': nomes,
+        'Nome_Fantasia': [n.split()[0] for n in nomes],
+        'Modalidade': rng.choice(MODALIDADES, operadoras),
+        'Logradouro': 'RUA ' + pd.Series(rng.choice(PALAVRAS, operadoras)),
+        'Numero': rng.integers(1, 5000, operadoras),
+        'Cidade': pd.Series(rng.choice(PALAVRAS, operadoras)).str.title(),
+        'UF': ufs,
+        'CEP': pd.Series(rng.integers(1_000_000, 99_999_999, operadoras)).astype(str).str.zfill(8),
+        'Data_Registro_ANS': pd.to_datetime(rng.integers(8_000, 20_000, operadoras), unit='D').strftime('%Y-%m-%d'),
+    })
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    df.to_csv(caminho, sep=';', index=False, encoding='utf-8')
+    return df
+
+def _formatar_valores(valores):
+    """float -> '1234567,89' (decimal com vírgula, sem separador de milhar, como a ANS publica)."""
+    return pd.Series(valores).map('{:.2f}'.format).str.replace('.', ',', regex=False)
+
+def gerar_trimestre(caminho_zip, ano, trimestre, linhas, operadoras, seed=42, encoding='latin1', aspas=True):
+    """ZIP de um trimestre com um CSV <N>T<ano>.csv, gravado em blocos direto dentro do ZIP."""
+    rng = np.random.default_rng([seed, ano, trimestre])
+    descricoes = np.array([d for d, _ in CONTAS], dtype=object)
+    pesos = np.array([p for _, p in CONTAS], dtype=float)
+    # Tamanho das operadoras com cauda longa: poucas concentram a maior parte das linhas
+    porte = rng.pareto(1.2, operadoras) + 1
+    porte /= porte.sum()
+    data = f"{ano}-{(trimestre - 1) * 3 + 1:02d}-01"
+    colunas = ['DATA', 'REG_ANS', 'CD_CONTA_CONTABIL', 'DESCRICAO', 'VL_SALDO_INICIAL', 'VL_SALDO_FINAL']
+    cabecalho = ';'.join(f'"{c}"' if aspas else c for c in colunas) + '\n'
+
+    os.makedirs(os.path.dirname(caminho_zip) or '.', exist_ok=True)
+    with zipfile.ZipFile(caminho_zip, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as z, \
+            z.open(f"{trimestre}T{ano}.csv", 'w', force_zip64=True) as bruto, \
+            io.TextIOWrapper(bruto, encoding=encoding, newline='') as f:
+        f.write(cabecalho)
+        for inicio in range(0, linhas, BLOCO_LINHAS):
+            n = min(BLOCO_LINHAS, linhas - inicio)
+            registros = REGISTRO_INICIAL + rng.choice(operadoras, n, p=porte)
+            fora = rng.random(n) < FRACAO_SEM_CADASTRO
+            registros[fora] = REGISTRO_INICIAL + operadoras + rng.integers(0, max(operadoras // 20, 1), fora.sum())
+            conta = rng.choice(len(descricoes), n, p=pesos / pesos.sum())
+            final = rng.lognormal(12, 2, n).round(2)
+            final[rng.random(n) < 0.03] *= -1  # estornos
+            pd.DataFrame({
+                'DATA': data,
+                'REG_ANS': registros,
+                'CD_CONTA_CONTABIL': 41 * 10 ** 6 + conta * 1000 + rng.integers(0, 999, n),
+                'DESCRICAO': descricoes[conta],
+                'VL_SALDO_INICIAL': _formatar_valores((final * rng.uniform(0, 1, n)).round(2)),
+                'VL_SALDO_FINAL': _formatar_valores(final),
+            }).to_csv(f, sep=';', header=False, index=False, quoting=1 if aspas else 0)
+
+def periodos(trimestres, ano_final, trimestre_final):
+    """Os `trimestres` períodos (ano, trimestre) que terminam em ano_final/trimestre_final, do mais antigo ao mais novo."""
+    fim = ano_final * 4 + trimestre_final - 1
+    return [(p // 4, p % 4 + 1) for p in range(fim - trimestres + 1, fim + 1)]
+
+def gerar_arvore(pasta, linhas, trimestres=3, operadoras=None, ano_final=2025, trimestre_final=3, seed=42):
+    """Cadastro + um ZIP por trimestre, com `linhas` linhas no total (divididas entre os trimestres).
+    Devolve um resumo (linhas, operadoras, trimestres e bytes gravados)."""
+    operadoras = operadoras or max(50, min(linhas // 100, 20_000))
+    gerar_cadastro(os.path.join(pasta, 'Relatorio_cadop.csv'), operadoras, seed)
+    lista = periodos(trimestres, ano_final, trimestre_final)
+    for i, (ano, tri) in enumerate(lista):
+        n = linhas // len(lista) + (1 if i < linhas % len(lista) else 0)
+        gerar_trimestre(os.path.join(pasta, 'dc', str(ano), f"{tri}T{ano}.zip"), ano, tri, n, operadoras, seed,
+                        encoding=ENCODINGS[i % len(ENCODINGS)], aspas=i % 2 == 0)
+    total_bytes = sum(os.path.getsize(os.path.join(raiz, a)) for raiz, _, arquivos in os.walk(pasta) for a in arquivos)
+    return {'linhas': linhas, 'operadoras': operadoras, 'trimestres': [f"{t}T{a}" for a, t in lista], 'bytes': total_bytes}
+
+class _Silencioso(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+@contextmanager
+def servir(pasta, porta=0):
+    """Servidor HTTP local (thread) sobre a pasta, no formato de listagem que o crawler lê.
+    Devolve (ANS_BASE_URL, ANS_URL_CADASTRO)."""
+    servidor = http.server.ThreadingHTTPServer(('127.0.0.1', porta), functools.partial(_Silencioso, directory=pasta))
+    thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{servidor.server_address[1]}/"
+    try:
+        yield base + 'dc/', base + 'Relatorio_cadop.csv'
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera uma réplica sintética da árvore de dados da ANS")
+    parser.add_argument("--pasta", default="ans_sintetico")
+    parser.add_argument("--linhas", type=int, default=200_000, help="Linhas de demonstrações contábeis no total")
+    parser.add_argument("--trimestres", type=int, default=3)
+    parser.add_argument("--operadoras", type=int, help="Padrão: linhas / 100 (entre 50 e 20.000)")
+    parser.add_argument("--ano-final", type=int, default=2025)
+    parser.add_argument("--trimestre-final", type=int, default=3, choices=[1, 2, 3, 4])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--servir", type=int, metavar="PORTA", help="Em vez de gerar, serve a pasta por HTTP nesta porta")
+    args = parser.parse_args()
+
+    if args.servir is not None:
+        with servir(args.pasta, args.servir) as (url_base, url_cadastro):
+            print(f"-> ANS_BASE_URL={url_base} ANS_URL_CADASTRO={url_cadastro}  (Ctrl+C para parar)")
+            try:
+                threading.Event().wait()
+            except KeyboardInterrupt:
+                pass
+    else:
+        resumo = gerar_arvore(args.pasta, args.linhas, args.trimestres, args.operadoras,
+                              args.ano_final, args.trimestre_final, args.seed)
+        print(f"-> {resumo['linhas']:,} linhas em {', '.join(resumo['trimestres'])}, {resumo['operadoras']:,} operadoras "
+              f"({resumo['bytes'] / 1024 / 1024:.1f} MB) em {args.pasta}/")
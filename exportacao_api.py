@@ -0,0 +1,180 @@
+"""Exportação em streaming das despesas filtradas: CSV, NDJSON ou Parquet, com gzip opcional.
+
+Os fatos do snapshot já estão ordenados por RegistroANS/Ano/Trimestre, com o intervalo
+de linhas de cada operadora. Filtrar por operadora ou UF vira uma lista de intervalos;
+sem esses filtros, o intervalo é a tabela inteira. Os intervalos são percorridos em
+blocos de BLOCO_EXPORTACAO linhas. Cada bloco é filtrado por ano, trimestre e valor,
+ganha os atributos da dimensão, é serializado e enviado. A memória usada depende do
+tamanho do bloco, não do tamanho do resultado.
+"""
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from armazenamento import PARQUET_DISPONIVEL
+from indices_api import dumps_json
+from tabela_compacta import ROTULOS_TRIMESTRE
+
+if PARQUET_DISPONIVEL:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+
+    ESQUEMA_EXPORTACAO = pa.schema([
+        ('RegistroANS', pa.int32()), ('Ano', pa.int16()), ('Trimestre', pa.string()),
+        ('Valor Despesas', pa.float64()), ('Descricao', pa.string()),
+        ('CNPJ', pa.string()), ('RazaoSocial', pa.string()), ('UF', pa.string()),
+    ])
+
+BLOCO_EXPORTACAO = 50_000  # linhas por bloco (e por row group no Parquet)
+COLUNAS_EXPORTACAO = ['RegistroANS', 'Ano', 'Trimestre', 'Valor Despesas', 'Descricao', 'CNPJ', 'RazaoSocial', 'UF']
+ATRIBUTOS_DIMENSAO = ['CNPJ', 'RazaoSocial', 'UF']
+FORMATOS = {'csv': 'text/csv; charset=utf-8', 'ndjson': 'application/x-ndjson', 'parquet': 'application/vnd.apache.parquet'}
+
+def _atributos(dimensao, df_operadoras):
+    """RegistroANS ordenados e, para cada atributo, os valores na mesma ordem com um '' no fim (operadora ausente).
+
+    Cada atributo vem da dimensão (o consolidado) ou, se ela não o trouxer, do cadastro, que é de onde o consolidado o tirou."""
+    registros = np.unique(dimensao['RegistroANS'].to_numpy(dtype='int64'))
+    valores = {}
+    for col in ATRIBUTOS_DIMENSAO:
+        origem = dimensao if col in dimensao.columns else df_operadoras
+        if col in origem.columns:
+            serie = origem.drop_duplicates('RegistroANS').set_index('RegistroANS')[col].astype(object).reindex(registros)
+            coluna = serie.where(serie.notna(), '').to_numpy(dtype=object)
+        else:
+            coluna = np.full(len(registros), '', dtype=object)
+        valores[col] = np.append(coluna, '')
+    return registros, valores
+
+def _posicoes(intervalos, bloco):
+    """[(início, fim), ...] -> arrays de posições com até `bloco` linhas (intervalos pequenos são juntados)."""
+    pendentes, tamanho = [], 0
+    for ini, fim in intervalos:
+        while ini < fim:
+            passo = min(fim - ini, bloco - tamanho)
+            pendentes.append(np.arange(ini, ini + passo))
+            tamanho += passo
+            ini += passo
+            if tamanho == bloco:
+                yield np.concatenate(pendentes)
+                pendentes, tamanho = [], 0
+    if pendentes: yield np.concatenate(pendentes)
+
+def blocos(snap, ano=None, trimestre=None, uf=None, registro=None, valor_min=None, valor_max=None, bloco=BLOCO_EXPORTACAO):
+    """DataFrames de até `bloco` despesas no formato do consolidado, já filtrados (listas de valores; valores em reais)."""
+    indice = snap.indice_despesas
+    tabela = indice.tabela
+    registros_dim, atributos = _atributos(snap.df_dimensao, snap.df_operadoras)
+
+    # Operadora e UF viram intervalos da tabela ordenada; sem eles, a tabela inteira
+    if registro is None and uf is None:
+        intervalos = [(0, len(tabela))]
+    else:
+        alvo = set(indice.intervalos)
+        if registro is not None: alvo &= set(registro)
+        if uf is not None:
+            ufs = np.asarray(atributos['UF'][:-1], dtype=str)
+            alvo &= set(registros_dim[np.isin(ufs, uf)].tolist())
+        intervalos = [indice.intervalos[r] for r in sorted(alvo)]
+
+    colunas = {c: tabela[c].to_numpy() for c in ['RegistroANS', 'Ano', 'Trimestre', 'ValorCentavos']}
+    descricao = tabela['Descricao'].array
+    descricoes = np.append(descricao.categories.astype(str).to_numpy(dtype=object), '')  # código -1 (nulo) cai no ''
+    codigos_descricao = descricao.codes
+    rotulos = np.array(ROTULOS_TRIMESTRE, dtype=object)
+    minimo = round(valor_min * 100) if valor_min is not None else None
+    maximo = round(valor_max * 100) if valor_max is not None else None
+
+    for posicoes in _posicoes(intervalos, bloco):
+        manter = np.ones(len(posicoes), dtype=bool)
+        centavos = colunas['ValorCentavos'][posicoes]
+        if ano is not None: manter &= np.isin(colunas['Ano'][posicoes], ano)
+        if trimestre is not None: manter &= np.isin(colunas['Trimestre'][posicoes], trimestre)
+        if minimo is not None: manter &= centavos >= minimo
+        if maximo is not None: manter &= centavos <= maximo
+        posicoes = posicoes[manter]
+        if not len(posicoes): continue
+
+        registros = colunas['RegistroANS'][posicoes]
+        na_dimensao = np.searchsorted(registros_dim, registros)
+        na_dimensao[(na_dimensao >= len(registros_dim)) |
+                    (registros_dim[np.minimum(na_dimensao, len(registros_dim) - 1)] != registros)] = len(registros_dim)
+        yield pd.DataFrame({
+            'RegistroANS': registros,
+            'Ano': colunas['Ano'][posicoes],
+            'Trimestre': rotulos[colunas['Trimestre'][posicoes]],
+            'Valor Despesas': centavos[manter] / 100,
+            'Descricao': descricoes[codigos_descricao[posicoes]],
+            **{col: atributos[col][na_dimensao] for col in ATRIBUTOS_DIMENSAO},
+        })
+
+def _tabela_arrow(df):
+    return pa.Table.from_pandas(df, schema=ESQUEMA_EXPORTACAO, preserve_index=False)
+
+def _csv(partes):
+    """Com pyarrow, o escritor de CSV do Arrow (~10x o to_csv; textos saem entre aspas); sem ele, o to_csv."""
+    yield ';'.join(COLUNAS_EXPORTACAO).encode('utf-8-sig') + b'\n'  # mesmo cabeçalho e BOM do consolidado
+    for df in partes:
+        if PARQUET_DISPONIVEL:
+            saida = pa.BufferOutputStream()
+            pa_csv.write_csv(_tabela_arrow(df), saida, pa_csv.WriteOptions(include_header=False, delimiter=';'))
+            yield saida.getvalue().to_pybytes()
+        else:
+            yield df.to_csv(sep=';', index=False, header=False, lineterminator='\n').encode('utf-8')
+
+def _ndjson(partes):
+    """Uma despesa por linha, serializada como no NDJSON de /api/operadoras (valores com a menor representação exata)."""
+    for df in partes:
+        colunas = [df[col].tolist() for col in COLUNAS_EXPORTACAO]
+        yield b''.join(dumps_json(dict(zip(COLUNAS_EXPORTACAO, linha))) + b'\n' for linha in zip(*colunas))
+
+class _Coletor:
+    """Arquivo só de escrita para o ParquetWriter: guarda os bytes até o próximo envio."""
+
+    def __init__(self):
+        self.pedacos, self.posicao, self.closed = [], 0, False
+
+    def write(self, dados):
+        self.pedacos.append(bytes(dados))
+        self.posicao += len(dados)
+        return len(dados)
+
+    def tell(self):
+        return self.posicao
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def retirar(self):
+        saida, self.pedacos = b''.join(self.pedacos), []
+        return saida
+
+def _parquet(partes):
+    """Um row group por bloco; cada row group é enviado assim que é escrito, e o rodapé no fim."""
+    coletor = _Coletor()
+    with pq.ParquetWriter(coletor, ESQUEMA_EXPORTACAO, compression='snappy') as escritor:
+        for df in partes:
+            escritor.write_table(_tabela_arrow(df))
+            pedaco = coletor.retirar()
+            if pedaco: yield pedaco
+    yield coletor.retirar()
+
+SERIALIZADORES = {'csv': _csv, 'ndjson': _ndjson, 'parquet': _parquet}
+
+def comprimir_gzip(pedacos, nivel=6):
+    """Comprime um gerador de bytes em gzip sem juntar tudo em memória."""
+    compressor = zlib.compressobj(nivel, zlib.DEFLATED, 31)  # wbits 31 = cabeçalho gzip
+    for pedaco in pedacos:
+        saida = compressor.compress(pedaco)
+        if saida: yield saida
+    yield compressor.flush()
+
+def exportar(snap, formato, gzip=False, **filtros):
+    """Gerador de bytes da exportação filtrada no formato pedido (csv, ndjson ou parquet)."""
+    corpo = SERIALIZADORES[formato](blocos(snap, **filtros))
+    return comprimir_gzip(corpo) if gzip else corpo
@@ -0,0 +1,343 @@
+"""Índices em memória montados uma única vez, na carga de dados da API.
+
+As rotas não varrem mais as tabelas a cada requisição. As operadoras ficam em
+dicionários por RegistroANS e por CNPJ (só dígitos). As despesas ficam ordenadas
+por RegistroANS/Ano/Trimestre, com o intervalo [início, fim) de cada operadora,
+então buscar as despesas de uma operadora custa O(1) + tamanho do resultado.
+A busca textual usa n-gramas (1 a 3 caracteres) sobre nomes já normalizados e
+sem acento, e sobre os dígitos de CNPJ e RegistroANS, com as listas em arrays NumPy.
+As estatísticas do dashboard são calculadas uma vez por versão dos dados e guardadas
+já serializadas, com ETag.
+"""
+import base64
+import hashlib
+import json
+import unicodedata
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from tabela_compacta import ROTULOS_TRIMESTRE, rotulo_trimestre
+
+
+def dumps_json(obj):
+    """JSON compacto em bytes (orjson quando instalado), no mesmo formato da resposta padrão do FastAPI."""
+    if orjson is not None: return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode('utf-8')
+
+def codificar_cursor(dados):
+    """Cursor opaco para paginação por chave (base64 de um JSON pequeno)."""
+    return base64.urlsafe_b64encode(json.dumps(dados, separators=(",", ":")).encode()).decode().rstrip('=')
+
+def decodificar_cursor(cursor):
+    """Inverso de codificar_cursor; ValueError se o cursor não for válido."""
+    try:
+        dados = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except Exception as e:
+        raise ValueError(f"cursor inválido: {e}")
+    if not isinstance(dados, dict) or not isinstance(dados.get('k'), int): raise ValueError("cursor inválido")
+    return dados
+
+def so_digitos(valor):
+    return ''.join(filter(str.isdigit, str(valor)))
+
+def preencher_vazios(df):
+    """fillna("") que também funciona em colunas categóricas (Parquet traz Descricao/UF como dicionário).
+
+    Só copia o DataFrame se alguma coluna tiver nulos (colunas mapeadas do snapshot ficam como estão)."""
+    saida = df
+    for col in df.columns:
+        s = df[col]
+        if pd.api.types.is_integer_dtype(s.dtype) or not s.isna().any(): continue
+        if isinstance(s.dtype, pd.CategoricalDtype) and '' not in s.cat.categories:
+            s = s.cat.add_categories('')
+        if saida is df: saida = df.copy()
+        saida[col] = s.fillna('')
+    return saida
+
+class IndiceOperadoras:
+    """RegistroANS -> linha do cadastro e CNPJ (só dígitos) -> RegistroANS.
+
+    As linhas do cadastro já ficam prontas para a resposta (fillna + dict) e também
+    separadas por coluna, para projeções (fields=). A ordem estável da listagem é por
+    RegistroANS, o que permite paginação por chave."""
+
+    def __init__(self, df_operadoras):
+        self.posicao = {}
+        self.por_cnpj = {}
+        self.linhas = []
+        self._preparar_listagem()
+        if df_operadoras.empty: return
+        self.linhas = preencher_vazios(df_operadoras).to_dict(orient="records")
+        self._preparar_listagem()
+        registros = df_operadoras['RegistroANS'].astype('int64').tolist()
+        self.posicao = dict(zip(registros, range(len(registros))))
+        if 'CNPJ' in df_operadoras.columns:
+            cnpjs = df_operadoras['CNPJ'].astype(str).str.replace(r'[^0-9]', '', regex=True)
+            for cnpj, reg in zip(cnpjs.tolist(), registros):
+                if cnpj: self.por_cnpj.setdefault(cnpj, reg)  # o primeiro vence, como no op.iloc[0]
+
+    def _preparar_listagem(self):
+        self.colunas = {c: [linha[c] for linha in self.linhas] for c in (self.linhas[0] if self.linhas else [])}
+        self.registros = np.array(self.colunas.get('RegistroANS', []), dtype=np.int64)
+        self.ordem = np.argsort(self.registros, kind='stable').astype(np.int32)
+        self.registros_ordenados = self.registros[self.ordem]
+
+    def pagina(self, posicoes, campos=None):
+        """Linhas das posições; com campos, só essas chaves (montadas a partir das listas por coluna)."""
+        if campos is None: return [self.linhas[p] for p in posicoes]
+        valores = [self.colunas[c] for c in campos]
+        return [dict(zip(campos, [v[p] for v in valores])) for p in posicoes]
+
+    def exportar(self):
+        return {'linhas': self.linhas, 'por_cnpj': self.por_cnpj}
+
+    @classmethod
+    def importar(cls, meta):
+        """Reconstrói a partir do snapshot binário sem refazer fillna/to_dict/regex."""
+        self = cls.__new__(cls)
+        self.linhas = meta['linhas']
+        self.por_cnpj = meta['por_cnpj']
+        self.posicao = {linha['RegistroANS']: pos for pos, linha in enumerate(self.linhas)}
+        self._preparar_listagem()
+        return self
+
+    def resolver(self, identificador):
+        """RegistroANS de um identificador (Registro ANS ou CNPJ, com ou sem máscara), ou None."""
+        id_clean = so_digitos(identificador)
+        if not id_clean: return None
+        if int(id_clean) in self.posicao: return int(id_clean)
+        return self.por_cnpj.get(id_clean)
+
+class IndiceDespesas:
+    """Fatos compactos (tabela_compacta) pré-ordenados por RegistroANS/Ano/Trimestre, com o intervalo
+    de linhas de cada operadora. A resposta é montada só para a fatia pedida."""
+
+    def __init__(self, fatos, intervalos=None):
+        """intervalos: {RegistroANS: (início, fim)} de uma tabela já ordenada (snapshot); None = ordena aqui."""
+        self.intervalos = {}
+        self.tabela = fatos
+        if fatos.empty: return
+
+        if intervalos is None:
+            self.tabela = fatos.sort_values(['RegistroANS', 'Ano', 'Trimestre'], kind='stable', ignore_index=True)
+            unicos, inicios, contagens = np.unique(self.tabela['RegistroANS'].to_numpy(), return_index=True, return_counts=True)
+            intervalos = {reg: (ini, ini + n) for reg, ini, n in zip(unicos.tolist(), inicios.tolist(), contagens.tolist())}
+        self.intervalos = intervalos
+        self._ano = self.tabela['Ano'].to_numpy()
+        self._trimestre = self.tabela['Trimestre'].to_numpy()
+        self._centavos = self.tabela['ValorCentavos'].to_numpy()
+        descricao = self.tabela['Descricao'].array
+        self._descricao = descricao.codes
+        self._descricoes = [str(c) for c in descricao.categories] + ['']  # código -1 (nulo) cai no ''
+
+    def registros(self, registro):
+        ini, fim = self.intervalos.get(registro, (0, 0))
+        if fim <= ini: return []
+        descricoes = self._descricoes
+        return [{'Ano': a, 'Trimestre': ROTULOS_TRIMESTRE[t], 'Valor Despesas': c / 100, 'Descricao': descricoes[d]}
+                for a, t, c, d in zip(self._ano[ini:fim].tolist(), self._trimestre[ini:fim].tolist(),
+                                      self._centavos[ini:fim].tolist(), self._descricao[ini:fim].tolist())]
+
+def normalizar_texto(texto):
+    """Minúsculas, sem acentos e com espaços colapsados ('São  Paulo' -> 'sao paulo')."""
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(texto.lower().split())
+
+TAMANHO_NGRAMA = 3
+_VAZIO = np.empty(0, dtype=np.int32)
+
+def _ngramas(texto, n):
+    return {texto[i:i + n] for i in range(len(texto) - n + 1)}
+
+def _para_arrays(postagens):
+    return {g: np.array(p, dtype=np.int32) for g, p in postagens.items()}
+
+class _IndiceNgramas:
+    """Lista invertida de n-gramas (1..TAMANHO_NGRAMA) de um campo de texto, para busca por substring.
+
+    Também guarda quem começa com cada prefixo curto (texto inteiro e cada palavra), o que
+    permite dar nota às consultas curtas sem olhar texto por texto."""
+
+    def __init__(self, textos):
+        self.textos = textos
+        self.tamanhos = np.fromiter(map(len, textos), dtype=np.int32, count=len(textos))
+        postagens, inicio, palavra = defaultdict(list), defaultdict(list), defaultdict(list)
+        faixa = range(1, TAMANHO_NGRAMA + 1)
+        for pos, texto in enumerate(textos):
+            for g in set().union(*(_ngramas(texto, n) for n in faixa)): postagens[g].append(pos)
+            for g in {texto[:n] for n in faixa if len(texto) >= n}: inicio[g].append(pos)
+            for g in {p[:n] for p in texto.split() for n in faixa}: palavra[g].append(pos)
+        self.postagens, self.inicio, self.palavra = _para_arrays(postagens), _para_arrays(inicio), _para_arrays(palavra)
+
+    _LISTAS = ('postagens', 'inicio', 'palavra')
+
+    def exportar(self):
+        """(metadados JSON, arrays) com as listas invertidas concatenadas, para o snapshot binário."""
+        meta, arrays = {'textos': self.textos}, {}
+        for nome in self._LISTAS:
+            d = getattr(self, nome)
+            meta[nome] = list(d)
+            arrays[nome] = np.concatenate(list(d.values())) if d else _VAZIO
+            arrays[nome + '_fim'] = np.cumsum([len(v) for v in d.values()], dtype=np.int64)
+        return meta, arrays
+
+    @classmethod
+    def importar(cls, meta, arrays):
+        """Inverso de exportar(); as listas viram fatias (views) dos arrays, que podem estar mapeados em memória."""
+        self = cls.__new__(cls)
+        self.textos = meta['textos']
+        self.tamanhos = np.fromiter(map(len, self.textos), dtype=np.int32, count=len(self.textos))
+        for nome in self._LISTAS:
+            posicoes, fins = arrays[nome], arrays[nome + '_fim'].tolist()
+            inicios = [0] + fins[:-1]
+            setattr(self, nome, {g: posicoes[a:b] for g, a, b in zip(meta[nome], inicios, fins)})
+        return self
+
+    def buscar(self, q):
+        """(posições, notas) dos textos que contêm q.
+
+        Nota: 0 igual, 1 começa com, 2 alguma palavra começa com, 3 só contém."""
+        if len(q) <= TAMANHO_NGRAMA:
+            # A própria consulta é um n-grama: a lista já é exata e as notas saem das listas de prefixos
+            pos = self.postagens.get(q, _VAZIO)
+            nota = np.full(len(pos), 3, dtype=np.int8)
+            nota[np.isin(pos, self.palavra.get(q, _VAZIO), assume_unique=True)] = 2
+            nota[np.isin(pos, self.inicio.get(q, _VAZIO), assume_unique=True)] = 1
+            nota[(nota == 1) & (self.tamanhos[pos] == len(q))] = 0
+            return pos, nota
+
+        # Consulta longa: intersecta as listas dos trigramas (da menor para a maior) e confere o que sobrou
+        listas = sorted((self.postagens.get(g, _VAZIO) for g in _ngramas(q, TAMANHO_NGRAMA)), key=len)
+        candidatos = listas[0]
+        for lista in listas[1:]:
+            if len(candidatos) < 64: break  # com poucos candidatos, conferir direto sai mais barato
+            candidatos = np.intersect1d(candidatos, lista, assume_unique=True)
+        pos, nota = [], []
+        for p in candidatos.tolist():
+            texto = self.textos[p]
+            if q not in texto: continue
+            pos.append(p)
+            nota.append(0 if texto == q else 1 if texto.startswith(q) else 2 if (' ' + q) in texto else 3)
+        return np.array(pos, dtype=np.int32), np.array(nota, dtype=np.int8)
+
+class IndiceBusca:
+    """Busca de /api/operadoras?search= por Razão Social, CNPJ ou RegistroANS, com ranking.
+
+    Ranking: igual > começa com > alguma palavra começa com > contém; empates por RegistroANS."""
+
+    def __init__(self, df_operadoras):
+        n = len(df_operadoras)
+        coluna = lambda c: df_operadoras[c].tolist() if c in df_operadoras.columns else [None] * n
+        self.n = n
+        self.registros = np.array(coluna('RegistroANS') if 'RegistroANS' in df_operadoras.columns else range(n), dtype=np.int64)
+        self._nomes = _IndiceNgramas([normalizar_texto(v) if isinstance(v, str) else '' for v in coluna('RazaoSocial')])
+        self._cnpjs = _IndiceNgramas([so_digitos(v) if isinstance(v, str) else '' for v in coluna('CNPJ')])
+        self._registros = _IndiceNgramas(['' if v is None else str(v) for v in coluna('RegistroANS')])
+
+    _CAMPOS = ('_nomes', '_cnpjs', '_registros')
+
+    def exportar(self):
+        meta, arrays = {'n': self.n}, {'_chaves': self.registros}
+        for campo in self._CAMPOS:
+            meta[campo], a = getattr(self, campo).exportar()
+            arrays.update({f'{campo}_{nome}': v for nome, v in a.items()})
+        return meta, arrays
+
+    @classmethod
+    def importar(cls, meta, arrays):
+        self = cls.__new__(cls)
+        self.n = meta['n']
+        self.registros = arrays['_chaves']
+        for campo in self._CAMPOS:
+            a = {nome[len(campo) + 1:]: v for nome, v in arrays.items() if nome.startswith(campo + '_')}
+            setattr(self, campo, _IndiceNgramas.importar(meta[campo], a))
+        return self
+
+    def buscar(self, consulta):
+        """Posições (linhas do cadastro) que casam com a consulta, já ordenadas pelo ranking."""
+        return self.ranquear(consulta)[0]
+
+    def ranquear(self, consulta):
+        """(posições, chaves) em ordem de ranking; a chave (nota, RegistroANS) é crescente e única,
+        e serve de cursor para paginação por chave."""
+        q = normalizar_texto(consulta)
+        if not q:
+            ordem = np.argsort(self.registros, kind='stable').astype(np.int32)
+            return ordem, self.registros[ordem]
+        resultados = [self._nomes.buscar(q)]
+
+        # Consulta só com dígitos e máscara (pontos, barra, traço): procura também em CNPJ e RegistroANS
+        d = so_digitos(q)
+        if d and not q.strip('0123456789./- '):
+            resultados += [self._cnpjs.buscar(d), self._registros.buscar(d)]
+
+        pos = np.concatenate([r[0] for r in resultados])
+        nota = np.concatenate([r[1] for r in resultados])
+        # Melhor nota de cada posição e depois ordem (nota, posição)
+        ordem = np.lexsort((nota, pos))
+        pos, nota = pos[ordem], nota[ordem]
+        primeiro = np.r_[True, pos[1:] != pos[:-1]] if len(pos) else np.empty(0, dtype=bool)
+        pos, nota = pos[primeiro], nota[primeiro]
+        chaves = (nota.astype(np.int64) << 40) + self.registros[pos]
+        ordem = np.argsort(chaves, kind='stable')
+        return pos[ordem], chaves[ordem]
+
+def _em_reais(centavos):
+    return int(centavos) / 100
+
+class Estatisticas:
+    """Totais do dashboard (geral, por UF, por ano e por trimestre) já serializados em JSON.
+
+    Somas em centavos inteiros (exatas); a UF vem da dimensão de operadoras, não das linhas.
+    O ETag é o hash do conteúdo: a mesma base gera o mesmo ETag, inclusive entre reinícios."""
+
+    def __init__(self, fatos, dimensao, df_operadoras):
+        if fatos.empty:
+            self.dados = {"total_geral": 0, "top_ufs": []}
+        else:
+            por_registro = fatos.groupby('RegistroANS')['ValorCentavos'].sum()
+            # UF do consolidado; sem ela (consolidado antigo), a do cadastro
+            origem_uf = dimensao if 'UF' in dimensao.columns else df_operadoras
+            ufs = origem_uf.drop_duplicates('RegistroANS').set_index('RegistroANS')['UF'] if 'UF' in origem_uf.columns \
+                else pd.Series(dtype=object)
+            ufs = ufs.reindex(por_registro.index)
+            # 'N/A' (operadora sem cadastro) não entra no ranking, como na leitura do CSV
+            por_uf = por_registro.groupby(ufs.to_numpy(dtype=object)).sum()
+            por_uf = por_uf[por_uf.index != 'N/A'].sort_values(ascending=False, kind='stable')
+            por_ano = fatos.groupby('Ano')['ValorCentavos'].sum().sort_index()
+            por_trimestre = fatos.groupby(['Ano', 'Trimestre'])['ValorCentavos'].sum().sort_index()
+            self.dados = {
+                "total_geral": _em_reais(fatos['ValorCentavos'].sum()),
+                "top_ufs": [{"uf": k, "total": _em_reais(v)} for k, v in por_uf.head(5).items()],
+                "por_uf": [{"uf": k, "total": _em_reais(v)} for k, v in por_uf.items()],
+                "por_ano": [{"ano": int(k), "total": _em_reais(v)} for k, v in por_ano.items()],
+                "por_trimestre": [{"ano": int(a), "trimestre": rotulo_trimestre(int(t)), "total": _em_reais(v)}
+                                  for (a, t), v in por_trimestre.items()],
+            }
+        self._serializar()
+
+    def _serializar(self):
+        self.corpo = json.dumps(self.dados, ensure_ascii=False, separators=(",", ":")).encode('utf-8')
+        self.etag = '"' + hashlib.sha1(self.corpo).hexdigest()[:20] + '"'
+
+    @classmethod
+    def de_dados(cls, dados):
+        """Reconstrói a partir de estatísticas já calculadas (snapshot binário), sem tocar nas despesas."""
+        self = cls.__new__(cls)
+        self.dados = dados
+        self._serializar()
+        return self
+
+def etag_confere(if_none_match, etag):
+    """True se o cabeçalho If-None-Match do cliente já cobre o ETag atual (aceita lista, W/ e *)."""
+    if not if_none_match: return False
+    candidatos = [c.strip() for c in if_none_match.split(',')]
+    return '*' in candidatos or etag in [c[2:] if c.startswith('W/') else c for c in candidatos]
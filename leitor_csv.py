@@ -0,0 +1,175 @@
+"""Leitura de CSVs da ANS compartilhada pelas etapas 1, 3 e 4.
+
+O dialeto (encoding + separador) é detectado uma única vez a partir de uma amostra
+de bytes e fica em cache por caminho, tamanho e mtime. Execuções seguintes não
+repetem a detecção enquanto o arquivo não mudar.
+"""
+import codecs
+import csv
+import json
+import os
+import threading
+from collections import namedtuple
+
+import pandas as pd
+
+ARQUIVO_CACHE = os.environ.get("ANS_CACHE_DIALETOS", ".cache_dialetos.json")
+TAMANHO_AMOSTRA = 64 * 1024
+SEPARADORES = ';,\t|'
+ENCODING_RESERVA = 'latin1'  # decodifica qualquer byte
+
+Dialeto = namedtuple('Dialeto', ['encoding', 'sep'])
+
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+_cache = None
+_lock = threading.Lock()
+
+def _reserva_latin1(erro):
+    """Bytes que não valem no encoding detectado pela amostra são lidos como latin1 (sem reler o arquivo)."""
+    return erro.object[erro.start:erro.end].decode(ENCODING_RESERVA), erro.end
+
+# Para leituras em chunks, que não podem recomeçar do zero: pd.read_csv(..., encoding_errors=ERROS_ENCODING)
+ERROS_ENCODING = 'reserva_latin1'
+codecs.register_error(ERROS_ENCODING, _reserva_latin1)
+
+def detectar_dialeto_amostra(amostra):
+    """Detecta BOM, encoding e separador a partir dos primeiros bytes do arquivo."""
+    enc = next((e for bom, e in BOMS if amostra.startswith(bom)), None)
+    if enc is None:
+        try:
+            # final=False: um caractere multibyte cortado no fim da amostra não é erro
+            codecs.getincrementaldecoder('utf-8')().decode(amostra, final=False)
+            enc = 'utf-8'
+        except UnicodeDecodeError:
+            enc = 'latin1'
+
+    linhas = amostra.decode(enc, errors='ignore').splitlines()
+    if len(linhas) > 1: linhas = linhas[:-1]  # a última linha da amostra pode estar incompleta
+    linhas = linhas[:50]
+    if not linhas: return Dialeto(enc, ';')
+
+    try:
+        sep = csv.Sniffer().sniff('\n'.join(linhas), delimiters=SEPARADORES).delimiter
+    except csv.Error:
+        sep = max(SEPARADORES, key=linhas[0].count)
+    return Dialeto(enc, sep)
+
+def _carregar_cache():
+    global _cache
+    if _cache is None:
+        try:
+            with open(ARQUIVO_CACHE, encoding='utf-8') as f: _cache = json.load(f)
+        except (OSError, ValueError):
+            _cache = {}
+    return _cache
+
+def _salvar_cache():
+    tmp = ARQUIVO_CACHE + '.tmp'
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f: json.dump(_cache, f, indent=1)
+        os.replace(tmp, ARQUIVO_CACHE)
+    except OSError as e:
+        print(f"Aviso: não foi possível salvar o cache de dialetos: {e}")
+
+def detectar_dialeto(caminho):
+    """Dialeto do arquivo, usando o cache enquanto tamanho e mtime não mudarem."""
+    st = os.stat(caminho)
+    chave = os.path.abspath(caminho)
+    with _lock:
+        entrada = _carregar_cache().get(chave)
+        if entrada and entrada['tamanho'] == st.st_size and entrada['mtime_ns'] == st.st_mtime_ns:
+            return Dialeto(entrada['encoding'], entrada['sep'])
+
+    with open(caminho, 'rb') as f:
+        dialeto = detectar_dialeto_amostra(f.read(TAMANHO_AMOSTRA))
+    _gravar_dialeto(caminho, st, dialeto)
+    return dialeto
+
+def _gravar_dialeto(caminho, st, dialeto):
+    with _lock:
+        _carregar_cache()[os.path.abspath(caminho)] = {'tamanho': st.st_size, 'mtime_ns': st.st_mtime_ns,
+                                                       'encoding': dialeto.encoding, 'sep': dialeto.sep}
+        _salvar_cache()
+
+def ler_csv(caminho, **kwargs):
+    """pd.read_csv com o dialeto detectado (arquivo em disco ou objeto binário com seek).
+
+    Se a amostra parecia UTF-8 mas o resto do arquivo não é, relê em latin1 (e corrige o cache)."""
+    objeto = hasattr(caminho, 'read')
+    if objeto:
+        pos = caminho.tell()
+        dialeto = detectar_dialeto_amostra(caminho.read(TAMANHO_AMOSTRA))
+        caminho.seek(pos)
+    else:
+        dialeto = detectar_dialeto(caminho)
+    kwargs.setdefault('on_bad_lines', 'skip')
+    try:
+        return pd.read_csv(caminho, sep=dialeto.sep, encoding=dialeto.encoding, **kwargs)
+    except UnicodeDecodeError as e:
+        if dialeto.encoding == ENCODING_RESERVA: raise
+        print(f"Aviso: {getattr(caminho, 'name', caminho)} não é {dialeto.encoding} ({e.reason}); relendo como {ENCODING_RESERVA}.")
+        dialeto = dialeto._replace(encoding=ENCODING_RESERVA)
+        if objeto: caminho.seek(pos)
+        else: _gravar_dialeto(caminho, os.stat(caminho), dialeto)
+        return pd.read_csv(caminho, sep=dialeto.sep, encoding=dialeto.encoding, **kwargs)
+
+# --- CADASTRO DE OPERADORAS (Relatorio_cadop.csv) ---
+
+def normalizar_nome_coluna(coluna):
+    return coluna.strip().upper().replace('_', '').replace(' ', '')
+
+# Ordem importa: o primeiro candidato encontrado vence
+CANDIDATOS_REGISTRO = ['REGISTROOPERADORA', 'REGISTROANS', 'CDOP', 'CODIGO', 'ANS', 'REGISTRO']
+CANDIDATOS_RAZAO = ['RAZAOSOCIAL', 'RAZAO', 'NOMEOPERADORA', 'NOME']
+
+def _achar_coluna(colunas, candidatos):
+    for candidato in candidatos:
+        if candidato in colunas: return candidato
+    return next((c for c in colunas for candidato in candidatos if candidato in c), None)
+
+def normalizar_cadastro(df):
+    """Padroniza o cadastro: RegistroANS (int), CNPJ, RazaoSocial e UF; demais colunas em MAIÚSCULAS sem '_'.
+
+    Linhas sem registro numérico são descartadas e o registro fica único.
+    Devolve DataFrame vazio se a coluna de registro não existir."""
+    df = df.rename(columns=normalizar_nome_coluna)
+    colunas = list(df.columns)
+
+    col_reg = _achar_coluna(colunas, CANDIDATOS_REGISTRO)
+    if not col_reg:
+        print(f"ERRO: Coluna RegistroANS não encontrada no cadastro. Colunas disponíveis: {colunas}")
+        return pd.DataFrame()
+
+    renomear = {col_reg: 'RegistroANS'}
+    col_cnpj = next((c for c in colunas if 'CNPJ' in c), None)
+    col_razao = _achar_coluna(colunas, CANDIDATOS_RAZAO)
+    col_uf = 'UF' if 'UF' in colunas else None
+    for col, nome in [(col_cnpj, 'CNPJ'), (col_razao, 'RazaoSocial'), (col_uf, 'UF')]:
+        if col: renomear[col] = nome
+    df = df.rename(columns=renomear)
+
+    df['RegistroANS'] = pd.to_numeric(df['RegistroANS'], errors='coerce')
+    df = df.dropna(subset=['RegistroANS'])
+    df['RegistroANS'] = df['RegistroANS'].astype('int64')
+    return df.drop_duplicates(subset=['RegistroANS']).reset_index(drop=True)
+
+def colunas_texto(colunas):
+    """dtype do cadastro: CNPJ e registro como texto (zeros à esquerda); as demais colunas mantêm o tipo inferido."""
+    normalizadas = {normalizar_nome_coluna(c): c for c in colunas}
+    col_reg = _achar_coluna(list(normalizadas), CANDIDATOS_REGISTRO)
+    return {c: str for n, c in normalizadas.items() if 'CNPJ' in n or n == col_reg}
+
+def ler_cadastro(caminho):
+    """Lê e normaliza o Relatorio_cadop.csv. Usado por todas as etapas para garantir a mesma interpretação."""
+    try:
+        df = ler_csv(caminho, dtype=colunas_texto(ler_csv(caminho, nrows=0).columns))
+    except Exception as e:
+        print(f"Erro ao ler cadastro: {e}")
+        return pd.DataFrame()
+    if df.empty: return df
+    return normalizar_cadastro(df)
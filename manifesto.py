@@ -0,0 +1,73 @@
+"""Manifesto persistente dos downloads da ANS.
+
+Guarda, por URL, o ETag/Last-Modified devolvido pelo servidor, o tamanho, o hash
+do conteúdo e a partição processada gerada a partir dele. Com isso o crawler faz
+requisições condicionais e só reprocessa o que mudou.
+"""
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from email.utils import formatdate
+
+ARQUIVO_MANIFESTO = os.environ.get("ANS_MANIFESTO", "manifesto_downloads.json")
+
+class Manifesto:
+    """Manifesto em JSON (gravação atômica, thread-safe)."""
+
+    def __init__(self, caminho=ARQUIVO_MANIFESTO, ignorar_anterior=False):
+        self.caminho = caminho
+        self.alterados = set()  # URLs cujo conteúdo mudou nesta execução
+        self._lock = threading.Lock()
+        self._dados = {'arquivos': {}, 'consolidado': {}}
+        if not ignorar_anterior and os.path.exists(caminho):
+            try:
+                with open(caminho, encoding='utf-8') as f: self._dados.update(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"Aviso: manifesto ilegível, começando do zero ({e})")
+
+    def entrada(self, url):
+        with self._lock:
+            return dict(self._dados['arquivos'].get(url, {}))
+
+    def cabecalhos_condicionais(self, url, arquivo_local=None):
+        """If-None-Match / If-Modified-Since para a URL. Sem histórico, usa o mtime do arquivo local."""
+        e = self.entrada(url)
+        cabecalhos = {}
+        if e.get('etag'): cabecalhos['If-None-Match'] = e['etag']
+        if e.get('last_modified'):
+            cabecalhos['If-Modified-Since'] = e['last_modified']
+        elif arquivo_local and os.path.exists(arquivo_local):
+            cabecalhos['If-Modified-Since'] = formatdate(os.path.getmtime(arquivo_local), usegmt=True)
+        return cabecalhos
+
+    def registrar(self, url, info, particao=None):
+        """Atualiza a entrada da URL; marca como alterada se o hash mudou."""
+        with self._lock:
+            anterior = self._dados['arquivos'].get(url, {})
+            if anterior.get('sha256') != info.get('sha256'): self.alterados.add(url)
+            self._dados['arquivos'][url] = {
+                'etag': info.get('etag'),
+                'last_modified': info.get('last_modified'),
+                'tamanho': info.get('tamanho'),
+                'sha256': info.get('sha256'),
+                'particao': particao if particao is not None else anterior.get('particao'),
+                'baixado_em': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            }
+
+    def marcar_alterado(self, url):
+        with self._lock: self.alterados.add(url)
+
+    def consolidado(self):
+        with self._lock:
+            return dict(self._dados.get('consolidado', {}))
+
+    def registrar_consolidado(self, **info):
+        with self._lock:
+            self._dados['consolidado'] = info
+
+    def salvar(self):
+        with self._lock:
+            tmp = self.caminho + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f: json.dump(self._dados, f, indent=1, ensure_ascii=False)
+            os.replace(tmp, self.caminho)
@@ -0,0 +1,230 @@
+"""Instrumentação do pipeline: spans de tempo, contadores e memória num relatório JSON.
+
+Cada trecho medido é um span com nome, início, duração, linhas, bytes e o pico de RSS
+do processo ao final. Os spans se aninham por thread: o pai é o span aberto na mesma
+thread. Com memoria=True o tracemalloc é ligado e cada span registra o pico de memória
+alocada pelo Python (custa tempo, por isso é opcional). Com perfil=PASTA, o span mais
+externo de cada thread roda sob o cProfile e grava PASTA/<span>-<pid>-<n>.prof (abra com
+`python -m pstats` ou snakeviz).
+
+Uso nos scripts:
+    with metricas.span('transformacao.leitura') as s:
+        df = ler_despesas(...)
+        s.contar(linhas=len(df))
+    metricas.salvar_relatorio()   # metricas_execucao.json
+"""
+import cProfile
+import json
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+ARQUIVO_METRICAS = os.environ.get("ANS_METRICAS", "metricas_execucao.json")
+
+def pico_rss_mb():
+    """Pico de RSS do processo atual em MB (None se a plataforma não informar).
+
+    No Linux usa VmHWM, que é zerado no exec; o ru_maxrss herdaria o pico do processo pai."""
+    try:
+        with open('/proc/self/status') as f:
+            for linha in f:
+                if linha.startswith('VmHWM:'): return int(linha.split()[1]) / 1024
+    except OSError: pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _mb(n_bytes):
+    return round(n_bytes / 1024 / 1024, 2)
+
+class Span:
+    """Um trecho medido. contar() soma linhas/bytes (ou outro contador) ao span."""
+
+    def __init__(self, nome, pai, inicio, atributos):
+        self.nome = nome
+        self.pai = pai
+        self.inicio = inicio
+        self.atributos = atributos
+        self.contadores = {}
+        self.dados = None
+
+    def contar(self, **contadores):
+        for nome, n in contadores.items():
+            self.contadores[nome] = self.contadores.get(nome, 0) + n
+
+class Coletor:
+    """Guarda os spans e contadores de uma execução. Thread-safe."""
+
+    def __init__(self, memoria=False, perfil=None):
+        self.t0 = time.perf_counter()
+        self.t0_epoch = time.time()
+        self.inicio = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        self.spans = []
+        self.contadores = {}
+        self.perfil = perfil
+        self.perfis = []
+        self._abertos = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.memoria = memoria
+        if memoria and not tracemalloc.is_tracing(): tracemalloc.start()
+
+    def contar(self, **contadores):
+        """Contadores da execução inteira (ex.: bytes baixados)."""
+        with self._lock:
+            for nome, n in contadores.items():
+                self.contadores[nome] = self.contadores.get(nome, 0) + n
+
+    @contextmanager
+    def span(self, nome, **atributos):
+        pilha = self._local.__dict__.setdefault('pilha', [])
+        s = Span(nome, pilha[-1].nome if pilha else None, time.perf_counter(), atributos)
+        perfilador = None
+        if self.perfil and not pilha:
+            perfilador = cProfile.Profile()
+        with self._lock:
+            # O pico do tracemalloc é global: só é zerado quando nenhum outro span está medindo
+            if self.memoria and self._abertos == 0: tracemalloc.reset_peak()
+            self._abertos += 1
+        pilha.append(s)
+        erro = None
+        if perfilador:
+            try:
+                perfilador.enable()
+            except ValueError:  # outro perfilador já ativo (Python 3.12+: um só por processo)
+                perfilador = None
+        try:
+            yield s
+        except BaseException as e:
+            erro = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            if perfilador: perfilador.disable()
+            pilha.remove(s)  # remove e não pop: um gerador pode fechar o span fora de ordem
+            self._fechar(s, erro, perfilador)
+
+    def _fechar(self, s, erro, perfilador):
+        duracao = time.perf_counter() - s.inicio
+        dados = {'nome': s.nome, 'pai': s.pai, 'thread': threading.current_thread().name,
+                 'inicio_s': round(s.inicio - self.t0, 4), 'duracao_s': round(duracao, 4)}
+        dados.update(s.atributos)
+        dados.update(s.contadores)
+        if 'linhas' in s.contadores and duracao: dados['linhas_por_s'] = round(s.contadores['linhas'] / duracao)
+        if 'bytes' in s.contadores and duracao: dados['mb_por_s'] = round(s.contadores['bytes'] / duracao / 1024 / 1024, 2)
+        rss = pico_rss_mb()
+        if rss is not None: dados['rss_pico_mb'] = round(rss, 1)
+        if self.memoria: dados['tracemalloc_pico_mb'] = _mb(tracemalloc.get_traced_memory()[1])
+        if erro: dados['erro'] = erro
+        if perfilador:
+            dados['perfil'] = self._gravar_perfil(s.nome, perfilador)
+        with self._lock:
+            self._abertos -= 1
+            self.spans.append(dados)
+        s.dados = dados
+
+    def _gravar_perfil(self, nome, perfilador):
+        os.makedirs(self.perfil, exist_ok=True)
+        with self._lock:
+            n = len(self.perfis) + 1
+            caminho = os.path.join(self.perfil, f"{re.sub(r'[^A-Za-z0-9_.-]', '_', nome)}-{os.getpid()}-{n}.prof")
+            self.perfis.append(caminho)
+        perfilador.dump_stats(caminho)
+        return caminho
+
+    def exportar(self):
+        """Spans e contadores para enviar a outro processo (o coletor do processo pai)."""
+        with self._lock:
+            return {'t0_epoch': self.t0_epoch, 'pid': os.getpid(), 'spans': list(self.spans),
+                    'contadores': dict(self.contadores), 'perfis': list(self.perfis)}
+
+    def incorporar(self, exportado):
+        """Junta o que um processo do pool mediu, com os inícios trazidos para a escala deste coletor."""
+        desvio = exportado['t0_epoch'] - self.t0_epoch
+        spans = [dict(s, inicio_s=round(s['inicio_s'] + desvio, 4), pid=exportado['pid']) for s in exportado['spans']]
+        with self._lock:
+            self.spans.extend(spans)
+            self.perfis.extend(exportado.get('perfis', []))
+            for nome, n in exportado['contadores'].items():
+                self.contadores[nome] = self.contadores.get(nome, 0) + n
+
+    def relatorio(self, **extras):
+        total = time.perf_counter() - self.t0
+        memoria = {'rss_pico_mb': round(pico_rss_mb() or 0, 1)}
+        if self.memoria: memoria['tracemalloc_pico_mb'] = _mb(tracemalloc.get_traced_memory()[1])
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s['inicio_s'])
+            relatorio = {'inicio': self.inicio, 'comando': sys.argv, 'pid': os.getpid(), 'total_s': round(total, 3),
+                         'memoria': memoria, 'contadores': dict(self.contadores), 'resumo': resumir(spans), 'spans': spans}
+            if self.perfis: relatorio['perfis'] = list(self.perfis)
+        relatorio.update(extras)
+        return relatorio
+
+def resumir(spans):
+    """Totais por nome de span: quantidade, tempo somado, linhas, bytes e vazão."""
+    resumo = {}
+    for s in spans:
+        r = resumo.setdefault(s['nome'], {'n': 0, 'duracao_s': 0.0, 'linhas': 0, 'bytes': 0})
+        r['n'] += 1
+        r['duracao_s'] += s['duracao_s']
+        r['linhas'] += s.get('linhas', 0)
+        r['bytes'] += s.get('bytes', 0)
+    for r in resumo.values():
+        r['duracao_s'] = round(r['duracao_s'], 4)
+        if r['linhas'] and r['duracao_s']: r['linhas_por_s'] = round(r['linhas'] / r['duracao_s'])
+        if r['bytes'] and r['duracao_s']: r['mb_por_s'] = round(r['bytes'] / r['duracao_s'] / 1024 / 1024, 2)
+    return resumo
+
+# --- COLETOR DO PROCESSO ---
+
+_coletor = Coletor()
+
+def configurar(memoria=False, perfil=None):
+    """Recomeça a coleta (chamado pelos scripts ao iniciar, com as opções da linha de comando)."""
+    global _coletor
+    _coletor = Coletor(memoria, perfil)
+    return _coletor
+
+def coletor():
+    return _coletor
+
+def span(nome, **atributos):
+    return _coletor.span(nome, **atributos)
+
+def contar(**contadores):
+    _coletor.contar(**contadores)
+
+def salvar_relatorio(caminho=None, **extras):
+    """Grava o relatório JSON da execução e imprime o resumo por span."""
+    caminho = caminho or ARQUIVO_METRICAS
+    relatorio = _coletor.relatorio(**extras)
+    with open(caminho + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(relatorio, f, ensure_ascii=False, indent=1)
+    os.replace(caminho + '.tmp', caminho)
+    imprimir_resumo(relatorio)
+    print(f"-> Métricas gravadas em {caminho}")
+    return relatorio
+
+def imprimir_resumo(relatorio):
+    print(f"\n--- Métricas ({relatorio['total_s']:.2f}s, pico RSS {relatorio['memoria']['rss_pico_mb']:.0f} MB) ---")
+    print(f"   {'Span':<32} {'N':>4} {'Tempo (s)':>10} {'Linhas':>12} {'Linhas/s':>11} {'MB':>8}")
+    for nome, r in relatorio['resumo'].items():
+        linhas_s = f"{r['linhas_por_s']:,}" if 'linhas_por_s' in r else "-"
+        mb = f"{r['bytes'] / 1024 / 1024:.1f}" if r['bytes'] else "-"
+        linhas = f"{r['linhas']:,}" if r['linhas'] else "-"
+        print(f"   {nome:<32} {r['n']:>4} {r['duracao_s']:>10.2f} {linhas:>12} {linhas_s:>11} {mb:>8}")
+
+def adicionar_argumentos(parser):
+    """Opções de instrumentação comuns aos scripts do pipeline."""
+    parser.add_argument("--metricas", default=ARQUIVO_METRICAS, help="Arquivo JSON do relatório de métricas da execução")
+    parser.add_argument("--memoria", action="store_true", help="Liga o tracemalloc: pico de memória Python por span (mais lento)")
+    parser.add_argument("--perfil", metavar="PASTA", help="Grava um perfil cProfile (.prof) por span externo de cada thread")
+
+def configurar_pelos_argumentos(args):
+    return configurar(args.memoria, args.perfil)
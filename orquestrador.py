@@ -0,0 +1,153 @@
+"""Orquestrador em processo: as etapas do pipeline formam um DAG.
+
+Cada etapa declara de quais outras depende. As que já têm as dependências prontas
+rodam em paralelo (threads), e o resultado de cada uma (ex.: um DataFrame) é
+entregue em memória às dependentes, sem reler arquivos. Uma etapa é pulada quando
+está em dia: as saídas existem e são mais novas que as entradas (como no make), ou
+quando o seu próprio teste (em_dia) diz que não há nada novo. Nesse caso as
+dependentes recebem None e leem os arquivos, como quando rodam sozinhas.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import metricas
+
+class Etapa:
+    """Nó do DAG. funcao(resultados) recebe {nome da dependência: resultado}.
+
+    entradas/saidas: arquivos para o teste de "em dia"; sempre=True nunca pula (ex.: consulta à ANS);
+    em_dia(resultados): teste próprio, no lugar do das datas."""
+
+    def __init__(self, nome, funcao, depende=(), entradas=(), saidas=(), sempre=False, em_dia=None, descricao=""):
+        self.nome = nome
+        self.funcao = funcao
+        self.depende = list(depende)
+        self.entradas = list(entradas)
+        self.saidas = list(saidas)
+        self.sempre = sempre
+        self.em_dia = em_dia
+        self.descricao = descricao or nome
+
+def _mtime(caminho):
+    try:
+        return os.stat(caminho).st_mtime_ns
+    except OSError:
+        return None
+
+def saidas_em_dia(etapa):
+    """Todas as saídas existem e nenhuma entrada é mais nova que a saída mais antiga."""
+    if etapa.sempre or not etapa.saidas: return False
+    saidas = [_mtime(c) for c in etapa.saidas]
+    if None in saidas: return False
+    entradas = [m for m in map(_mtime, etapa.entradas) if m is not None]
+    return not entradas or min(saidas) >= max(entradas)
+
+def niveis(etapas):
+    """Etapas agrupadas por nível topológico. ValueError em ciclo ou dependência desconhecida."""
+    por_nome = {e.nome: e for e in etapas}
+    for e in etapas:
+        for d in e.depende:
+            if d not in por_nome: raise ValueError(f"Etapa '{e.nome}' depende de '{d}', que não existe.")
+    nivel, feitos = [], set()
+    restantes = [e.nome for e in etapas]
+    while restantes:
+        prontas = [n for n in restantes if all(d in feitos for d in por_nome[n].depende)]
+        if not prontas: raise ValueError(f"Ciclo entre as etapas: {', '.join(restantes)}")
+        nivel.append(prontas)
+        feitos.update(prontas)
+        restantes = [n for n in restantes if n not in feitos]
+    return nivel
+
+def imprimir_plano(etapas, forcar=False):
+    """--dry-run: ordem de execução e o que seria pulado, sem rodar nada."""
+    por_nome = {e.nome: e for e in etapas}
+    print("=== PLANO DE EXECUÇÃO (dry-run) ===")
+    for i, nomes in enumerate(niveis(etapas), 1):
+        print(f"\nNível {i}" + (" (em paralelo)" if len(nomes) > 1 else ""))
+        for nome in nomes:
+            e = por_nome[nome]
+            if forcar or e.sempre: situacao = "executa"
+            elif e.em_dia is not None: situacao = "decide na hora (nada novo = pula)"
+            elif saidas_em_dia(e): situacao = "em dia (pula se as entradas não mudarem)"
+            else: situacao = "executa (saída ausente ou mais antiga que as entradas)"
+            depende = f" <- {', '.join(e.depende)}" if e.depende else ""
+            print(f"   {nome:<12} {e.descricao:<40} {situacao}{depende}")
+
+def caminho_critico(etapas, duracoes):
+    """Caminho mais longo do DAG pelas durações medidas: o mínimo que o pipeline pode levar."""
+    por_nome = {e.nome: e for e in etapas}
+    custo, anterior = {}, {}
+    for nomes in niveis(etapas):
+        for nome in nomes:
+            deps = por_nome[nome].depende
+            melhor = max(deps, key=lambda d: custo[d]) if deps else None
+            custo[nome] = duracoes.get(nome, 0) + (custo[melhor] if melhor else 0)
+            anterior[nome] = melhor
+    if not custo: return [], 0.0
+    fim = max(custo, key=custo.get)
+    total, caminho = custo[fim], []
+    while fim:
+        caminho.append(fim)
+        fim = anterior[fim]
+    return caminho[::-1], total
+
+def executar(etapas, workers=4, forcar=False):
+    """Roda o DAG. Uma etapa com erro cancela as que dependem dela; as independentes seguem.
+    Devolve o relatório: status, início e duração de cada etapa, total e caminho crítico."""
+    por_nome = {e.nome: e for e in etapas}
+    niveis(etapas)  # valida antes de começar
+    t0 = time.perf_counter()
+    resultados, relatorio = {}, {}
+    pendentes = [e.nome for e in etapas]
+
+    def rodar(etapa, entradas):
+        inicio = time.perf_counter()
+        if not forcar and ((etapa.em_dia(entradas) if etapa.em_dia else saidas_em_dia(etapa))):
+            print(f"\n>>> ETAPA EM DIA (pulada): {etapa.descricao}")
+            return 'pulada', None, inicio
+        print(f"\n>>> INICIANDO ETAPA: {etapa.descricao} ({etapa.nome})")
+        with metricas.span(f'etapa.{etapa.nome}'):
+            resultado = etapa.funcao(entradas)
+        print(f">>> SUCESSO na etapa: {etapa.descricao}")
+        return 'ok', resultado, inicio
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        rodando = {}
+        while pendentes or rodando:
+            for nome in list(pendentes):
+                deps = [relatorio.get(d, {}).get('status') for d in por_nome[nome].depende]
+                if any(s in ('erro', 'cancelada') for s in deps):
+                    relatorio[nome] = {'status': 'cancelada'}
+                    pendentes.remove(nome)
+                elif all(s in ('ok', 'pulada') for s in deps):
+                    pendentes.remove(nome)
+                    entradas = {d: resultados.get(d) for d in por_nome[nome].depende}
+                    rodando[pool.submit(rodar, por_nome[nome], entradas)] = nome
+            if not rodando: continue
+
+            feitos, _ = wait(rodando, return_when=FIRST_COMPLETED)
+            for futuro in feitos:
+                nome = rodando.pop(futuro)
+                fim = time.perf_counter()
+                try:
+                    status, resultado, inicio = futuro.result()
+                    resultados[nome] = resultado
+                    relatorio[nome] = {'status': status, 'inicio_s': round(inicio - t0, 3), 'duracao_s': round(fim - inicio, 3)}
+                except Exception as e:
+                    print(f">>> ERRO na etapa: {por_nome[nome].descricao}: {e}")
+                    relatorio[nome] = {'status': 'erro', 'erro': f"{type(e).__name__}: {e}", 'duracao_s': None}
+
+    total = time.perf_counter() - t0
+    caminho, critico = caminho_critico(etapas, {n: r.get('duracao_s') or 0 for n, r in relatorio.items()})
+    return {'etapas': relatorio, 'total_s': round(total, 3), 'caminho_critico': caminho,
+            'caminho_critico_s': round(critico, 3), 'ok': all(r['status'] in ('ok', 'pulada') for r in relatorio.values())}
+
+def imprimir_relatorio(relatorio):
+    print(f"\n{'Etapa':<12} {'Status':<10} {'Início (s)':>10} {'Duração (s)':>12}")
+    for nome, r in relatorio['etapas'].items():
+        inicio = f"{r['inicio_s']:.2f}" if r.get('inicio_s') is not None else "-"
+        duracao = f"{r['duracao_s']:.2f}" if r.get('duracao_s') is not None else "-"
+        print(f"{nome:<12} {r['status']:<10} {inicio:>10} {duracao:>12}")
+    print(f"\nTotal: {relatorio['total_s']:.2f}s | caminho crítico ({' -> '.join(relatorio['caminho_critico'])}): "
+          f"{relatorio['caminho_critico_s']:.2f}s")
@@ -0,0 +1,102 @@
+"""Recarga a quente dos dados da API, sem reiniciar o uvicorn.
+
+Tudo o que as rotas usam (tabelas, índices e estatísticas) fica num Snapshot imutável
+(snapshot_api.py). O snapshot novo é montado fora do caminho das requisições e entra
+no lugar do antigo com uma única atribuição, então cada requisição enxerga uma versão
+inteira, nunca uma mistura das duas.
+"""
+import threading
+import time
+from datetime import datetime, timezone
+
+class Recarregador:
+    """Vigia os arquivos de dados e troca o snapshot quando eles mudam (ou sob demanda).
+
+    carregar(versao) monta um Snapshot; impressao_digital() devolve algo comparável que
+    muda quando o pipeline grava uma saída nova."""
+
+    def __init__(self, carregar, impressao_digital, intervalo=2.0):
+        self.carregar = carregar
+        self.impressao_digital = impressao_digital
+        self.intervalo = intervalo
+        self.atual = None
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+        self._pendente = None
+        self._rejeitada = None  # versão que falhou ou veio vazia: a vigia não insiste até os arquivos mudarem
+        self._info = {'recargas': 0, 'carregado_em': None, 'duracao_s': None, 'ultimo_erro': None}
+
+    def recarregar(self, forcar=False):
+        """Monta um snapshot novo e troca. Devolve True se trocou."""
+        with self._lock:
+            try:
+                versao = self.impressao_digital()
+            except Exception as e:
+                self._info['ultimo_erro'] = f"{type(e).__name__}: {e}"
+                print(f"Erro ao verificar os arquivos de dados: {e}")
+                return False
+            if not forcar and self.atual is not None and versao == self.atual.versao: return False
+            t0 = time.perf_counter()
+            try:
+                novo = self.carregar(versao)
+            except Exception as e:
+                self._info['ultimo_erro'] = f"{type(e).__name__}: {e}"
+                print(f"Erro na recarga (mantendo o snapshot anterior): {e}")
+                self._rejeitada = versao
+                return False
+            # Um arquivo sumido/ilegível não derruba o que já está sendo servido
+            if self.atual is not None and novo.df_despesas.empty and not self.atual.df_despesas.empty:
+                self._info['ultimo_erro'] = "Despesas vazias na nova versão; snapshot anterior mantido."
+                print(f"Aviso: {self._info['ultimo_erro']}")
+                self._rejeitada = versao
+                return False
+
+            self.atual = novo  # a troca: uma atribuição de referência
+            self._rejeitada = None
+            duracao = time.perf_counter() - t0
+            self._info.update(recargas=self._info['recargas'] + 1, duracao_s=round(duracao, 3), ultimo_erro=None,
+                              carregado_em=datetime.now(timezone.utc).isoformat(timespec='seconds'))
+            print(f"-> Snapshot trocado em {duracao:.2f}s: {len(novo.df_despesas)} despesas, "
+                  f"{len(novo.df_operadoras)} operadoras.")
+            return True
+
+    def _vigiar(self):
+        while not self._parar.wait(self.intervalo):
+            try:
+                versao = self.impressao_digital()
+            except Exception as e:
+                print(f"Erro ao verificar os arquivos de dados: {e}")
+                continue
+            # Sem snapshot (a primeira carga falhou), qualquer versão não rejeitada é tentada
+            atual = self.atual
+            if (atual is not None and versao == atual.versao) or versao == self._rejeitada:
+                self._pendente = None
+                continue
+            # Espera a versão ficar estável por um intervalo: o pipeline grava CSV, Parquet e ZIP em sequência
+            if versao != self._pendente:
+                self._pendente = versao
+                continue
+            self._pendente = None
+            self.recarregar()
+
+    def iniciar(self):
+        if self._thread is not None or self.intervalo <= 0: return
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._vigiar, name="recarga-dados", daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        if self._thread is not None: self._thread.join(timeout=self.intervalo + 1)
+        self._thread = None
+
+    def status(self):
+        snap = self.atual
+        return dict(self._info,
+                    vigiando=self._thread is not None,
+                    intervalo_s=self.intervalo,
+                    linhas_despesas=0 if snap is None else len(snap.df_despesas),
+                    operadoras=0 if snap is None else len(snap.df_operadoras),
+                    operadoras_com_despesas=0 if snap is None else len(snap.indice_despesas.intervalos),
+                    etag_estatisticas=None if snap is None else snap.estatisticas.etag)
@@ -1,29 +1,139 @@
+"""Orquestrador do pipeline de dados, num único processo Python.
+
+As etapas formam um DAG (orquestrador.py): a lista de trimestres e o cadastro saem
+em paralelo; cada ZIP é baixado numa thread e filtrado num processo do pool; depois
+vem o JOIN com o cadastro (consolidado), e a agregação (etapa 2), o script SQL
+(etapa 3) e o snapshot da API rodam ao mesmo tempo, recebendo o consolidado em
+memória em vez de relê-lo do disco.
+
+Uso:
+    python run_pipeline.py                 # roda o que estiver desatualizado
+    python run_pipeline.py --dry-run       # só mostra o plano
+    python run_pipeline.py --workers 8 --forcar
+    python run_pipeline.py --de 2013 --ate 2025-3T   # carga histórica, um período por vez
+"""
+import argparse
+import importlib
+import multiprocessing
 import os
-import time
-
-def run_step(script_name, step_name):
-    print(f"\n>>> INICIANDO ETAPA: {step_name} ({script_name})")
-    exit_code = os.system(f".\\venv\\Scripts\\python.exe {script_name}")
-    
-    if exit_code == 0:
-        print(f">>> SUCESSO na etapa: {step_name}")
-        return True
-    else:
-        print(f">>> ERRO na etapa: {step_name}. Processo interrompido.")
-        return False
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from armazenamento import EscritorParquet, PARQUET_DISPONIVEL, PASTA_PARQUET
+from leitor_csv import ler_cadastro
+from manifesto import Manifesto
+import metricas
+from orquestrador import Etapa, executar, imprimir_plano, imprimir_relatorio
+import snapshot_api
+
+crawler = importlib.import_module("1_ETL_Crawler")
+transformacao = importlib.import_module("2_ETL_Transformacao")
+banco = importlib.import_module("3_SQL_Database")
+
+WORKERS = int(os.environ.get("ANS_PIPELINE_WORKERS", os.cpu_count() or 4))
+
+def montar_etapas(motor, manifesto, pool, gerar_parquet=True, chunksize=crawler.CHUNK_LINHAS, intervalo=None):
+    """O DAG do pipeline. Cada função recebe os resultados das dependências.
+    intervalo=(de, ate): carga histórica; o consolidado não fica em memória e as etapas seguintes o leem do disco."""
+    arquivo_cadastro = crawler.ARQUIVO_CADASTRO_LOCAL
+    arquivo_consolidado = crawler.ARQUIVO_CONSOLIDADO
+
+    def cadastro(_):
+        crawler.garantir_cadastro(motor, manifesto)
+        df_cad = ler_cadastro(arquivo_cadastro) if os.path.exists(arquivo_cadastro) else None
+        if df_cad is None or df_cad.empty:
+            print("ERRO: Não foi possível obter o cadastro (o consolidado sai sem o JOIN).")
+            return None
+        print(f"-> Operadoras no cadastro: {len(df_cad)}")
+        return df_cad
+
+    def consolidado(r):
+        df_cad = r['cadastro']
+        escritor = crawler.EscritorConsolidado(arquivo_consolidado,
+                                               crawler.colunas_join(df_cad) if df_cad is not None else None,
+                                               EscritorParquet() if gerar_parquet else None, reter=intervalo is None)
+        try:
+            crawler.consolidar_particoes(r['ingestao'], escritor, chunksize)
+        except BaseException:
+            escritor.descartar()
+            raise
+        if not crawler.publicar_consolidado(escritor, r['ingestao'], manifesto, arquivo_consolidado):
+            raise RuntimeError("Nenhum dado encontrado.")
+        print(f"\nSUCESSO TOTAL! {arquivo_consolidado} gerado ({escritor.linhas} linhas)."
+              + (" Parquet atualizado." if gerar_parquet else ""))
+        return escritor.tabela() if intervalo is None else None
+
+    def snapshot(r):
+        if not snapshot_api.gerar(df_d=r['consolidado'], df_c=r['cadastro']):
+            raise RuntimeError("Snapshot sem despesas.")
+
+    fontes = [arquivo_consolidado, arquivo_cadastro]
+    return [
+        Etapa('trimestres', lambda _: crawler.listar_urls_intervalo(*intervalo, motor) if intervalo
+              else crawler.listar_urls_trimestres(motor), sempre=True, descricao="Lista de trimestres na ANS"),
+        Etapa('cadastro', cadastro, sempre=True, descricao="Cadastro de operadoras"),
+        Etapa('ingestao', lambda r: crawler.ingerir_backfill(r['trimestres'], motor, manifesto, chunksize, pool) if intervalo
+              else crawler.ingerir_incremental(r['trimestres'], motor, manifesto, chunksize, pool),
+              depende=['trimestres'], sempre=True, descricao="Download e filtro dos ZIPs"),
+        Etapa('consolidado', consolidado, depende=['ingestao', 'cadastro'],
+              em_dia=lambda r: crawler.consolidado_em_dia(manifesto, r['ingestao'], gerar_parquet, arquivo_consolidado),
+              descricao="JOIN com o cadastro (consolidado)"),
+        # As partições desta execução: o manifesto em disco só é gravado depois do DAG inteiro
+        Etapa('agregacao', lambda r: transformacao.executar(df_consolidado=r['consolidado'], particoes=r['ingestao']),
+              depende=['consolidado', 'ingestao'],
+              entradas=fontes, saidas=[transformacao.ARQUIVO_SAIDA_CSV, transformacao.ARQUIVO_SAIDA_ZIP],
+              descricao="Limpeza e Validação"),
+        Etapa('sql', lambda r: banco.gerar_sql(df_ops=r['cadastro'], df_desp=r['consolidado']),
+              depende=['consolidado', 'cadastro'], entradas=fontes, saidas=[banco.ARQUIVO_SAIDA_SQL],
+              descricao="Geração de Scripts SQL"),
+        Etapa('snapshot', snapshot, depende=['consolidado', 'cadastro'], entradas=fontes + [PASTA_PARQUET],
+              saidas=[os.path.join(snapshot_api.PASTA_SNAPSHOT, 'meta.json')], descricao="Snapshot binário da API"),
+    ]
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Orquestrador do pipeline Intuitive Care")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Processos para o parse dos ZIPs e etapas simultâneas")
+    parser.add_argument("--dry-run", action="store_true", help="Mostra o plano (ordem e o que seria pulado) sem executar")
+    parser.add_argument("--forcar", action="store_true", help="Ignora o manifesto e as datas: refaz todas as etapas")
+    parser.add_argument("--chunksize", type=int, default=crawler.CHUNK_LINHAS, help="Linhas por chunk na leitura dos CSVs")
+    parser.add_argument("--sem-parquet", action="store_true", help="Não gera o armazenamento Parquet")
+    parser.add_argument("--de", help="Carga histórica a partir deste período (2013, 2013-2T ou 2T2013)")
+    parser.add_argument("--ate", help="Fim da carga histórica (padrão: o ano atual)")
+    metricas.adicionar_argumentos(parser)
+    args = parser.parse_args()
+    gerar_parquet = PARQUET_DISPONIVEL and not args.sem_parquet
+    if args.ate and not args.de: parser.error("--ate exige --de")
+    try:
+        intervalo = (crawler.ler_periodo(args.de), crawler.ler_periodo(args.ate or str(date.today().year), fim=True)) \
+            if args.de else None
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.dry_run:
+        imprimir_plano(montar_etapas(None, None, None, gerar_parquet, args.chunksize, intervalo), args.forcar)
+        sys.exit(0)
+
+    metricas.configurar_pelos_argumentos(args)
     print("=== ORQUESTRADOR DE PIPELINE INTUITIVE CARE ===")
-    
-    # 1. ETL - Crawler
-    if not run_step("1_ETL_Crawler.py", "Extração de Dados (Web Scraping)"): exit()
-    
-    # 2. ETL - Transformação
-    if not run_step("2_ETL_Transformacao.py", "Limpeza e Validação"): exit()
-    
-    # 3. Banco de Dados
-    if not run_step("3_SQL_Database.py", "Geração de Scripts SQL"): exit()
-    
+    print(f"-> {args.workers} workers")
+    motor = crawler.MotorDownload()
+    manifesto = Manifesto(ignorar_anterior=args.forcar)
+    # spawn: os processos do parse não herdam as threads do download (fork com threads pode travar)
+    with ProcessPoolExecutor(max_workers=max(1, args.workers), mp_context=multiprocessing.get_context('spawn')) as pool:
+        relatorio = executar(montar_etapas(motor, manifesto, pool, gerar_parquet, args.chunksize or None, intervalo),
+                             args.workers, args.forcar)
+
+    # Manifesto só é gravado se o consolidado refletir as partições registradas nele
+    if relatorio['etapas'].get('consolidado', {}).get('status') in ('ok', 'pulada'): manifesto.salvar()
+    motor.imprimir_resumo()
+    motor.fechar()
+    imprimir_relatorio(relatorio)
+    metricas.salvar_relatorio(args.metricas, pipeline=relatorio)
+
+    if not relatorio['ok']:
+        print("\n>>> Pipeline interrompido: veja as etapas com erro acima.")
+        sys.exit(1)
     print("\n=== PIPELINE DE DADOS CONCLUÍDO COM SUCESSO! ===")
     print("Agora você pode iniciar a API e abrir o Dashboard.")
-    print("Para iniciar a API, rode: .\\venv\\Scripts\\python.exe -m uvicorn 4_Backend_API:app --reload")
\ No newline at end of file
+    print("Para iniciar a API, rode: python -m uvicorn 4_Backend_API:app --reload")
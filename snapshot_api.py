@@ -0,0 +1,199 @@
+"""Snapshot binário, pronto para servir, das tabelas e índices da API.
+
+O pipeline grava em snapshot_api/ a tabela compacta de despesas (tabela_compacta.py),
+ordenada por RegistroANS/Ano/Trimestre (um .npy por coluna), a dimensão de operadoras,
+o cadastro normalizado, as somas por operadora e período (análises), o cubo de medidas
+(cubo_api.py), os índices e as estatísticas. A API abre os .npy com mmap:
+a carga leva milissegundos e os workers do uvicorn compartilham as mesmas páginas
+pelo cache do sistema operacional. Sem snapshot, ou com um snapshot mais antigo
+que os arquivos de dados, a API volta a ler o Parquet/CSV.
+
+Uso:
+    python snapshot_api.py
+"""
+import json
+import os
+import shutil
+import sys
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from leitor_csv import ler_cadastro
+from armazenamento import ler_despesas, parquet_existe, PASTA_PARQUET
+from indices_api import IndiceOperadoras, IndiceDespesas, IndiceBusca, Estatisticas
+from analises_api import MotorAnalises
+from cubo_api import Cubo, MEDIDAS
+from tabela_compacta import compactar_despesas, fatos_vazios, somar_por_periodo, TIPOS_FATOS, COLUNAS_FATOS, COLUNAS_PERIODO
+
+# --- CONFIGURAÇÕES ---
+PASTA_SNAPSHOT = os.environ.get("ANS_SNAPSHOT", "snapshot_api")
+ARQUIVO_DESPESAS = "consolidado_despesas.csv"
+ARQUIVO_CADASTRO = "Relatorio_cadop.csv"
+FONTES = [ARQUIVO_DESPESAS, PASTA_PARQUET, ARQUIVO_CADASTRO]
+FORMATO = 5
+
+COLUNAS_DESPESAS = ['RegistroANS', 'Ano', 'Trimestre', 'Valor Despesas', 'Descricao', 'UF']  # lidas do consolidado
+
+# df_despesas: fatos compactos; df_dimensao: atributos de cada operadora vindos do consolidado (UF)
+Snapshot = namedtuple('Snapshot', ['versao', 'df_despesas', 'df_dimensao', 'df_operadoras', 'indice_operadoras',
+                                   'indice_despesas', 'indice_busca', 'estatisticas', 'df_periodo', 'analises', 'cubo'])
+
+def impressao_digital(caminhos):
+    """(inode, tamanho, mtime) de cada caminho (None se não existir); muda quando o pipeline grava uma saída nova."""
+    digital = []
+    for caminho in caminhos:
+        try:
+            st = os.stat(caminho)
+            digital.append((st.st_ino, st.st_size, st.st_mtime_ns))
+        except OSError:
+            digital.append(None)
+    return tuple(digital)
+
+def _como_json(valor):
+    return json.loads(json.dumps(valor))
+
+# --- MONTAGEM A PARTIR DOS ARQUIVOS ---
+
+def ler_tabelas(arquivo_despesas=ARQUIVO_DESPESAS, arquivo_cadastro=ARQUIVO_CADASTRO):
+    """Despesas (só as colunas servidas) e cadastro normalizado, lidos do Parquet/CSV."""
+    if os.path.exists(arquivo_despesas) or parquet_existe():
+        try:
+            # Parquet quando existir (tipado e só com as colunas servidas); senão o CSV
+            df_d = ler_despesas(colunas=COLUNAS_DESPESAS, arquivo_csv=arquivo_despesas)
+            # FORÇA O REGISTRO ANS SER INTEIRO (Remove .0 se existir)
+            df_d['RegistroANS'] = pd.to_numeric(df_d['RegistroANS'], errors='coerce').fillna(0).astype(int)
+            print(f"-> Despesas carregadas: {len(df_d)} registros.")
+        except Exception as e:
+            print(f"Erro ao ler despesas: {e}")
+            df_d = pd.DataFrame()
+    else:
+        print(f"ERRO: {arquivo_despesas} não encontrado.")
+        df_d = pd.DataFrame()
+
+    # Cadastro: mesma leitura/normalização usada pelo crawler e pelo SQL
+    if os.path.exists(arquivo_cadastro):
+        df_c = ler_cadastro(arquivo_cadastro)
+        if not df_c.empty:
+            print(f"-> Operadoras carregadas: {len(df_c)} registros.")
+    else:
+        print(f"ERRO: {arquivo_cadastro} não encontrado.")
+        df_c = pd.DataFrame()
+    return df_d, df_c
+
+def montar_snapshot(versao, df_d, df_c):
+    """Tabela compacta, índices e estatísticas sobre as tabelas lidas. As despesas servidas são as já ordenadas pelo índice."""
+    fatos, dimensao = compactar_despesas(df_d)
+    indice_operadoras = IndiceOperadoras(df_c)
+    indice_despesas = IndiceDespesas(fatos)
+    indice_busca = IndiceBusca(df_c)
+    print(f"-> Índices montados: {len(indice_operadoras.posicao)} operadoras, {len(indice_despesas.intervalos)} com despesas.")
+    estatisticas = Estatisticas(fatos, dimensao, df_c)
+    periodo = somar_por_periodo(indice_despesas.tabela)
+    return Snapshot(versao, indice_despesas.tabela, dimensao, df_c, indice_operadoras, indice_despesas, indice_busca,
+                    estatisticas, periodo, MotorAnalises(periodo, df_c).aquecer(), Cubo(indice_despesas.tabela, dimensao, df_c))
+
+# --- FORMATO BINÁRIO ---
+
+def salvar_snapshot(snap, fontes, pasta=PASTA_SNAPSHOT):
+    """Grava o snapshot numa pasta temporária e troca a pasta inteira no final (como o EscritorParquet)."""
+    tmp = pasta + '.tmp'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    salvar = lambda nome, arr: np.save(os.path.join(tmp, nome + '.npy'), np.ascontiguousarray(arr))
+
+    df = snap.df_despesas
+    categorias = {}
+    for col in COLUNAS_FATOS if not df.empty else []:
+        if col in TIPOS_FATOS:
+            salvar(f'despesas_{col}', df[col].to_numpy(dtype=TIPOS_FATOS[col]))
+        else:
+            cat = df[col].array
+            categorias[col] = [str(c) for c in cat.categories]
+            salvar(f'despesas_{col}', cat.codes)  # -1 = nulo
+    for col in COLUNAS_PERIODO: salvar(f'periodo_{col}', snap.df_periodo[col].to_numpy(dtype=TIPOS_FATOS[col]))
+    intervalos = snap.indice_despesas.intervalos
+    salvar('intervalos', np.array([(r, a, b) for r, (a, b) in intervalos.items()], dtype=np.int64).reshape(-1, 3))
+
+    meta_busca, arrays_busca = snap.indice_busca.exportar()
+    for nome, arr in arrays_busca.items(): salvar(f'busca{nome}', arr)
+    meta_cubo, arrays_cubo = snap.cubo.exportar()
+    for nome, arr in arrays_cubo.items(): salvar(f'cubo_{nome}', arr)
+
+    meta = {
+        'formato': FORMATO,
+        'fontes': _como_json(fontes),
+        'gerado_em': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'linhas_despesas': len(df),
+        'categorias': categorias,
+        'dimensao': _como_json(snap.df_dimensao.astype(object).where(snap.df_dimensao.notna(), None).to_dict(orient='list')),
+        'colunas_operadoras': list(snap.df_operadoras.columns),
+        'operadoras': snap.indice_operadoras.exportar(),
+        'busca': meta_busca,
+        'cubo': meta_cubo,
+        'estatisticas': snap.estatisticas.dados,
+    }
+    with open(os.path.join(tmp, 'meta.json'), 'w', encoding='utf-8') as f: json.dump(meta, f, ensure_ascii=False)
+
+    antigo = pasta + '.old'
+    shutil.rmtree(antigo, ignore_errors=True)
+    if os.path.exists(pasta): os.replace(pasta, antigo)
+    os.replace(tmp, pasta)
+    shutil.rmtree(antigo, ignore_errors=True)
+
+def abrir_snapshot(fontes, pasta=PASTA_SNAPSHOT, versao=None):
+    """Snapshot mapeado em memória, ou None se não existir, for de outro formato ou estiver desatualizado."""
+    try:
+        with open(os.path.join(pasta, 'meta.json'), encoding='utf-8') as f: meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get('formato') != FORMATO: return None
+    if meta.get('fontes') != _como_json(fontes):
+        print("-> Snapshot binário desatualizado em relação aos arquivos; lendo Parquet/CSV.")
+        return None
+
+    abrir = lambda nome: np.load(os.path.join(pasta, nome + '.npy'), mmap_mode='r')
+    colunas = {}
+    for col in COLUNAS_FATOS if meta['linhas_despesas'] else []:
+        arr = abrir(f'despesas_{col}')
+        colunas[col] = arr if col in TIPOS_FATOS else \
+            pd.Categorical.from_codes(arr, categories=meta['categorias'][col], validate=False)
+    # copy=False: as colunas continuam sendo as páginas do arquivo, compartilhadas entre processos
+    df_d = pd.DataFrame(colunas, copy=False) if colunas else fatos_vazios()
+    dimensao = pd.DataFrame(meta['dimensao'])
+    dimensao['RegistroANS'] = dimensao['RegistroANS'].astype('int32')
+    if 'UF' in dimensao.columns: dimensao['UF'] = dimensao['UF'].astype('category')
+    intervalos = {r: (a, b) for r, a, b in abrir('intervalos').tolist()}
+    periodo = pd.DataFrame({col: abrir(f'periodo_{col}') for col in COLUNAS_PERIODO}, copy=False)
+
+    # O cadastro vem das linhas já prontas para a resposta (nulos viram "")
+    indice_operadoras = IndiceOperadoras.importar(meta['operadoras'])
+    df_c = pd.DataFrame.from_records(indice_operadoras.linhas, columns=meta['colunas_operadoras'])
+
+    arrays_busca = {nome[len('busca'):-len('.npy')]: np.load(os.path.join(pasta, nome), mmap_mode='r')
+                    for nome in os.listdir(pasta) if nome.startswith('busca')}
+    cubo = Cubo.importar(meta['cubo'], {nome: abrir(f'cubo_{nome}') for nome in ['registros'] + MEDIDAS})
+    print(f"-> Snapshot binário aberto ({meta['gerado_em']}): {len(df_d)} despesas, {len(df_c)} operadoras.")
+    return Snapshot(versao, df_d, dimensao, df_c, indice_operadoras, IndiceDespesas(df_d, intervalos=intervalos),
+                    IndiceBusca.importar(meta['busca'], arrays_busca), Estatisticas.de_dados(meta['estatisticas']),
+                    periodo, MotorAnalises(periodo, df_c).aquecer(), cubo)
+
+def gerar(pasta=PASTA_SNAPSHOT, df_d=None, df_c=None):
+    """Lê os arquivos do pipeline e grava o snapshot. Devolve False se não houver despesas.
+    df_d/df_c: consolidado e cadastro já em memória (orquestrador), no lugar da leitura."""
+    print("--- GERANDO SNAPSHOT BINÁRIO DA API ---")
+    fontes = impressao_digital(FONTES)
+    if df_d is None or df_c is None: df_d, df_c = ler_tabelas()
+    else: df_d = df_d[[c for c in COLUNAS_DESPESAS if c in df_d.columns]]
+    if df_d.empty:
+        print("ERRO: sem despesas para o snapshot.")
+        return False
+    snap = montar_snapshot(fontes, df_d, df_c)
+    salvar_snapshot(snap, fontes, pasta)
+    print(f"-> Snapshot gravado em {pasta}/ ({sum(os.path.getsize(os.path.join(pasta, f)) for f in os.listdir(pasta)) / 1024 / 1024:.1f} MB).")
+    return True
+
+if __name__ == "__main__":
+    sys.exit(0 if gerar() else 1)
@@ -0,0 +1,111 @@
+"""Representação colunar compacta das despesas servidas pela API.
+
+Fatos, uma linha por despesa: RegistroANS int32, Ano int16, Trimestre uint8 (1 a 4),
+ValorCentavos int64 (ponto fixo, sem deriva de float nas somas) e Descricao categórica.
+Os atributos da operadora (UF, CNPJ, Razão Social), que o consolidado repete em
+todas as linhas, ficam na dimensão: uma linha por RegistroANS.
+
+Uso:
+    python tabela_compacta.py    # relatório de memória: consolidado como lido x compacto
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+TIPOS_FATOS = {'RegistroANS': 'int32', 'Ano': 'int16', 'Trimestre': 'uint8', 'ValorCentavos': 'int64'}
+COLUNAS_FATOS = ['RegistroANS', 'Ano', 'Trimestre', 'ValorCentavos', 'Descricao']
+COLUNAS_DIMENSAO = ['UF', 'CNPJ', 'RazaoSocial']
+
+def rotulo_trimestre(numero):
+    """3 -> '3T', o formato do consolidado (0 = trimestre ausente)."""
+    return f"{numero}T" if numero else ""
+
+ROTULOS_TRIMESTRE = [rotulo_trimestre(n) for n in range(256)]
+
+def _numero_trimestre(serie):
+    """'3T' (ou 3, '3') -> 3, como uint8; o que não tiver dígito vira 0. Só os rótulos distintos são lidos."""
+    codigos, rotulos = pd.factorize(serie)
+    numeros = np.array([next((int(c) for c in str(r) if c in '1234'), 0) for r in rotulos] + [0], dtype='uint8')
+    return numeros[codigos]  # código -1 (nulo) cai no 0 do final
+
+def _inteiro(serie, tipo):
+    return pd.to_numeric(serie, errors='coerce').fillna(0).to_numpy(dtype=tipo)
+
+def fatos_vazios():
+    colunas = {c: np.empty(0, dtype=t) for c, t in TIPOS_FATOS.items()}
+    colunas['Descricao'] = pd.Categorical([])
+    return pd.DataFrame(colunas)
+
+def compactar_despesas(df):
+    """Consolidado (como lido do CSV/Parquet) -> (fatos, dimensão). Valores ausentes viram 0 centavos."""
+    if df.empty: return fatos_vazios(), pd.DataFrame({'RegistroANS': np.empty(0, dtype='int32')})
+    registros = _inteiro(df['RegistroANS'], 'int32')
+    valores = pd.to_numeric(df['Valor Despesas'], errors='coerce').fillna(0).to_numpy(dtype='float64')
+    descricao = df['Descricao'] if 'Descricao' in df.columns else pd.Series([None] * len(df))
+    fatos = pd.DataFrame({
+        'RegistroANS': registros,
+        'Ano': _inteiro(df['Ano'], 'int16'),
+        'Trimestre': _numero_trimestre(df['Trimestre']),
+        'ValorCentavos': np.round(valores * 100).astype('int64'),
+        'Descricao': descricao.astype('category').array,
+    })
+
+    # Uma linha por operadora; o consolidado repete os mesmos atributos em todas as despesas dela
+    atributos = [c for c in COLUNAS_DIMENSAO if c in df.columns]
+    primeiras = np.flatnonzero(~pd.Series(registros).duplicated().to_numpy())
+    dimensao = pd.DataFrame({'RegistroANS': registros[primeiras]})
+    for col in atributos:
+        valores_col = df[col].iloc[primeiras].to_numpy(dtype=object)
+        dimensao[col] = pd.Categorical(valores_col) if col == 'UF' else pd.array(valores_col, dtype='string')
+    return fatos, dimensao
+
+COLUNAS_PERIODO = ['RegistroANS', 'Ano', 'Trimestre', 'ValorCentavos']
+
+def somar_por_periodo(fatos):
+    """Fatos -> soma de ValorCentavos por RegistroANS/Ano/Trimestre (uma linha por operadora e período)."""
+    if fatos.empty: return fatos_vazios()[COLUNAS_PERIODO]
+    soma = fatos.groupby(['RegistroANS', 'Ano', 'Trimestre'], sort=True)['ValorCentavos'].sum().reset_index()
+    return soma.astype({c: t for c, t in TIPOS_FATOS.items()})
+
+def relatorio_memoria(fatos, dimensao, original=None):
+    """Bytes por coluna e por linha da representação compacta (e da original, se informada)."""
+    def medir(df):
+        por_coluna = {c: int(b) for c, b in df.memory_usage(deep=True, index=False).items()}
+        return {'colunas': por_coluna, 'total_bytes': sum(por_coluna.values())}
+    linhas = len(fatos)
+    compacto = medir(fatos)
+    compacto['dimensao_bytes'] = medir(dimensao)['total_bytes']
+    compacto['bytes_por_linha'] = round((compacto['total_bytes'] + compacto['dimensao_bytes']) / max(linhas, 1), 1)
+    relatorio = {'linhas': linhas, 'operadoras_dimensao': len(dimensao), 'compacto': compacto}
+    if original is not None:
+        antes = medir(original)
+        antes['bytes_por_linha'] = round(antes['total_bytes'] / max(linhas, 1), 1)
+        relatorio['original'] = antes
+        relatorio['reducao'] = round(antes['bytes_por_linha'] / max(compacto['bytes_por_linha'], 0.1), 1)
+    return relatorio
+
+def imprimir_relatorio(relatorio):
+    mb = lambda b: b / 1024 / 1024
+    print(f"-> {relatorio['linhas']:,} despesas, {relatorio['operadoras_dimensao']:,} operadoras na dimensão")
+    original = relatorio.get('original')
+    if original:
+        print(f"{'Coluna (como lida)':<22} {'MB':>9}")
+        for col, b in original['colunas'].items(): print(f"{col:<22} {mb(b):>9.1f}")
+        print(f"{'TOTAL':<22} {mb(original['total_bytes']):>9.1f}   ({original['bytes_por_linha']} bytes/linha)\n")
+    compacto = relatorio['compacto']
+    print(f"{'Coluna (compacta)':<22} {'MB':>9}")
+    for col, b in compacto['colunas'].items(): print(f"{col:<22} {mb(b):>9.1f}")
+    print(f"{'dimensão':<22} {mb(compacto['dimensao_bytes']):>9.1f}")
+    print(f"{'TOTAL':<22} {mb(compacto['total_bytes'] + compacto['dimensao_bytes']):>9.1f}   "
+          f"({compacto['bytes_por_linha']} bytes/linha)")
+    if original: print(f"\n-> {relatorio['reducao']}x menos memória por linha.")
+
+if __name__ == "__main__":
+    from armazenamento import ler_despesas
+    df = ler_despesas()
+    if df.empty:
+        print("ERRO: consolidado não encontrado (rode o pipeline antes).")
+        sys.exit(1)
+    fatos, dimensao = compactar_despesas(df)
+    imprimir_relatorio(relatorio_memoria(fatos, dimensao, original=df))
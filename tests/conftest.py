@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Os módulos do pipeline ficam na raiz do repositório (scripts numerados importados via importlib)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
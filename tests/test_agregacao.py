@@ -0,0 +1,67 @@
+"""Etapa 2: o resultado tem de ser o do consolidado desta execução, mesmo com o manifesto em disco defasado."""
+import importlib
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import dados_sinteticos
+from manifesto import Manifesto
+
+crawler = importlib.import_module('1_ETL_Crawler')
+transformacao = importlib.import_module('2_ETL_Transformacao')
+
+def _particao(caminho, trimestre, seed):
+    rng = np.random.default_rng(seed)
+    n = 3000
+    df = pd.DataFrame({
+        'RegistroANS': rng.integers(dados_sinteticos.REGISTRO_INICIAL, dados_sinteticos.REGISTRO_INICIAL + 220, n),
+        'Ano': 2025,
+        'Trimestre': trimestre,
+        'Valor Despesas': rng.uniform(-1000, 1_000_000, n).round(2),
+        'Descricao': 'EVENTOS CONHECIDOS OU AVISADOS',
+    })
+    df.to_csv(caminho, sep=';', index=False, encoding='utf-8-sig')
+    return caminho
+
+def _publicar(particoes, df_cad):
+    """Grava o consolidado das partições (como o crawler) e devolve o DataFrame."""
+    df = pd.concat([pd.read_csv(p, sep=';', encoding='utf-8-sig') for p in particoes], ignore_index=True)
+    df = crawler.juntar_cadastro(df, crawler.colunas_join(df_cad))
+    df.to_csv(transformacao.ARQUIVO_ENTRADA, sep=';', index=False, encoding='utf-8-sig')
+    return df
+
+def _resultado():
+    df = pd.read_csv(transformacao.ARQUIVO_SAIDA_CSV, sep=';', encoding='utf-8-sig')
+    return df.astype({'RazaoSocial': str, 'UF': str}).set_index(['RazaoSocial', 'UF']).sort_index()
+
+@pytest.fixture
+def pasta(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('particoes_despesas')
+    dados_sinteticos.gerar_cadastro(transformacao.ARQUIVO_CADASTRO, 200)
+    return tmp_path
+
+@pytest.mark.parametrize('em_memoria', [True, False], ids=['consolidado_em_memoria', 'backfill_do_disco'])
+def test_particao_nova_entra_na_agregacao(pasta, em_memoria):
+    df_cad = transformacao.ler_cadastro(transformacao.ARQUIVO_CADASTRO)
+    p1 = _particao('particoes_despesas/1T2025.csv', '1T', seed=1)
+    p2 = _particao('particoes_despesas/2T2025.csv', '2T', seed=2)
+
+    # Execução anterior: só 1T2025, com o manifesto gravado e o estado incremental montado
+    _publicar([p1], df_cad)
+    manifesto = Manifesto()
+    manifesto.registrar_consolidado(particoes=[p1], linhas=0)
+    manifesto.salvar()
+    transformacao.executar()
+
+    # Execução atual: 2T2025 chegou; o manifesto em disco ainda lista só 1T2025 (é gravado no fim do DAG)
+    df = _publicar([p1, p2], df_cad)
+    transformacao.executar(df_consolidado=df if em_memoria else None, particoes=[p1, p2])
+    obtido = _resultado()
+
+    transformacao.executar(completo=True)
+    esperado = _resultado()
+    assert obtido['Qtd_Registros'].sum() > 0
+    pd.testing.assert_frame_equal(obtido, esperado, check_dtype=False, rtol=1e-9)
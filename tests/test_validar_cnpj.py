@@ -0,0 +1,60 @@
+"""validar_cnpjs (vetorizada) tem de dar, linha a linha, o mesmo resultado de validar_cnpj."""
+import importlib
+
+import numpy as np
+import pandas as pd
+import pytest
+
+transformacao = importlib.import_module('2_ETL_Transformacao')
+
+VALIDO = '11222333000181'
+CASOS = {
+    'nulos': [None, np.nan, pd.NA, float('nan')],
+    'vazios_e_texto': ['', '   ', 'abc', 'CNPJ: ', '11.222.333/0001-8a'],
+    'repetidos': ['00000000000000', '11111111111111', '99999999999999', '00.000.000/0000-00', 0, 11111111111111],
+    'mascara': ['11.222.333/0001-81', '11.222.333/0001-82', '11 222 333 0001 81', ' 11222333000181 ', '01.152.449/3909-20'],
+    'float': [11222333000181.0, 1152449390920.0, 11222333000182.0, 1.1222333000181e13, np.float64(11222333000181)],
+    'inteiros': [11222333000181, 1152449390920, np.int64(11222333000181), 11222333000182],
+    'tamanho_errado': ['1122233300018', '112223330001811', '1', '0115244939092', '011522449390920', '٣1222333000181'],
+    'digito_errado': ['11222333000180', '11222333000191', '01152449390921'],
+    'validos': [VALIDO, '01152449390920', '00.000.000/0001-91'],
+}
+
+def _conferir(serie):
+    esperado = serie.apply(transformacao.validar_cnpj).astype(bool)
+    obtido = transformacao.validar_cnpjs(serie)
+    assert obtido.index.equals(serie.index)
+    divergentes = serie[esperado.to_numpy() != obtido.to_numpy()]
+    assert divergentes.empty, f"Divergência ({serie.dtype}): {divergentes.tolist()}"
+    return obtido
+
+@pytest.mark.parametrize('grupo', list(CASOS))
+def test_paridade_object(grupo):
+    _conferir(pd.Series(CASOS[grupo], dtype=object))
+
+def test_paridade_todos_misturados():
+    casos = [c for grupo in CASOS.values() for c in grupo]
+    # Repetidos e fora de ordem: a versão vetorizada valida só os distintos e mapeia de volta
+    serie = pd.Series(casos * 3, dtype=object).sample(frac=1, random_state=0)
+    _conferir(serie)
+
+def test_paridade_string_dtype():
+    textos = [c for grupo in CASOS.values() for c in grupo if isinstance(c, str)]
+    _conferir(pd.Series(textos + [None], dtype='string'))
+
+def test_paridade_float_dtype():
+    # Coluna lida do CSV sem dtype: CNPJ vira float, com NaN nos vazios (e perde o zero à esquerda)
+    numeros = [float(c) for grupo in CASOS.values() for c in grupo
+               if isinstance(c, (int, float, np.integer, np.floating)) and not pd.isna(c)]
+    _conferir(pd.Series(numeros + [np.nan]))
+
+def test_paridade_int_dtype():
+    _conferir(pd.Series([11222333000181, 1152449390920, 11111111111111, 0, 11222333000182], dtype='int64'))
+
+def test_resultados_conhecidos():
+    serie = pd.Series([VALIDO, '11.222.333/0001-81', '11222333000182', '11111111111111', '1122233300018',
+                       None, 11222333000181.0], dtype=object)
+    assert transformacao.validar_cnpjs(serie).tolist() == [True, True, False, False, False, False, False]
+
+def test_serie_vazia():
+    assert transformacao.validar_cnpjs(pd.Series([], dtype=object)).empty